@@ -1,4 +1,3 @@
 from .api_Operation import PDFQA
-from .api_load import load_models 
 
-__all__ = ['PDFQA', 'load_api'] 
+__all__ = ['PDFQA'] 
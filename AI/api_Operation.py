@@ -1,104 +1,184 @@
 import streamlit as st
 import time
-from AI.api_load import load_models  
+import logging
+import threading
+from google.api_core import exceptions as google_exceptions
+from AI.model_registry import ModelClient, get_task_model
+from AI.extraction_cache import get_extraction_cache, hash_bytes, make_cache_key
+from AI.file_handles import get_file_registry, INLINE_MAX_BYTES, INLINE_HARD_LIMIT_BYTES
+from AI.resilience import AIResult, RetryPolicy, call_with_resilience, ERROR_INVALID, ERROR_UNAVAILABLE_MODEL
+from AI.metrics import get_metrics_store
+
+logger = logging.getLogger('segsisone_app.pdf_qa')
 
 class PDFQA:
-    def __init__(self):
+    def __init__(self, unit_id: str | None = None):
         """
-        Inicializa a classe carregando os dois modelos de IA (extração e auditoria)
-        usando a função load_models().
+        Inicialização leve: os modelos de extração e de auditoria vêm do registro
+        compartilhado (AI/model_registry.py) no momento de cada chamada, cada um com a
+        sua chave. `unit_id` (ID da planilha da unidade) identifica a unidade nas
+        métricas de uso da IA.
         """
-        self.extraction_model, self.audit_model = load_models()
+        self.unit_id = unit_id
+        self.retry_policy = RetryPolicy()
+        self._local = threading.local()
+        self.file_registry = get_file_registry()
 
-    def answer_question(self, pdf_files, question, task_type='extraction'):
+    def answer_question(self, pdf_files, question, task_type='extraction', use_cache=True, expect_json=False):
         """
         Função principal para responder a uma pergunta, selecionando o modelo apropriado.
         Atua como um "roteador" para o modelo de IA correto.
+        Para telas interativas: em caso de falha mostra o motivo com st.warning. Código que
+        precisa decidir o que fazer com a falha (ex.: lotes) deve usar `ask`.
         
         Args:
-            pdf_files (list): Lista de caminhos ou objetos de arquivo PDF.
+            pdf_files (list): Lista de caminhos, bytes ou objetos de arquivo PDF.
             question (str): A pergunta ou prompt.
             task_type (str): 'extraction' para tarefas simples (padrão), 'audit' para tarefas complexas.
+            use_cache (bool): consulta/grava o cache de respostas (arquivo + prompt + modelo).
+            expect_json (bool): o prompt pede um objeto JSON; respostas sem JSON válido não são guardadas no cache.
         
         Returns:
             tuple: (response_text, duration) ou (None, 0) em caso de erro.
         """
+        result = self.ask(pdf_files, question, task_type, use_cache, expect_json)
+        if result.ok:
+            return result.text, result.duration
+        if result.error_kind == ERROR_UNAVAILABLE_MODEL:
+            key_name = 'GEMINI_AUDIT_KEY' if task_type == 'audit' else 'GEMINI_EXTRACTION_KEY'
+            st.error(f"O modelo de {'AUDITORIA' if task_type == 'audit' else 'EXTRAÇÃO'} não está disponível. Verifique sua chave '{key_name}' nos secrets.")
+        else:
+            st.warning(f"Não foi possível obter uma resposta do modelo. {result.user_message}")
+        return None, 0
+
+    @property
+    def last_result(self) -> AIResult | None:
+        """Último AIResult da thread atual (para quem só recebeu o None de `answer_question`)."""
+        return getattr(self._local, 'result', None)
+
+    def ask(self, pdf_files, question, task_type='extraction', use_cache=True, expect_json=False) -> AIResult:
+        """
+        Igual a `answer_question`, mas sem efeitos na interface: devolve um AIResult com o
+        texto ou o tipo do erro (cota, instabilidade, timeout, circuito aberto...).
+        Toda chamada (inclusive acertos do cache e falhas) é registrada nas métricas de IA.
+        """
+        model_to_use = get_task_model('audit' if task_type == 'audit' else 'extraction')
+        model_name = model_to_use.model_name if model_to_use else task_type
+        pdf_contents = []
+        result = self._ask(model_to_use, model_name, pdf_files, pdf_contents, question, task_type, use_cache, expect_json)
+        self._local.result = result
+        self._record_metrics(model_name, task_type, sum(len(c) for c in pdf_contents), result)
+        return result
+
+    def _record_metrics(self, model_name, task_type, input_bytes, result: AIResult):
+        store = get_metrics_store()
+        if store is None:
+            return
+        store.record(
+            self.unit_id, model_name, task_type, input_bytes, result.prompt_tokens, result.output_tokens,
+            result.duration, result.attempts, result.from_cache, result.error_kind
+        )
+
+    def _ask(self, model_to_use: ModelClient | None, model_name, pdf_files, pdf_contents, question, task_type, use_cache, expect_json) -> AIResult:
+        """`pdf_contents` é preenchida com os bytes lidos (usados também nas métricas)."""
         start_time = time.time()
-        
-        model_to_use = None
-        if task_type == 'audit':
-            model_to_use = self.audit_model
-            if not model_to_use:
-                st.error("O modelo de AUDITORIA não está disponível. Verifique sua chave 'GEMINI_AUDIT_KEY' nos secrets.")
-                return None, 0
-        else:  # O padrão é 'extraction'
-            model_to_use = self.extraction_model
-            if not model_to_use:
-                st.error("O modelo de EXTRAÇÃO não está disponível. Verifique sua chave 'GEMINI_EXTRACTION_KEY' nos secrets.")
-                return None, 0
+        if not model_to_use:
+            return AIResult(None, error_kind=ERROR_UNAVAILABLE_MODEL, message=f"Modelo para a tarefa '{task_type}' não configurado.")
 
         try:
-            answer = self._generate_response(model_to_use, pdf_files, question)
-            if answer is not None:
-                return answer, time.time() - start_time
-            else:
-                st.warning("Não foi possível obter uma resposta do modelo.")
-                return None, 0
-        except Exception as e:
-            st.error(f"Erro inesperado ao processar a pergunta para a tarefa '{task_type}': {e}")
-            st.exception(e)
-            return None, 0
-
-    def _generate_response(self, model, pdf_files, question):
+            pdf_contents.extend(self._read_pdf_bytes(pdf_file) for pdf_file in pdf_files)
+        except OSError as e:
+            logger.error(f"Falha ao ler o PDF para a tarefa '{task_type}': {e}")
+            return AIResult(None, error_kind=ERROR_INVALID, message=str(e))
+
+        file_hashes = [hash_bytes(c) for c in pdf_contents]
+        cache = get_extraction_cache() if use_cache else None
+        cache_key = None
+        if cache is not None:
+            cache_key = make_cache_key(file_hashes, question, model_name)
+            entry = cache.get_entry(cache_key, require_json=expect_json)
+            if entry is not None:
+                logger.info(f"CACHE HIT: resposta de '{model_name}' reaproveitada para a tarefa '{task_type}'.")
+                return AIResult(entry[0], time.time() - start_time, from_cache=True)
+
+        result = call_with_resilience(
+            lambda timeout: self._generate_response(model_to_use, pdf_contents, question, timeout, file_hashes),
+            model_name, task_type, self.retry_policy
+        )
+        if result.ok and cache_key is not None:
+            # Respostas JSON malformadas não são guardadas: a próxima tentativa consulta o modelo.
+            cache.put(cache_key, model_name, result.text, require_json=expect_json)
+        return result
+
+    @staticmethod
+    def _read_pdf_bytes(pdf_file) -> bytes:
+        """
+        Conteúdo do PDF como bytes. bytes e memoryviews que cobrem um objeto bytes inteiro
+        são usados sem cópia; caminhos de arquivo continuam aceitos por compatibilidade.
+        """
+        if isinstance(pdf_file, bytes):
+            return pdf_file
+        if isinstance(pdf_file, (memoryview, bytearray)):
+            view = memoryview(pdf_file)
+            if isinstance(view.obj, bytes) and view.nbytes == len(view.obj):
+                return view.obj
+            return view.tobytes()
+        if hasattr(pdf_file, 'getvalue'):  # Se for um objeto de arquivo (como st.UploadedFile)
+            return pdf_file.getvalue() # Use getvalue() que é mais seguro
+        with open(pdf_file, 'rb') as f:  # Se for um caminho de arquivo (string)
+            return f.read()
+
+    def _pdf_parts(self, client: ModelClient, pdf_contents, file_hashes) -> tuple[list, list]:
+        """
+        Partes da requisição para cada PDF: inline se for pequeno, senão uma referência ao
+        arquivo enviado uma única vez com a chave do modelo (reaproveitado pelas chamadas
+        seguintes com a mesma chave). Retorna (partes, hashes enviados por referência).
         """
-        Função interna que prepara e envia a requisição para um modelo Gemini específico.
+        parts, referenced = [], []
+        for pdf_bytes, file_hash in zip(pdf_contents, file_hashes):
+            if len(pdf_bytes) > INLINE_MAX_BYTES:
+                try:
+                    handle = self.file_registry.get_or_upload(
+                        file_hash, pdf_bytes, scope=client.key_id, file_client=client.file_client
+                    )
+                    parts.append(handle.as_part())
+                    referenced.append(file_hash)
+                    continue
+                except Exception as e:
+                    if len(pdf_bytes) > INLINE_HARD_LIMIT_BYTES:
+                        raise
+                    logger.warning(f"Falha ao enviar o PDF pela Files API; usando envio inline: {e}")
+            parts.append({"mime_type": "application/pdf", "data": pdf_bytes})
+        return parts, referenced
+
+    def _generate_response(self, client: ModelClient, pdf_contents, question, timeout=None, file_hashes=None):
         """
+        Função interna que prepara e envia a requisição para um modelo Gemini específico
+        (já ligado à sua chave de API).
+        `pdf_contents` é a lista com o conteúdo (bytes) de cada PDF. Os erros da API são
+        propagados para a política de novas tentativas (AI/resilience.py).
+        Retorna (texto, (tokens do prompt, tokens da resposta)).
+        """
+        file_hashes = file_hashes or [hash_bytes(c) for c in pdf_contents]
+        request_options = {'timeout': timeout} if timeout else None
+        inputs, referenced = self._pdf_parts(client, pdf_contents, file_hashes)
+        
+        # Adicionar a pergunta como texto
+        inputs.append({"text": question})
+        
+        # Gerar resposta usando o modelo multimodal fornecido
         try:
-            # Preparar os inputs para o modelo
-            inputs = []
-            
-            for pdf_file in pdf_files:
-                if hasattr(pdf_file, 'read'):  # Se for um objeto de arquivo (como st.UploadedFile)
-                    pdf_bytes = pdf_file.getvalue() # Use getvalue() que é mais seguro
-                else:  # Se for um caminho de arquivo (string)
-                    with open(pdf_file, 'rb') as f:
-                        pdf_bytes = f.read()
-                
-                part = {"mime_type": "application/pdf", "data": pdf_bytes}
-                inputs.append(part)
-            
-            # Adicionar a pergunta como texto
+            response = client.model.generate_content(inputs, request_options=request_options)
+        except (google_exceptions.NotFound, google_exceptions.PermissionDenied):
+            if not referenced:
+                raise
+            # O arquivo expirou ou foi apagado no servidor: reenvia uma vez.
+            for file_hash in referenced:
+                self.file_registry.invalidate(file_hash, scope=client.key_id)
+            inputs, _ = self._pdf_parts(client, pdf_contents, file_hashes)
             inputs.append({"text": question})
-            
-            # Gerar resposta usando o modelo multimodal fornecido
-            response = model.generate_content(inputs)
-            
-            return response.text
-            
-        except Exception as e:
-            st.error(f"Erro na comunicação com a API Gemini: {str(e)}")
-            return None
-
-
-   
-
-
-
-
-
-
-   
-
-
-
-
-
-   
-
-
-
-
-   
-
-
-
+            response = client.model.generate_content(inputs, request_options=request_options)
+        
+        usage = getattr(response, 'usage_metadata', None)
+        tokens = (getattr(usage, 'prompt_token_count', 0) or 0, getattr(usage, 'candidates_token_count', 0) or 0)
+        return response.text, tokens
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import streamlit as st
+
+from gdrive.config import LOCAL_CACHE_DIR
+
+logger = logging.getLogger('segsisone_app.extraction_cache')
+
+CACHE_PATH = os.path.join(LOCAL_CACHE_DIR, "ai_extraction_cache.sqlite3")
+# Tamanho máximo das respostas guardadas; acima disso as menos usadas recentemente são removidas.
+MAX_CACHE_BYTES = int(os.environ.get('SEGSISONE_AI_CACHE_MB', 64)) * 1024 * 1024
+
+_JSON_BLOCK_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+
+def hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def make_cache_key(file_hashes: list, prompt: str, model_name: str) -> str:
+    """Chave (SHA-256 dos PDFs, hash do prompt, modelo). Qualquer mudança no texto do prompt gera outra chave."""
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    return hashlib.sha256("|".join([*file_hashes, prompt_hash, model_name]).encode('utf-8')).hexdigest()
+
+
+def _parse_json_block(raw: str):
+    match = _JSON_BLOCK_RE.search(raw or '')
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+
+
+class ExtractionCache:
+    """
+    Cache em disco (SQLite) das respostas dos modelos de IA por arquivo + prompt + modelo.
+    Guarda a resposta bruta e, quando ela contém um bloco JSON, a versão já interpretada.
+    O tamanho total é limitado com remoção LRU; acertos, faltas e remoções são contados.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                modelo TEXT NOT NULL,
+                resposta TEXT NOT NULL,
+                resposta_json TEXT,
+                tamanho INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (ultimo_acesso)")
+        self._conn.commit()
+
+    def get_entry(self, key: str, require_json: bool = False) -> tuple | None:
+        """
+        (resposta bruta, JSON interpretado ou None) para a chave, atualizando o último acesso.
+        Com `require_json`, respostas guardadas sem bloco JSON válido contam como falta.
+        """
+        query = "SELECT resposta, resposta_json FROM respostas WHERE chave = ?"
+        if require_json:
+            query += " AND resposta_json IS NOT NULL"
+        with self._lock:
+            try:
+                row = self._conn.execute(query, (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), key))
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Falha ao ler o cache de IA (tratado como falta): {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def put(self, key: str, model_name: str, raw: str, require_json: bool = False):
+        """Guarda a resposta; com `require_json`, só se ela contiver um bloco JSON válido."""
+        if not raw:
+            return
+        parsed = _parse_json_block(raw)
+        if require_json and parsed is None:
+            logger.info("Cache de IA: resposta sem JSON válido não foi guardada.")
+            return
+        parsed_text = json.dumps(parsed, ensure_ascii=False) if parsed is not None else None
+        size = len(raw.encode('utf-8')) + len((parsed_text or '').encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO respostas (chave, modelo, resposta, resposta_json, tamanho, criado_em, ultimo_acesso) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model_name, raw, parsed_text, size, now, now),
+                )
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Falha ao gravar no cache de IA: {e}")
+                self._conn.rollback()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in self._conn.execute("SELECT chave, tamanho FROM respostas ORDER BY ultimo_acesso").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM respostas WHERE chave = ?", (key,))
+            total -= size
+            removed += 1
+        self.evictions += removed
+        logger.info(f"Cache de IA: {removed} resposta(s) removida(s) por limite de tamanho.")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM respostas")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entradas': entries,
+            'tamanho_bytes': total,
+            'limite_bytes': self.max_bytes,
+            'acertos': self.hits,
+            'faltas': self.misses,
+            'remocoes': self.evictions,
+            'taxa_acerto': self.hits / lookups if lookups else 0.0,
+        }
+
+
+@st.cache_resource
+def get_extraction_cache() -> ExtractionCache | None:
+    """Cache compartilhado pelo processo; None se o arquivo não puder ser aberto (a IA segue sem cache)."""
+    try:
+        return ExtractionCache()
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Não foi possível abrir o cache de IA em '{CACHE_PATH}': {e}")
+        return None
@@ -0,0 +1,156 @@
+import io
+import os
+import time
+import logging
+import threading
+from typing import NamedTuple
+
+import streamlit as st
+import google.generativeai as genai
+from google.generativeai.types import file_types
+
+logger = logging.getLogger('segsisone_app.file_handles')
+
+# PDFs até este tamanho vão direto no corpo da requisição; acima dele são enviados uma vez
+# pela Files API e referenciados por URI em todas as chamadas seguintes.
+INLINE_MAX_BYTES = int(float(os.environ.get('SEGSISONE_AI_INLINE_MB', 4)) * 1024 * 1024)
+# Limite do corpo inline da API; arquivos maiores só podem ir por handle.
+INLINE_HARD_LIMIT_BYTES = 20 * 1024 * 1024
+# A Files API apaga os arquivos após 48h; o handle é descartado antes disso.
+HANDLE_TTL_SECONDS = int(os.environ.get('SEGSISONE_AI_FILE_TTL_HOURS', 46)) * 3600
+# Tempo máximo esperando o arquivo sair do estado PROCESSING.
+ACTIVATION_TIMEOUT_SECONDS = 120
+
+
+class FileHandle(NamedTuple):
+    name: str
+    uri: str
+    mime_type: str
+    expires_at: float
+
+    def as_part(self) -> dict:
+        return {"file_data": {"mime_type": self.mime_type, "file_uri": self.uri}}
+
+
+class GeminiFileBackend:
+    """
+    Envio pela Files API do Gemini. Com `file_client` (o cliente da chave do modelo, ver
+    AI/model_registry.py) o arquivo pertence à mesma chave que vai usá-lo; sem ele, usa
+    a configuração global do genai.
+    """
+
+    def upload(self, content: bytes, mime_type: str, display_name: str, file_client=None) -> FileHandle:
+        if file_client is None:
+            uploaded = genai.upload_file(io.BytesIO(content), mime_type=mime_type, display_name=display_name)
+        else:
+            uploaded = file_types.File(file_client.create_file(
+                path=io.BytesIO(content), mime_type=mime_type, display_name=display_name, resumable=True
+            ))
+        deadline = time.monotonic() + ACTIVATION_TIMEOUT_SECONDS
+        while uploaded.state.name == 'PROCESSING':
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Arquivo '{uploaded.name}' não ficou disponível em {ACTIVATION_TIMEOUT_SECONDS}s.")
+            time.sleep(2)
+            uploaded = genai.get_file(uploaded.name) if file_client is None else file_types.File(file_client.get_file(name=uploaded.name))
+        if uploaded.state.name != 'ACTIVE':
+            raise RuntimeError(f"Falha no processamento do arquivo '{uploaded.name}' (estado {uploaded.state.name}).")
+        expires_at = time.time() + HANDLE_TTL_SECONDS
+        if uploaded.expiration_time:
+            expires_at = min(expires_at, uploaded.expiration_time.timestamp() - 3600)
+        return FileHandle(uploaded.name, uploaded.uri, mime_type, expires_at)
+
+    def delete(self, handle: FileHandle, file_client=None):
+        if file_client is None:
+            genai.delete_file(handle.name)
+        else:
+            file_client.delete_file(name=handle.name)
+
+
+class LocalFileBackend:
+    """
+    Substituto em memória da Files API, para testes e execução sem rede: devolve URIs
+    'local://' e guarda o conteúdo para conferência. Ativado com SEGSISONE_AI_FILE_BACKEND=local.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.uploads = 0
+
+    def upload(self, content: bytes, mime_type: str, display_name: str, file_client=None) -> FileHandle:
+        self.uploads += 1
+        name = f"files/local-{self.uploads}"
+        self.files[name] = content
+        return FileHandle(name, f"local://{name}", mime_type, time.time() + HANDLE_TTL_SECONDS)
+
+    def delete(self, handle: FileHandle, file_client=None):
+        self.files.pop(handle.name, None)
+
+
+class FileHandleRegistry:
+    """
+    Handles de arquivos já enviados ao modelo, por hash do conteúdo e escopo (a chave de API
+    dona do arquivo: um arquivo enviado com uma chave não é visível para outra).
+    Uploads simultâneos do mesmo arquivo (ex.: extração e auditoria em paralelo) esperam
+    o primeiro terminar e reaproveitam o mesmo handle.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or GeminiFileBackend()
+        self._handles: dict[tuple, FileHandle] = {}
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.reuses = 0
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, file_hash: str, scope: str = 'default') -> FileHandle | None:
+        with self._lock:
+            handle = self._handles.get((scope, file_hash))
+            if handle is not None and handle.expires_at <= time.time():
+                del self._handles[(scope, file_hash)]
+                return None
+            return handle
+
+    def get_or_upload(self, file_hash: str, content: bytes, mime_type: str = 'application/pdf', scope: str = 'default',
+                      file_client=None) -> FileHandle:
+        key = (scope, file_hash)
+        with self._key_lock(key):
+            handle = self.get(file_hash, scope)
+            if handle is not None:
+                self.reuses += 1
+                return handle
+            start = time.monotonic()
+            handle = self.backend.upload(content, mime_type, f"segsisone-{file_hash[:16]}", file_client)
+            with self._lock:
+                self._handles[key] = handle
+                self.uploads += 1
+            logger.info(f"PDF de {len(content) / 1024 / 1024:.1f} MB enviado ao modelo como '{handle.name}' em {time.monotonic() - start:.1f}s.")
+            return handle
+
+    def invalidate(self, file_hash: str, scope: str = 'default'):
+        """Descarta um handle que o modelo não reconhece mais (expirado ou apagado)."""
+        with self._lock:
+            self._handles.pop((scope, file_hash), None)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, handle in self._handles.items() if handle.expires_at <= now]
+            for key in expired:
+                del self._handles[key]
+        return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = len(self._handles)
+        return {'handles_ativos': active, 'uploads': self.uploads, 'reaproveitamentos': self.reuses}
+
+
+@st.cache_resource
+def get_file_registry() -> FileHandleRegistry:
+    """Registro compartilhado pelo processo (todas as sessões)."""
+    backend = LocalFileBackend() if os.environ.get('SEGSISONE_AI_FILE_BACKEND') == 'local' else GeminiFileBackend()
+    return FileHandleRegistry(backend)
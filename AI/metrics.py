@@ -0,0 +1,127 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from gdrive.config import LOCAL_CACHE_DIR
+
+logger = logging.getLogger('segsisone_app.ai_metrics')
+
+METRICS_PATH = os.path.join(LOCAL_CACHE_DIR, "ai_metrics.sqlite3")
+# Chamadas mais antigas que isso são apagadas ao abrir o banco.
+RETENTION_DAYS = int(os.environ.get('SEGSISONE_AI_METRICS_DAYS', 90))
+
+# Preço em US$ por 1 milhão de tokens (entrada, saída), conforme a tabela pública do Gemini
+# para prompts de até 200 mil tokens. Atualize ao trocar de modelo ou quando o preço mudar.
+MODEL_PRICES_USD_PER_MTOK = {
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-pro': (1.25, 10.00),
+}
+
+METRIC_COLUMNS = [
+    'ts', 'dia', 'unidade', 'modelo', 'task_type', 'input_bytes', 'prompt_tokens',
+    'output_tokens', 'latencia_ms', 'tentativas', 'cache_hit', 'erro',
+]
+
+
+def estimate_cost_usd(model_name: str, prompt_tokens, output_tokens):
+    """Custo estimado; aceita escalares ou Series. Modelos sem preço conhecido custam 0."""
+    name = str(model_name).removeprefix('models/')
+    input_price, output_price = MODEL_PRICES_USD_PER_MTOK.get(name, (0.0, 0.0))
+    return (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class AIMetricsStore:
+    """Registro local (SQLite) de cada chamada à IA: modelo, tarefa, tamanhos, tokens, latência e erros."""
+
+    def __init__(self, path: str = METRICS_PATH, retention_days: int = RETENTION_DAYS):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chamadas (
+                ts REAL NOT NULL,
+                dia TEXT NOT NULL,
+                unidade TEXT,
+                modelo TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                input_bytes INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                latencia_ms REAL NOT NULL,
+                tentativas INTEGER NOT NULL,
+                cache_hit INTEGER NOT NULL,
+                erro TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chamadas_ts ON chamadas (ts)")
+        self._conn.execute("DELETE FROM chamadas WHERE ts < ?", (time.time() - retention_days * 86400,))
+        self._conn.commit()
+
+    def record(self, unidade: str | None, modelo: str, task_type: str, input_bytes: int, prompt_tokens: int,
+               output_tokens: int, latencia_s: float, tentativas: int, cache_hit: bool, erro: str | None):
+        now = time.time()
+        row = (now, datetime.fromtimestamp(now).strftime('%Y-%m-%d'), unidade, modelo, task_type, int(input_bytes),
+               int(prompt_tokens or 0), int(output_tokens or 0), latencia_s * 1000, int(tentativas), int(cache_hit), erro)
+        with self._lock:
+            try:
+                self._conn.execute(f"INSERT INTO chamadas ({', '.join(METRIC_COLUMNS)}) VALUES ({', '.join('?' * len(METRIC_COLUMNS))})", row)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Falha ao registrar métrica de IA: {e}")
+
+    def load(self, days: int = 30) -> pd.DataFrame:
+        """Chamadas dos últimos `days` dias, com a coluna `custo_usd` estimada."""
+        since = (datetime.now() - timedelta(days=days)).timestamp()
+        with self._lock:
+            df = pd.read_sql_query("SELECT * FROM chamadas WHERE ts >= ?", self._conn, params=(since,))
+        df['custo_usd'] = 0.0
+        for modelo, idx in df.groupby('modelo').groups.items():
+            df.loc[idx, 'custo_usd'] = estimate_cost_usd(modelo, df.loc[idx, 'prompt_tokens'], df.loc[idx, 'output_tokens'])
+        # Respostas vindas do cache não consomem cota.
+        df.loc[df['cache_hit'] == 1, 'custo_usd'] = 0.0
+        return df
+
+
+def latency_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """p50/p95 de latência, volume, erros e taxa de acerto do cache por modelo e tarefa (chamadas reais ao modelo)."""
+    if df.empty:
+        return pd.DataFrame()
+    grouped = df.groupby(['modelo', 'task_type'])
+    model_calls = df[df['cache_hit'] == 0].groupby(['modelo', 'task_type'])['latencia_ms']
+    summary = pd.DataFrame({
+        'chamadas': grouped.size(),
+        'acertos_cache': grouped['cache_hit'].sum(),
+        'erros': grouped['erro'].count(),
+        'novas_tentativas': grouped['tentativas'].apply(lambda t: int((t - 1).clip(lower=0).sum())),
+        'p50_ms': model_calls.quantile(0.5),
+        'p95_ms': model_calls.quantile(0.95),
+        'tokens_entrada': grouped['prompt_tokens'].sum(),
+        'tokens_saida': grouped['output_tokens'].sum(),
+        'custo_usd': grouped['custo_usd'].sum(),
+    })
+    return summary.reset_index()
+
+
+def daily_spend(df: pd.DataFrame) -> pd.DataFrame:
+    """Custo estimado por dia (linhas) e unidade (colunas)."""
+    if df.empty:
+        return pd.DataFrame()
+    return df.pivot_table(index='dia', columns='unidade', values='custo_usd', aggfunc='sum', fill_value=0.0).sort_index()
+
+
+@st.cache_resource
+def get_metrics_store() -> AIMetricsStore | None:
+    """Store compartilhado pelo processo; None se o arquivo não puder ser aberto (as chamadas seguem sem métricas)."""
+    try:
+        return AIMetricsStore()
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Não foi possível abrir o registro de métricas de IA em '{METRICS_PATH}': {e}")
+        return None
@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import threading
+from typing import NamedTuple
+
+import streamlit as st
+import google.generativeai as genai
+import google.ai.generativelanguage as glm
+from google.generativeai.client import FileServiceClient
+
+logger = logging.getLogger('segsisone_app.model_registry')
+
+# Tarefa -> (chave nos secrets [general], modelo).
+TASK_MODELS = {
+    'extraction': ('GEMINI_EXTRACTION_KEY', 'gemini-2.5-flash'),
+    'audit': ('GEMINI_AUDIT_KEY', 'gemini-2.5-pro'),
+}
+# A busca semântica da base RAG usa a chave da auditoria.
+EMBEDDING_TASK = 'audit'
+EMBEDDING_MODEL = 'models/text-embedding-004'
+
+
+class ModelClient(NamedTuple):
+    """Modelo ligado à sua própria chave de API (sem depender do genai.configure global)."""
+    task_type: str
+    model_name: str
+    key_id: str
+    model: genai.GenerativeModel
+    generative_client: glm.GenerativeServiceClient
+    file_client: FileServiceClient
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Identificador curto da chave, para escopo de handles e logs (a chave nunca é registrada)."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Clientes e modelos Gemini criados uma única vez por (chave, modelo) e compartilhados
+    por todas as sessões. Cada modelo usa os clientes da própria chave, então a cota de
+    cada chamada é consumida da chave certa.
+    """
+
+    def __init__(self):
+        self._clients: dict[tuple, ModelClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str, model_name: str, task_type: str) -> ModelClient:
+        key_id = key_fingerprint(api_key)
+        with self._lock:
+            client = self._clients.get((key_id, model_name))
+            if client is None:
+                options = {'api_key': api_key}
+                generative_client = glm.GenerativeServiceClient(client_options=options)
+                model = genai.GenerativeModel(model_name)
+                model._client = generative_client
+                client = ModelClient(task_type, model.model_name, key_id, model, generative_client,
+                                     FileServiceClient(client_options=options))
+                self._clients[(key_id, model_name)] = client
+                logger.info(f"Modelo '{model_name}' ({task_type}) carregado com a chave {key_id}.")
+            return client
+
+
+@st.cache_resource
+def get_model_registry() -> ModelRegistry:
+    """Registro compartilhado pelo processo (todas as sessões)."""
+    return ModelRegistry()
+
+
+def get_api_key(task_type: str) -> str | None:
+    key_name, _ = TASK_MODELS[task_type]
+    try:
+        return st.secrets.get("general", {}).get(key_name)
+    except Exception as e:
+        logger.error(f"Não foi possível ler a chave '{key_name}' dos secrets: {e}")
+        return None
+
+
+def get_task_model(task_type: str) -> ModelClient | None:
+    """Modelo da tarefa ('extraction' ou 'audit'); None se a chave não estiver configurada."""
+    api_key = get_api_key(task_type)
+    if not api_key:
+        return None
+    _, model_name = TASK_MODELS[task_type]
+    return get_model_registry().get(api_key, model_name, task_type)
+
+
+def embed_query(text: str) -> list:
+    """Embedding de uma consulta com o cliente da chave de auditoria."""
+    client = get_task_model(EMBEDDING_TASK)
+    if client is None:
+        key_name, _ = TASK_MODELS[EMBEDDING_TASK]
+        raise ValueError(f"Chave '{key_name}' não configurada.")
+    result = genai.embed_content(
+        model=EMBEDDING_MODEL, content=[text], task_type="RETRIEVAL_QUERY", client=client.generative_client
+    )
+    return result['embedding']
@@ -0,0 +1,236 @@
+import io
+import re
+import logging
+from datetime import date
+from typing import NamedTuple
+
+from operations.normalization import padronizar_norma, find_dates
+from operations.nr_rules import get_nr_rules
+
+logger = logging.getLogger('segsisone_app.pdf_text')
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pypdf é opcional: sem ele todo documento segue o caminho completo da IA
+    PdfReader = PdfWriter = None
+
+# Abaixo disso (caracteres por página, em média) o PDF é tratado como digitalizado.
+MIN_CHARS_PER_PAGE = 150
+# Certificados e ASOs têm poucas páginas; documentos maiores vão inteiros para a IA.
+MAX_TEXT_PAGES = 15
+# Caracteres após a palavra-chave em que uma data é associada a ela.
+DATE_WINDOW = 80
+
+# Origem dos campos (PreExtraction.source).
+SOURCE_TEXT = 'texto'            # todos os campos vieram da camada de texto: sem chamada à IA
+SOURCE_PAGES = 'paginas'         # IA chamada só com as páginas relevantes
+SOURCE_FULL = 'completo'         # IA chamada com o PDF inteiro
+SOURCE_SCANNED = 'digitalizado'  # sem camada de texto: PDF inteiro para a IA
+
+_HOURS_RE = re.compile(r'carga\s*hor[áa]ria[^0-9\n]{0,25}(\d{1,3})(?:[.,]\d+)?\s*(?:h\b|hs\b|hrs?\b|horas)?', re.IGNORECASE)
+_NR_RE = re.compile(r'\bNR\s?-?\s?(\d{1,2})\b', re.IGNORECASE)
+_SPECIAL_NORMS = ('BRIGADA', 'RESGATE TÉCNICO', '16710', 'PERMISSÃO DE TRABALHO')
+_SEP_RE = re.compile(r'\bSEP\b|SISTEMA EL[ÉE]TRICO DE POT[ÊE]NCIA', re.IGNORECASE)
+_TRAINING_DATE_KEYS = re.compile(r'realizad|conclu[íi]d|per[íi]odo|t[ée]rmino|data do (?:curso|treinamento)', re.IGNORECASE)
+_TRAINING_PAGE_KEYS = re.compile(r'certific|carga\s*hor|\bNR\s?-?\s?\d', re.IGNORECASE)
+
+_ASO_TYPES = {
+    'Admissional': r'admissional',
+    'Periódico': r'peri[óo]dico',
+    'Demissional': r'demissional',
+    'Mudança de Risco': r'mudan[çc]a de (?:risco|fun[çc][ãa]o)',
+    'Retorno ao Trabalho': r'retorno ao trabalho',
+    'Monitoramento Pontual': r'monitoramento pontual',
+}
+_CHECKED = r'(?:\(\s*x\s*\)|\[\s*x\s*\]|☒|☑)\s*'
+_ASO_DATE_KEYS = re.compile(r'data d[oa] (?:exame|emiss[ãa]o|atendimento)|realizad[oa] em|emitido em', re.IGNORECASE)
+_ASO_EXPIRY_KEYS = re.compile(r'v[áa]lid[oa] at[ée]|validade|vencimento|pr[óo]ximo exame', re.IGNORECASE)
+_ASO_FIELD_RE = {
+    'cargo': re.compile(r'(?:cargo|fun[çc][ãa]o)\s*:\s*([^\n]{2,80})', re.IGNORECASE),
+    'riscos': re.compile(r'(?:riscos?(?:\s+ocupacionais)?(?:\s+espec[íi]ficos)?|agentes?\s+de\s+riscos?)\s*:\s*([^\n]{2,300})', re.IGNORECASE),
+}
+_NO_RISK_RE = re.compile(r'aus[êe]ncia de riscos?', re.IGNORECASE)
+_ASO_PAGE_KEYS = re.compile(r'\bASO\b|atestado de sa[úu]de|\bapto\b|\binapto\b', re.IGNORECASE)
+
+
+class PdfText(NamedTuple):
+    pages: list
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
+    @property
+    def scanned(self) -> bool:
+        return not self.pages or sum(len(p.strip()) for p in self.pages) / len(self.pages) < MIN_CHARS_PER_PAGE
+
+
+class PreExtraction(NamedTuple):
+    """
+    Resultado da leitura local. `fields` tem as mesmas chaves do JSON pedido à IA; se
+    `complete`, a chamada ao modelo pode ser dispensada. Caso contrário `model_content`
+    é o PDF a enviar (só as páginas relevantes, quando possível).
+    """
+    fields: dict
+    complete: bool
+    model_content: bytes
+    source: str
+
+
+def read_text_layer(content: bytes) -> PdfText | None:
+    """Texto de cada página; None sem pypdf, com PDF ilegível ou com páginas demais."""
+    if PdfReader is None:
+        return None
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        if reader.is_encrypted or len(reader.pages) > MAX_TEXT_PAGES:
+            return None
+        return PdfText([page.extract_text() or '' for page in reader.pages])
+    except Exception as e:
+        logger.info(f"Camada de texto do PDF não pôde ser lida: {e}")
+        return None
+
+
+def subset_pdf(content: bytes, page_indexes: list) -> bytes | None:
+    """Novo PDF só com as páginas indicadas (a saída é determinística, preservando o cache da IA)."""
+    try:
+        reader = PdfReader(io.BytesIO(content))
+        writer = PdfWriter()
+        for index in page_indexes:
+            writer.add_page(reader.pages[index])
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
+    except Exception as e:
+        logger.info(f"Não foi possível separar as páginas do PDF: {e}")
+        return None
+
+
+def _model_content(content: bytes, pdf_text: PdfText, page_keys: re.Pattern) -> tuple[bytes, str]:
+    relevant = [i for i, page in enumerate(pdf_text.pages) if page_keys.search(page)]
+    if relevant and len(relevant) < len(pdf_text.pages):
+        subset = subset_pdf(content, relevant)
+        if subset:
+            return subset, SOURCE_PAGES
+    return content, SOURCE_FULL
+
+
+def _dates_after(text: str, keys: re.Pattern) -> list[date]:
+    """Datas até DATE_WINDOW caracteres depois de cada ocorrência das palavras-chave."""
+    dates = find_dates(text)
+    found = []
+    for key in keys.finditer(text):
+        found.extend(d for pos, d in dates if key.end() <= pos <= key.end() + DATE_WINDOW)
+    return found
+
+
+def _single(values) -> object | None:
+    distinct = set(values)
+    return distinct.pop() if len(distinct) == 1 else None
+
+
+def _fmt(value: date | None) -> str | None:
+    return value.strftime('%d/%m/%Y') if value else None
+
+
+def _training_fields(text: str) -> tuple[dict, bool]:
+    rules = get_nr_rules()
+    upper = text.upper()
+    candidates = [padronizar_norma(f"NR-{m.group(1)}") for m in _NR_RE.finditer(upper)]
+    candidates += [padronizar_norma(term) for term in _SPECIAL_NORMS if term in upper]
+    candidates = [c for c in candidates if c in rules.normas]
+    norma = _single(candidates)
+    if norma is None and candidates:
+        # Certificados citam outras NRs de passagem; aceita a norma dominante.
+        counts = sorted(((candidates.count(c), c) for c in set(candidates)), reverse=True)
+        if counts[0][0] >= 2 * counts[1][0]:
+            norma = counts[0][1]
+
+    modulo = 'N/A'
+    module_ok = True
+    if norma == 'NR-10':
+        if _SEP_RE.search(text):
+            norma, modulo = 'NR-10 SEP', 'SEP'
+    elif norma and rules.modules_for(norma):
+        lower = text.lower()
+        found = [
+            module for module, terms in rules.module_terms(norma)
+            if any(re.search(rf'\b{re.escape(term)}\b', lower) for term in terms)
+        ]
+        modulo = found[0] if len(found) == 1 else 'N/A'
+        module_ok = len(found) == 1
+
+    has_recycling = re.search(r'reciclagem', text, re.IGNORECASE)
+    has_initial = re.search(r'\b(?:forma[çc][ãa]o|inicial)\b', text, re.IGNORECASE)
+    tipo = 'reciclagem' if has_recycling and not has_initial else 'formação' if has_initial and not has_recycling else None
+
+    hours = _single(int(m.group(1)) for m in _HOURS_RE.finditer(text))
+
+    today = date.today()
+    keyword_dates = [d for d in _dates_after(text, _TRAINING_DATE_KEYS) if d <= today]
+    # Mais de uma data após as palavras-chave (ex.: início e fim do curso) fica para o modelo.
+    data_realizacao = _single(keyword_dates) if keyword_dates else _single(d for _, d in find_dates(text) if d <= today)
+
+    fields = {
+        'norma': norma,
+        'modulo': modulo,
+        'data_realizacao': _fmt(data_realizacao),
+        'tipo_treinamento': tipo or 'formação',
+        'carga_horaria': hours,
+    }
+    complete = all([norma, module_ok, tipo, hours, data_realizacao])
+    return fields, complete
+
+
+def _aso_fields(text: str) -> tuple[dict, bool]:
+    checked = [name for name, pattern in _ASO_TYPES.items() if re.search(_CHECKED + pattern, text, re.IGNORECASE)]
+    mentioned = [name for name, pattern in _ASO_TYPES.items() if re.search(pattern, text, re.IGNORECASE)]
+    tipo = _single(checked) or (_single(mentioned) if not checked else None)
+
+    today = date.today()
+    data_aso = _single(d for d in _dates_after(text, _ASO_DATE_KEYS) if d <= today)
+    vencimento = _single(d for d in _dates_after(text, _ASO_EXPIRY_KEYS) if data_aso and d > data_aso)
+
+    values = {}
+    for key, pattern in _ASO_FIELD_RE.items():
+        match = pattern.search(text)
+        # Formulários costumam ter outro campo na mesma linha ("Função: X    Setor: Y").
+        values[key] = re.split(r'\s{3,}|\t', match.group(1).strip())[0] if match else None
+    if not values['riscos'] and _NO_RISK_RE.search(text):
+        values['riscos'] = "Ausência de riscos ocupacionais específicos"
+
+    fields = {
+        'data_aso': _fmt(data_aso),
+        'vencimento_aso': _fmt(vencimento),
+        'riscos': values['riscos'],
+        'cargo': values['cargo'],
+        'tipo_aso': tipo,
+    }
+    complete = all([data_aso, tipo, values['cargo'], values['riscos']])
+    return fields, complete
+
+
+def _pre_extract(content: bytes, field_reader, page_keys: re.Pattern, label: str) -> PreExtraction:
+    pdf_text = read_text_layer(content)
+    if pdf_text is None:
+        return PreExtraction({}, False, content, SOURCE_FULL)
+    if pdf_text.scanned:
+        logger.info(f"{label}: PDF digitalizado (sem camada de texto); enviando o documento inteiro à IA.")
+        return PreExtraction({}, False, content, SOURCE_SCANNED)
+
+    fields, complete = field_reader(pdf_text.text)
+    if complete:
+        logger.info(f"{label}: todos os campos lidos da camada de texto; chamada à IA dispensada.")
+        return PreExtraction(fields, True, content, SOURCE_TEXT)
+    model_content, source = _model_content(content, pdf_text, page_keys)
+    return PreExtraction(fields, False, model_content, source)
+
+
+def pre_extract_training(content: bytes) -> PreExtraction:
+    """Norma, módulo, data, tipo e carga horária de um certificado de treinamento."""
+    return _pre_extract(content, _training_fields, _TRAINING_PAGE_KEYS, "Treinamento")
+
+
+def pre_extract_aso(content: bytes) -> PreExtraction:
+    """Data, vencimento, riscos, cargo e tipo de um ASO."""
+    return _pre_extract(content, _aso_fields, _ASO_PAGE_KEYS, "ASO")
@@ -0,0 +1,224 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+from typing import NamedTuple
+
+import streamlit as st
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger('segsisone_app.ai_resilience')
+
+# Tipos de erro de uma chamada à IA (AIResult.error_kind).
+ERROR_QUOTA = 'quota'                # 429: cota/limite de requisições
+ERROR_UNAVAILABLE = 'unavailable'    # 500/503: instabilidade do serviço
+ERROR_TIMEOUT = 'timeout'            # tempo limite da chamada
+ERROR_CIRCUIT_OPEN = 'circuit_open'  # falha rápida: o modelo está com falhas seguidas
+ERROR_BLOCKED = 'blocked'            # resposta bloqueada/vazia (ex.: filtro de segurança)
+ERROR_INVALID = 'invalid_request'    # 400/403/404: requisição ou chave inválida
+ERROR_UNAVAILABLE_MODEL = 'model_unavailable'  # chave não configurada
+ERROR_UNKNOWN = 'unknown'
+
+RETRYABLE_ERRORS = (ERROR_QUOTA, ERROR_UNAVAILABLE, ERROR_TIMEOUT)
+
+ERROR_MESSAGES = {
+    ERROR_QUOTA: "Limite de uso da IA atingido. Aguarde alguns instantes e tente novamente.",
+    ERROR_UNAVAILABLE: "O serviço de IA está instável no momento.",
+    ERROR_TIMEOUT: "A IA demorou demais para responder.",
+    ERROR_CIRCUIT_OPEN: "A IA está temporariamente indisponível após falhas seguidas. Tente novamente em instantes.",
+    ERROR_BLOCKED: "A IA não retornou conteúdo para este documento.",
+    ERROR_INVALID: "A requisição à IA foi recusada (verifique a chave e o arquivo).",
+    ERROR_UNAVAILABLE_MODEL: "O modelo de IA não está configurado.",
+    ERROR_UNKNOWN: "Erro inesperado na comunicação com a IA.",
+}
+
+_RETRY_DELAY_RE = re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)')
+
+
+class RetryPolicy(NamedTuple):
+    """Parâmetros das chamadas; os padrões podem ser trocados por variáveis de ambiente."""
+    max_attempts: int = int(os.environ.get('SEGSISONE_AI_MAX_ATTEMPTS', 4))
+    base_delay: float = float(os.environ.get('SEGSISONE_AI_BASE_DELAY', 2.0))
+    max_delay: float = float(os.environ.get('SEGSISONE_AI_MAX_DELAY', 60.0))
+    timeout: float = float(os.environ.get('SEGSISONE_AI_TIMEOUT', 180.0))
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """Espera antes da tentativa seguinte: exponencial com jitter total, respeitando o retry_delay da API."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class AIResult(NamedTuple):
+    """Resultado de uma chamada à IA, sem efeitos na interface."""
+    text: str | None
+    duration: float = 0.0
+    error_kind: str | None = None
+    message: str = ''
+    attempts: int = 0
+    retry_after: float | None = None
+    from_cache: bool = False
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error_kind is None and self.text is not None
+
+    @property
+    def retryable(self) -> bool:
+        """True se vale tentar de novo mais tarde (cota, instabilidade, circuito aberto)."""
+        return self.error_kind in RETRYABLE_ERRORS or self.error_kind == ERROR_CIRCUIT_OPEN
+
+    @property
+    def user_message(self) -> str:
+        return ERROR_MESSAGES.get(self.error_kind, ERROR_MESSAGES[ERROR_UNKNOWN])
+
+
+def classify_error(error: Exception) -> tuple[str, float | None]:
+    """(tipo do erro, segundos sugeridos pela API para nova tentativa)."""
+    retry_after = None
+    match = _RETRY_DELAY_RE.search(str(error))
+    if match:
+        retry_after = float(match.group(1))
+    if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return ERROR_QUOTA, retry_after
+    if isinstance(error, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError, google_exceptions.BadGateway)):
+        return ERROR_UNAVAILABLE, retry_after
+    if isinstance(error, (google_exceptions.DeadlineExceeded, TimeoutError)):
+        return ERROR_TIMEOUT, retry_after
+    if isinstance(error, (google_exceptions.InvalidArgument, google_exceptions.PermissionDenied, google_exceptions.NotFound, google_exceptions.Unauthenticated)):
+        return ERROR_INVALID, retry_after
+    if isinstance(error, ValueError):
+        # response.text levanta ValueError quando não há partes (bloqueio/finish_reason).
+        return ERROR_BLOCKED, retry_after
+    text = str(error)
+    if '429' in text or 'quota' in text.lower():
+        return ERROR_QUOTA, retry_after
+    if '503' in text or '500' in text:
+        return ERROR_UNAVAILABLE, retry_after
+    return ERROR_UNKNOWN, retry_after
+
+
+class CircuitBreaker:
+    """
+    Disjuntor por modelo: após `failure_threshold` falhas seguidas de cota/instabilidade,
+    as chamadas falham na hora durante `reset_timeout` segundos. Depois disso uma única
+    chamada de teste é liberada; se der certo o circuito fecha, senão reabre.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def seconds_until_retry(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probe_in_flight:
+                    logger.warning(f"Circuito da IA aberto por {self.reset_timeout:.0f}s após {self._failures} falha(s) seguida(s).")
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class ModelGuard(NamedTuple):
+    semaphore: threading.BoundedSemaphore
+    breaker: CircuitBreaker
+
+
+# Chamadas simultâneas por modelo no processo (todas as sessões e threads).
+MODEL_CONCURRENCY = {
+    'extraction': int(os.environ.get('SEGSISONE_AI_EXTRACTION_CONCURRENCY', 4)),
+    'audit': int(os.environ.get('SEGSISONE_AI_AUDIT_CONCURRENCY', 2)),
+}
+
+
+@st.cache_resource
+def _get_guard_registry() -> dict:
+    return {'lock': threading.Lock(), 'guards': {}}
+
+
+def get_model_guard(model_name: str, task_type: str) -> ModelGuard:
+    """Semáforo e disjuntor compartilhados do modelo."""
+    registry = _get_guard_registry()
+    with registry['lock']:
+        guard = registry['guards'].get(model_name)
+        if guard is None:
+            guard = ModelGuard(threading.BoundedSemaphore(MODEL_CONCURRENCY.get(task_type, 2)), CircuitBreaker())
+            registry['guards'][model_name] = guard
+        return guard
+
+
+def call_with_resilience(func, model_name: str, task_type: str, policy: RetryPolicy | None = None) -> AIResult:
+    """
+    Executa `func(timeout)` (que devolve `(texto, (tokens do prompt, tokens da resposta))`)
+    com limite de concorrência do modelo, disjuntor e novas tentativas com backoff para
+    erros transitórios.
+    """
+    policy = policy or RetryPolicy()
+    guard = get_model_guard(model_name, task_type)
+    start = time.monotonic()
+    error_kind, retry_after, message = None, None, ''
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if not guard.breaker.allow():
+            wait = guard.breaker.seconds_until_retry()
+            return AIResult(None, time.monotonic() - start, ERROR_CIRCUIT_OPEN, f"Circuito aberto para '{model_name}'", attempt - 1, wait)
+
+        with guard.semaphore:
+            try:
+                text, (prompt_tokens, output_tokens) = func(policy.timeout)
+                guard.breaker.record_success()
+                return AIResult(text, time.monotonic() - start, attempts=attempt,
+                                prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+            except Exception as e:
+                error_kind, retry_after = classify_error(e)
+                message = str(e)
+
+        if error_kind not in RETRYABLE_ERRORS:
+            # Erros da requisição não indicam falha do serviço: não contam para o disjuntor.
+            guard.breaker.record_success()
+            logger.warning(f"IA '{model_name}': erro não recuperável ({error_kind}): {message}")
+            break
+        guard.breaker.record_failure()
+        if attempt == policy.max_attempts or guard.breaker.is_open:
+            break
+        delay = policy.backoff(attempt, retry_after)
+        logger.info(f"IA '{model_name}': {error_kind} na tentativa {attempt}/{policy.max_attempts}; nova tentativa em {delay:.1f}s.")
+        time.sleep(delay)
+
+    logger.error(f"IA '{model_name}': chamada falhou ({error_kind}) após {attempt} tentativa(s): {message}")
+    return AIResult(None, time.monotonic() - start, error_kind, message, attempt, retry_after)
@@ -20,16 +20,12 @@ if root_dir not in sys.path:
 # --- Importações ---
 from auth.login_page import show_login_page, show_user_header, show_logout_button
 from auth.auth_utils import authenticate_user, is_user_logged_in, get_user_role
-from gdrive.matrix_manager import MatrixManager
-from operations.training_matrix_manager import MatrixManager as TrainingMatrixManager
+from gdrive.matrix_directory import get_matrix_directory
 from front.dashboard import show_dashboard_page
 from front.administracao import show_admin_page
 from front.plano_de_acao import show_plano_acao_page
-from operations.employee import EmployeeManager
-from operations.company_docs import CompanyDocsManager
-from operations.epi import EPIManager
-from operations.action_plan import ActionPlanManager
-from analysis.nr_analyzer import NRAnalyzer 
+from front.lote import show_lote_page
+from operations.manager_pool import get_manager_pool
 
 def configurar_pagina():
     st.set_page_config(
@@ -42,41 +38,30 @@ def configurar_pagina():
 def initialize_managers():
     """
     Função central para criar, destruir e gerenciar as instâncias dos managers.
+    Os conjuntos de managers ficam em um pool LRU por unidade, então voltar a uma
+    unidade recente não exige reconstruí-los. Cada manager só é criado quando uma
+    página o solicita via `get_unit_manager`.
     """
     unit_id = st.session_state.get('spreadsheet_id')
     folder_id = st.session_state.get('folder_id')
+    pool = get_manager_pool()
     
     if unit_id and st.session_state.get('managers_unit_id') != unit_id:
-        logger.info(f"Trocando de unidade. Inicializando managers para a unidade: ...{unit_id[-6:]}")
-        with st.spinner("Configurando ambiente da unidade..."):
-            st.session_state.employee_manager = EmployeeManager(unit_id, folder_id)
-            st.session_state.docs_manager = CompanyDocsManager(unit_id, folder_id)
-            st.session_state.epi_manager = EPIManager(unit_id)
-            st.session_state.action_plan_manager = ActionPlanManager(unit_id)
-            st.session_state.nr_analyzer = NRAnalyzer(unit_id)
-            st.session_state.matrix_manager_unidade = TrainingMatrixManager(unit_id)
+        logger.info(f"Trocando de unidade. Ativando managers para a unidade: ...{unit_id[-6:]}")
+        pool.park(st.session_state.get('managers_unit_id'))
+        pool.acquire(unit_id, folder_id)
             
         st.session_state.managers_unit_id = unit_id
         st.session_state.managers_initialized = True
-        logger.info("Managers da unidade inicializados com sucesso.")
+        logger.info("Unidade ativada. Os managers serão criados sob demanda.")
     
     elif not unit_id:
         if st.session_state.get('managers_initialized', False):
             logger.info("Nenhuma unidade selecionada. Resetando managers da unidade.")
-            keys_to_delete = [
-                'employee_manager', 'docs_manager', 'epi_manager', 
-                'action_plan_manager', 'nr_analyzer', 'managers_unit_id', 
-                'matrix_manager_unidade'
-            ]
-            for key in keys_to_delete:
-                if key in st.session_state:
-                    del st.session_state[key]
+            pool.park(st.session_state.get('managers_unit_id'))
+            if 'managers_unit_id' in st.session_state:
+                del st.session_state['managers_unit_id']
         st.session_state.managers_initialized = False
-    
-    if 'matrix_manager' not in st.session_state:
-        logger.info("Inicializando MatrixManager global...")
-        st.session_state.matrix_manager = MatrixManager()
-        logger.info("MatrixManager global inicializado.")
 
 def main():
     configurar_pagina()
@@ -96,10 +81,9 @@ def main():
         user_role = get_user_role()
 
         if user_role == 'admin':
-            matrix_manager = st.session_state.matrix_manager
+            directory = get_matrix_directory()
             
-            all_units = matrix_manager.get_all_units()
-            unit_options = [unit['nome_unidade'] for unit in all_units]
+            unit_options = list(directory.unit_names)
             unit_options.insert(0, 'Global')
             current_unit_name = st.session_state.get('unit_name', 'Global')
             
@@ -121,18 +105,18 @@ def main():
                     st.session_state.spreadsheet_id = None
                     st.session_state.folder_id = None
                 else:
-                    unit_info = matrix_manager.get_unit_info(selected_admin_unit)
+                    unit_info = directory.get_unit_info(selected_admin_unit)
                     if unit_info:
                         st.session_state.unit_name = unit_info['nome_unidade']
                         st.session_state.spreadsheet_id = unit_info['spreadsheet_id']
                         st.session_state.folder_id = unit_info['folder_id']
                 
-                # Força a re-inicialização dos managers no próximo ciclo
-                st.session_state.managers_unit_id = None 
+                # A troca de spreadsheet_id faz initialize_managers buscar o conjunto no pool
                 st.rerun()
 
         menu_items = {
             "Dashboard": {"icon": "clipboard2-data-fill", "function": show_dashboard_page},
+            "Entrada em Lote": {"icon": "file-earmark-zip-fill", "function": show_lote_page},
             "Plano de Ação": {"icon": "clipboard2-check-fill", "function": show_plano_acao_page},
         }
         if user_role == 'admin':
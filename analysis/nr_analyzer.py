@@ -1,17 +1,27 @@
+import os
+import logging
 import streamlit as st
 import pandas as pd
 import numpy as np
-import google.generativeai as genai
 import re
 import json
-import tempfile
-import os
 import random
 from datetime import datetime
 from sklearn.metrics.pairwise import cosine_similarity
 from AI.api_Operation import PDFQA
+from AI.model_registry import embed_query
 from operations.sheet import SheetOperations
 
+logger = logging.getLogger('segsisone_app.nr_analyzer')
+
+# Tipos de documento analisados em modo combinado: uma única chamada ao modelo de auditoria
+# devolve a extração e a auditoria. Ex.: SEGSISONE_AI_COMBINED_TYPES="ASO,Treinamento".
+COMBINED_MODE_TYPES = {t.strip() for t in os.environ.get('SEGSISONE_AI_COMBINED_TYPES', '').split(',') if t.strip()}
+
+
+def use_combined_mode(doc_type: str) -> bool:
+    return doc_type in COMBINED_MODE_TYPES
+
 @st.cache_data(ttl=3600)
 def load_preprocessed_rag_base() -> tuple[pd.DataFrame, np.ndarray | None]:
     """
@@ -31,40 +41,53 @@ def load_preprocessed_rag_base() -> tuple[pd.DataFrame, np.ndarray | None]:
 class NRAnalyzer:
     def __init__(self, spreadsheet_id: str):
         """
-        Inicialização que carrega a base RAG e lida com as mensagens de UI.
+        Inicialização leve: o analisador de PDF e a base RAG só são carregados
+        quando uma auditoria ou busca semântica é de fato executada.
         """
-        self.pdf_analyzer = PDFQA()
         self.sheet_ops = SheetOperations(spreadsheet_id)
-        
+        self._pdf_analyzer = None
+        self._rag_df = None
+        self._rag_embeddings = None
+
+    @property
+    def pdf_analyzer(self):
+        if self._pdf_analyzer is None:
+            self._pdf_analyzer = PDFQA(unit_id=self.sheet_ops.spreadsheet_id)
+        return self._pdf_analyzer
+
+    @property
+    def rag_df(self) -> pd.DataFrame:
+        if self._rag_df is None:
+            self._load_rag_base()
+        return self._rag_df
+
+    @property
+    def rag_embeddings(self) -> np.ndarray:
+        if self._rag_embeddings is None:
+            self._load_rag_base()
+        return self._rag_embeddings
+
+    def _load_rag_base(self):
+        """Carrega a base RAG no primeiro uso e lida com as mensagens de UI."""
         with st.spinner("Carregando base de conhecimento..."):
-            self.rag_df, self.rag_embeddings = load_preprocessed_rag_base()
+            rag_df, rag_embeddings = load_preprocessed_rag_base()
 
         # Verifica o resultado do carregamento e mostra as mensagens apropriadas
-        if self.rag_df is None or self.rag_embeddings is None:
+        if rag_df is None or rag_embeddings is None:
             st.error("ERRO CRÍTICO: Arquivos da base de conhecimento ('rag_dataframe.pkl' ou 'rag_embeddings.npy') não encontrados. A funcionalidade de auditoria com IA será desativada.")
             # Garante que os atributos sejam DataFrames vazios para evitar erros posteriores
-            self.rag_df = pd.DataFrame()
-            self.rag_embeddings = np.array([])
+            self._rag_df = pd.DataFrame()
+            self._rag_embeddings = np.array([])
         else:
+            self._rag_df, self._rag_embeddings = rag_df, rag_embeddings
             st.toast("Base de conhecimento carregada com sucesso.", icon="🧠")
-        
-        try:
-            if not st.secrets.get("general", {}).get("GEMINI_AUDIT_KEY"):
-                 st.warning("Chave 'GEMINI_AUDIT_KEY' não encontrada. A busca na base de conhecimento será desativada.")
-        except Exception:
-            pass
 
     def _find_semantically_relevant_chunks(self, query_text: str, top_k: int = 5) -> str:
         if self.rag_df.empty or self.rag_embeddings is None or self.rag_embeddings.size == 0:
             return "Base de conhecimento indisponível ou não indexada."
 
         try:
-            query_embedding_result = genai.embed_content(
-                model='models/text-embedding-004',  # CORRIGIDO: Modelo atualizado
-                content=[query_text],
-                task_type="RETRIEVAL_QUERY"
-            )
-            query_embedding = np.array(query_embedding_result['embedding'])
+            query_embedding = np.array(embed_query(query_text))
             
             similarities = cosine_similarity(query_embedding, self.rag_embeddings)[0]
             top_k_indices = similarities.argsort()[-top_k:][::-1]
@@ -75,28 +98,82 @@ class NRAnalyzer:
             st.warning(f"Erro durante a busca semântica (verifique a chave de API): {e}")
             return "Erro ao buscar chunks relevantes na base de conhecimento."
             
-    def perform_initial_audit(self, doc_info: dict, file_content: bytes) -> dict | None:
+    def _relevant_knowledge(self, doc_info: dict) -> str:
         doc_type = doc_info.get("type", "documento")
         norma = doc_info.get("norma", "")
         query = f"Quais são os principais requisitos de conformidade para um {doc_type} da norma {norma}?"
-        
-        relevant_knowledge = self._find_semantically_relevant_chunks(query, top_k=7)
+        return self._find_semantically_relevant_chunks(query, top_k=7)
+
+    def perform_initial_audit(self, doc_info: dict, file_content: bytes) -> dict | None:
+        relevant_knowledge = self._relevant_knowledge(doc_info)
         
         if "Base de conhecimento indisponível" in relevant_knowledge:
              return {"summary": "Falha na Auditoria", "details": [{"item_verificacao": "Base de conhecimento indisponível.", "status": "Não Conforme"}]}
 
         prompt = self._get_advanced_audit_prompt(doc_info, relevant_knowledge)
         
-        temp_path = None
+        analysis_result, _ = self.pdf_analyzer.answer_question([file_content], prompt, task_type='audit', expect_json=True)
+        return self._parse_advanced_audit_result(analysis_result) if analysis_result else None
+
+    def perform_combined_analysis(self, doc_info: dict, file_content: bytes, extraction_prompt: str) -> tuple[dict | None, dict | None]:
+        """
+        Extração e auditoria numa única chamada ao modelo de auditoria (modo combinado).
+        Retorna (JSON de extração, resultado da auditoria); a parte que vier ausente ou
+        malformada volta como None e deve ser obtida pela chamada separada.
+        """
+        relevant_knowledge = self._relevant_knowledge(doc_info)
+        if "Base de conhecimento indisponível" in relevant_knowledge:
+            return None, {"summary": "Falha na Auditoria", "details": [{"item_verificacao": "Base de conhecimento indisponível.", "status": "Não Conforme"}]}
+
+        prompt = self._get_combined_prompt(doc_info, relevant_knowledge, extraction_prompt)
+        result = self.pdf_analyzer.ask([file_content], prompt, task_type='audit', expect_json=True)
+        if not result.ok:
+            logger.warning(f"Modo combinado: chamada falhou ({result.error_kind}); usando chamadas separadas.")
+            return None, None
+        extraction, audit_result = self._parse_combined_result(result.text)
+        if extraction is None or audit_result is None:
+            logger.warning(f"Modo combinado: resposta malformada para '{doc_info.get('type')}' (extração {'ok' if extraction else 'inválida'}, auditoria {'ok' if audit_result else 'inválida'}).")
+        return extraction, audit_result
+
+    def _get_combined_prompt(self, doc_info: dict, relevant_knowledge: str, extraction_prompt: str) -> str:
+        return f"""
+        {self._get_advanced_audit_prompt(doc_info, relevant_knowledge)}
+
+        **Tarefa Adicional (Extração de Dados):** Além da auditoria, extraia os dados do mesmo documento seguindo as instruções abaixo.
+        ---
+        {extraction_prompt}
+        ---
+
+        **Formato FINAL da Resposta (substitui os formatos acima):** responda APENAS com um único objeto JSON com duas chaves:
+        ```json
+        {{
+          "extracao": {{ ... o JSON de extração ... }},
+          "auditoria": {{ ... o JSON de auditoria, com "parecer_final", "resumo_executivo" e "pontos_de_nao_conformidade" ... }}
+        }}
+        ```
+        """
+
+    def _parse_combined_result(self, json_string: str) -> tuple[dict | None, dict | None]:
+        """Valida as duas partes da resposta combinada; cada parte inválida volta como None."""
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(file_content)
-                temp_path = temp_file.name
-            analysis_result, _ = self.pdf_analyzer.answer_question([temp_path], prompt, task_type='audit')
-            return self._parse_advanced_audit_result(analysis_result) if analysis_result else None
-        finally:
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
+            match = re.search(r'\{.*\}', json_string, re.DOTALL)
+            data = json.loads(match.group(0)) if match else None
+        except json.JSONDecodeError:
+            data = None
+        if not isinstance(data, dict):
+            return None, None
+
+        extraction = data.get("extracao")
+        if not isinstance(extraction, dict) or not extraction:
+            extraction = None
+
+        audit_data = data.get("auditoria")
+        audit_result = None
+        if (isinstance(audit_data, dict) and isinstance(audit_data.get("parecer_final"), str)
+                and isinstance(audit_data.get("pontos_de_nao_conformidade", []), list)
+                and all(isinstance(item, dict) for item in audit_data.get("pontos_de_nao_conformidade", []))):
+            audit_result = self._audit_result_from_data(audit_data)
+        return extraction, audit_result
 
     def _get_advanced_audit_prompt(self, doc_info: dict, relevant_knowledge: str) -> str:
         doc_type = doc_info.get("type", "documento")
@@ -270,28 +347,31 @@ class NRAnalyzer:
             if not match:
                 return {"summary": "Falha na Análise", "details": [{"item_verificacao": "Resposta Bruta da IA", "observacao": json_string, "status": "Não Conforme"}]}
             data = json.loads(match.group(0))
-            summary = data.get("parecer_final", "Indefinido")
-            details = []
-            
-            if data.get("resumo_executivo"):
-                status_resumo = "Conforme" if "conforme" in summary.lower() else "Não Conforme"
-                details.append({"item_verificacao": "Resumo Executivo da Auditoria", "referencia_normativa": "N/A", "observacao": data["resumo_executivo"], "status": status_resumo})
-            
-            for item in data.get("pontos_de_nao_conformidade", []):
-                details.append({"item_verificacao": item.get("item", ""), "referencia_normativa": item.get("referencia_normativa", ""), "observacao": item.get("observacao", ""), "status": "Não Conforme"})
-
-            for item in data.get("pontos_de_ressalva", []):
-                details.append({
-                    "item_verificacao": f"Ressalva: {item.get('item', '')}",
-                    "referencia_normativa": item.get("referencia_normativa", ""),
-                    "observacao": item.get("observacao", ""),
-                    "status": "Ressalva"
-                })
-
-            return {"summary": summary, "details": details}
+            return self._audit_result_from_data(data)
         except (json.JSONDecodeError, AttributeError):
             return {"summary": "Falha na Análise (Erro de JSON)", "details": [{"item_verificacao": "Resposta Bruta da IA", "observacao": json_string, "status": "Não Conforme"}]}
 
+    def _audit_result_from_data(self, data: dict) -> dict:
+        summary = data.get("parecer_final", "Indefinido")
+        details = []
+        
+        if data.get("resumo_executivo"):
+            status_resumo = "Conforme" if "conforme" in summary.lower() else "Não Conforme"
+            details.append({"item_verificacao": "Resumo Executivo da Auditoria", "referencia_normativa": "N/A", "observacao": data["resumo_executivo"], "status": status_resumo})
+        
+        for item in data.get("pontos_de_nao_conformidade", []):
+            details.append({"item_verificacao": item.get("item", ""), "referencia_normativa": item.get("referencia_normativa", ""), "observacao": item.get("observacao", ""), "status": "Não Conforme"})
+
+        for item in data.get("pontos_de_ressalva", []):
+            details.append({
+                "item_verificacao": f"Ressalva: {item.get('item', '')}",
+                "referencia_normativa": item.get("referencia_normativa", ""),
+                "observacao": item.get("observacao", ""),
+                "status": "Ressalva"
+            })
+
+        return {"summary": summary, "details": details}
+
     def create_action_plan_from_audit(self, audit_result: dict, company_id: str, doc_id: str, employee_id: str | None = None):
         """
         O employee_id ainda pode ser passado para o LOG, mas NÃO será inserido na planilha.
@@ -1,5 +1,5 @@
 import streamlit as st
-from gdrive.matrix_manager import MatrixManager
+from gdrive.matrix_directory import get_matrix_directory
 
 def is_oidc_available():
     """Verifica se o login OIDC está configurado e disponível."""
@@ -34,8 +34,9 @@ def authenticate_user() -> bool:
     if st.session_state.get('authenticated_user_email') == user_email:
         return True
 
-    matrix_manager = MatrixManager()
-    user_info = matrix_manager.get_user_info(user_email)
+    # Diretório compartilhado entre sessões: busca direta por e-mail, sem montar DataFrames.
+    directory = get_matrix_directory()
+    user_info = directory.get_user_info(user_email)
 
     if not user_info:
         st.error(f"Acesso negado. Seu e-mail ({user_email}) não está autorizado a usar este sistema.")
@@ -52,7 +53,7 @@ def authenticate_user() -> bool:
         st.session_state.spreadsheet_id = None
         st.session_state.folder_id = None
     else:
-        unit_info = matrix_manager.get_unit_info(unit_name)
+        unit_info = directory.get_unit_info(unit_name)
         if not unit_info:
             st.error(f"Erro de configuração: A unidade '{unit_name}' associada ao seu usuário não foi encontrada na Planilha Matriz.")
             st.session_state.clear()
@@ -4,7 +4,7 @@ import smtplib
 import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import date, timedelta
+from datetime import date
 import pandas as pd
 import logging
 
@@ -19,7 +19,8 @@ if root_dir not in sys.path:
 
 from operations.employee import EmployeeManager
 from operations.company_docs import CompanyDocsManager
-from gdrive.matrix_manager import MatrixManager
+from operations.compliance import get_unit_compliance
+from gdrive.matrix_directory import get_matrix_directory
 
 def get_smtp_config():
     """
@@ -77,11 +78,10 @@ def _get_empty_categories():
 
 def categorize_expirations_for_unit(employee_manager: EmployeeManager, docs_manager: CompanyDocsManager):
     """
-    ✅ CORRIGIDO: Categoriza os vencimentos com tratamento robusto de erros
+    ✅ CORRIGIDO: Categoriza os vencimentos com tratamento robusto de erros.
+    Os itens vigentes vêm do motor de conformidade (mesma regra do dashboard).
     """
     try:
-        today = date.today()
-        
         # ✅ Verificações de segurança
         if not employee_manager.data_loaded_successfully:
             logger.warning("Dados do EmployeeManager não foram carregados")
@@ -94,153 +94,41 @@ def categorize_expirations_for_unit(employee_manager: EmployeeManager, docs_mana
         if employee_manager.companies_df.empty:
             logger.warning("DataFrame de empresas está vazio")
             return _get_empty_categories()
-            
-        active_companies = employee_manager.companies_df[
-            employee_manager.companies_df['status'].str.lower() == 'ativo'
-        ].copy()
         
-        if active_companies.empty:
+        compliance = get_unit_compliance(employee_manager, docs_manager)
+        if not compliance['companies']['ativo'].any():
             logger.info("Nenhuma empresa ativa encontrada")
             return _get_empty_categories()
-        
-        # ✅ Processa funcionários ativos
-        active_employees = pd.DataFrame()
-        if not employee_manager.employees_df.empty:
-            active_employees = employee_manager.employees_df[
-                (employee_manager.employees_df['status'].str.lower() == 'ativo') &
-                (employee_manager.employees_df['empresa_id'].isin(active_companies['id']))
-            ].copy()
-
-        # --- Processamento de Treinamentos ---
-        latest_trainings = pd.DataFrame()
-        if not employee_manager.training_df.empty and not active_employees.empty:
-            trainings_actives = employee_manager.training_df[
-                employee_manager.training_df['funcionario_id'].isin(active_employees['id'])
-            ].copy()
-            
-            if not trainings_actives.empty and 'vencimento' in trainings_actives.columns:
-                trainings_actives['vencimento_dt'] = pd.to_datetime(
-                    trainings_actives['vencimento'], errors='coerce'
-                ).dt.date
-                trainings_actives.dropna(subset=['vencimento_dt'], inplace=True)
-                
-                if not trainings_actives.empty:
-                    latest_trainings = trainings_actives.sort_values(
-                        'data', ascending=False
-                    ).groupby(['funcionario_id', 'norma']).head(1).copy()
-        
-        # --- Processamento de ASOs ---
-        latest_asos = pd.DataFrame()
-        if not employee_manager.aso_df.empty and not active_employees.empty:
-            asos_actives = employee_manager.aso_df[
-                employee_manager.aso_df['funcionario_id'].isin(active_employees['id'])
-            ].copy()
-            
-            if not asos_actives.empty and 'vencimento' in asos_actives.columns:
-                aptitude_asos = asos_actives[
-                    ~asos_actives['tipo_aso'].str.lower().isin(['demissional'])
-                ].copy()
-                
-                if not aptitude_asos.empty:
-                    aptitude_asos['vencimento_dt'] = pd.to_datetime(
-                        aptitude_asos['vencimento'], errors='coerce'
-                    ).dt.date
-                    aptitude_asos.dropna(subset=['vencimento_dt'], inplace=True)
-                    
-                    if not aptitude_asos.empty:
-                        latest_asos = aptitude_asos.sort_values(
-                            'data_aso', ascending=False
-                        ).groupby('funcionario_id').head(1).copy()
 
-        # --- Processamento de Documentos da Empresa ---
-        latest_company_docs = pd.DataFrame()
-        if not docs_manager.docs_df.empty:
-            docs_actives = docs_manager.docs_df[
-                docs_manager.docs_df['empresa_id'].isin(active_companies['id'])
-            ].copy()
-            
-            if not docs_actives.empty and 'vencimento' in docs_actives.columns:
-                docs_actives['vencimento_dt'] = pd.to_datetime(
-                    docs_actives['vencimento'], errors='coerce'
-                ).dt.date
-                docs_actives.dropna(subset=['vencimento_dt'], inplace=True)
-                
-                if not docs_actives.empty:
-                    latest_company_docs = docs_actives.sort_values(
-                        'data_emissao', ascending=False
-                    ).groupby(['empresa_id', 'tipo_documento']).head(1).copy()
-
-        # --- Filtros de Vencimento ---
-        vencidos_tr = latest_trainings[
-            latest_trainings['vencimento_dt'] < today
-        ].copy() if not latest_trainings.empty else pd.DataFrame()
-        
-        vence_15_tr = latest_trainings[
-            (latest_trainings['vencimento_dt'] >= today) & 
-            (latest_trainings['vencimento_dt'] <= today + timedelta(days=15))
-        ].copy() if not latest_trainings.empty else pd.DataFrame()
-        
-        vence_45_tr = latest_trainings[
-            (latest_trainings['vencimento_dt'] > today + timedelta(days=15)) & 
-            (latest_trainings['vencimento_dt'] <= today + timedelta(days=45))
-        ].copy() if not latest_trainings.empty else pd.DataFrame()
-        
-        vencidos_aso = latest_asos[
-            latest_asos['vencimento_dt'] < today
-        ].copy() if not latest_asos.empty else pd.DataFrame()
-        
-        vence_15_aso = latest_asos[
-            (latest_asos['vencimento_dt'] >= today) & 
-            (latest_asos['vencimento_dt'] <= today + timedelta(days=15))
-        ].copy() if not latest_asos.empty else pd.DataFrame()
-        
-        vence_45_aso = latest_asos[
-            (latest_asos['vencimento_dt'] > today + timedelta(days=15)) & 
-            (latest_asos['vencimento_dt'] <= today + timedelta(days=45))
-        ].copy() if not latest_asos.empty else pd.DataFrame()
-
-        vencidos_docs = latest_company_docs[
-            latest_company_docs['vencimento_dt'] < today
-        ].copy() if not latest_company_docs.empty else pd.DataFrame()
-        
-        vence_30_docs = latest_company_docs[
-            (latest_company_docs['vencimento_dt'] >= today) & 
-            (latest_company_docs['vencimento_dt'] <= today + timedelta(days=30))
-        ].copy() if not latest_company_docs.empty else pd.DataFrame()
+        # ✅ Apenas itens de funcionários/empresas ativos e com vencimento válido
+        def active_items(df):
+            if df.empty:
+                return pd.DataFrame()
+            return df[df['ativo'] & df['dias_para_vencer'].notna()]
 
-        # --- Adiciona informações de nome/empresa ---
-        if not active_employees.empty:
-            employee_id_to_name = active_employees.set_index('id')['nome']
-            employee_id_to_company_name = active_employees.set_index('id')['empresa_id'].map(
-                active_companies.set_index('id')['nome']
-            )
+        def due_between(df, first_day, last_day):
+            if df.empty:
+                return pd.DataFrame()
+            return df[df['dias_para_vencer'].between(first_day, last_day)].copy()
 
-            for df in [vencidos_tr, vence_15_tr, vence_45_tr, vencidos_aso, vence_15_aso, vence_45_aso]:
-                if not df.empty and 'funcionario_id' in df.columns:
-                    try:
-                        df['nome_funcionario'] = df['funcionario_id'].map(employee_id_to_name)
-                        df['empresa'] = df['funcionario_id'].map(employee_id_to_company_name)
-                    except Exception as e:
-                        logger.error(f"Erro ao adicionar informações de funcionário: {e}")
+        def expired(df):
+            if df.empty:
+                return pd.DataFrame()
+            return df[df['dias_para_vencer'] < 0].copy()
 
-        if not active_companies.empty:
-            company_id_to_name = active_companies.set_index('id')['nome']
-            for df in [vencidos_docs, vence_30_docs]:
-                if not df.empty and 'empresa_id' in df.columns:
-                    try:
-                        df['empresa'] = df['empresa_id'].map(company_id_to_name)
-                    except Exception as e:
-                        logger.error(f"Erro ao adicionar informações de empresa: {e}")
+        latest_trainings = active_items(compliance['trainings'])
+        latest_asos = active_items(compliance['asos'])
+        latest_company_docs = active_items(compliance['company_docs'])
 
         return {
-            "Treinamentos Vencidos": vencidos_tr, 
-            "Treinamentos que vencem em até 15 dias": vence_15_tr, 
-            "Treinamentos que vencem entre 16 e 45 dias": vence_45_tr,
-            "ASOs Vencidos": vencidos_aso, 
-            "ASOs que vencem em até 15 dias": vence_15_aso, 
-            "ASOs que vencem entre 16 e 45 dias": vence_45_aso,
-            "Documentos da Empresa Vencidos": vencidos_docs, 
-            "Documentos da Empresa que vencem nos próximos 30 dias": vence_30_docs,
+            "Treinamentos Vencidos": expired(latest_trainings), 
+            "Treinamentos que vencem em até 15 dias": due_between(latest_trainings, 0, 15), 
+            "Treinamentos que vencem entre 16 e 45 dias": due_between(latest_trainings, 16, 45),
+            "ASOs Vencidos": expired(latest_asos), 
+            "ASOs que vencem em até 15 dias": due_between(latest_asos, 0, 15), 
+            "ASOs que vencem entre 16 e 45 dias": due_between(latest_asos, 16, 45),
+            "Documentos da Empresa Vencidos": expired(latest_company_docs), 
+            "Documentos da Empresa que vencem nos próximos 30 dias": due_between(latest_company_docs, 0, 30),
         }
     except Exception as e:
         logger.error(f"Erro crítico ao categorizar vencimentos: {e}", exc_info=True)
@@ -636,8 +524,7 @@ def main():
     try:
         config = get_smtp_config()
         
-        matrix_manager = MatrixManager()
-        all_units = matrix_manager.get_all_units()
+        all_units = get_matrix_directory().get_all_units()
         
         if not all_units:
             logger.warning("⚠️ Nenhuma unidade encontrada na matriz. Encerrando.")
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
 from gdrive.matrix_manager import MatrixManager as GlobalMatrixManager
 from operations.employee import EmployeeManager
 from operations.company_docs import CompanyDocsManager
@@ -8,12 +8,18 @@ from auth.auth_utils import check_permission
 from ui.metrics import display_minimalist_metrics
 from gdrive.google_api_manager import GoogleApiManager
 from operations.audit_logger import log_action
+from operations.audit_log_reader import get_audit_log_reader
+from operations.audit_log_partitions import archive_closed_partitions
+from operations.manager_pool import get_unit_manager
+from operations.compliance import get_unit_compliance
+from operations.nr_rules import get_nr_rules
 
 @st.cache_data(ttl=300)
 def load_aggregated_data():
     """
-    Carrega e agrega dados de TODAS as unidades, incluindo a conversão e tratamento
-    de colunas de data. Retorna uma tupla de 5 DataFrames limpos.
+    Carrega os dados de TODAS as unidades e calcula a conformidade de cada uma com o
+    motor de conformidade. Retorna uma tupla de 5 DataFrames (empresas, funcionários,
+    ASOs vigentes, treinamentos vigentes e documentos da empresa), com a coluna 'unidade'.
     """
     progress_bar = st.progress(0, text="Carregando dados consolidados de todas as unidades...")
     matrix_manager_global = GlobalMatrixManager()
@@ -35,18 +41,11 @@ def load_aggregated_data():
             # Carrega os managers da unidade para acessar seus DataFrames já processados
             temp_employee_manager = EmployeeManager(spreadsheet_id, folder_id)
             temp_docs_manager = CompanyDocsManager(spreadsheet_id, folder_id)
-            
-            data_map = {
-                "companies": temp_employee_manager.companies_df,
-                "employees": temp_employee_manager.employees_df,
-                "asos": temp_employee_manager.aso_df,
-                "trainings": temp_employee_manager.training_df,
-                "company_docs": temp_docs_manager.docs_df
-            }
-
-            for key, df in data_map.items():
+            compliance = get_unit_compliance(temp_employee_manager, temp_docs_manager)
+
+            for key, df in compliance.items():
                 if not df.empty:
-                    df_copy = df.copy()
+                    df_copy = df.reset_index(drop=True)
                     df_copy['unidade'] = unit_name
                     aggregated_data[key].append(df_copy)
                     
@@ -60,21 +59,6 @@ def load_aggregated_data():
         key: (pd.concat(value, ignore_index=True) if value else pd.DataFrame()) 
         for key, value in aggregated_data.items()
     }
-    
-    # ASOs
-    if not final_dfs["asos"].empty and 'vencimento' in final_dfs["asos"].columns:
-        final_dfs["asos"]['vencimento'] = pd.to_datetime(final_dfs["asos"]['vencimento'], errors='coerce')
-        final_dfs["asos"]['data_aso'] = pd.to_datetime(final_dfs["asos"]['data_aso'], errors='coerce')
-
-    # Treinamentos
-    if not final_dfs["trainings"].empty and 'vencimento' in final_dfs["trainings"].columns:
-        final_dfs["trainings"]['vencimento'] = pd.to_datetime(final_dfs["trainings"]['vencimento'], errors='coerce')
-        final_dfs["trainings"]['data'] = pd.to_datetime(final_dfs["trainings"]['data'], errors='coerce')
-
-    # Documentos da Empresa
-    if not final_dfs["company_docs"].empty and 'vencimento' in final_dfs["company_docs"].columns:
-        final_dfs["company_docs"]['vencimento'] = pd.to_datetime(final_dfs["company_docs"]['vencimento'], errors='coerce')
-        final_dfs["company_docs"]['data_emissao'] = pd.to_datetime(final_dfs["company_docs"]['data_emissao'], errors='coerce')
 
     return (
         final_dfs["companies"], 
@@ -87,8 +71,8 @@ def load_aggregated_data():
 
 def display_global_summary_dashboard(companies_df, employees_df, asos_df, trainings_df, company_docs_df):
     """
-    Calcula e exibe o dashboard de resumo executivo com lógica robusta para tratamento de dados,
-    cálculo de pendências e detalhamento da unidade mais crítica.
+    Exibe o dashboard de resumo executivo a partir das tabelas de conformidade das
+    unidades: pendências por categoria, por unidade e detalhamento da unidade mais crítica.
     """
     st.header("Dashboard de Resumo Executivo Global")
 
@@ -96,117 +80,33 @@ def display_global_summary_dashboard(companies_df, employees_df, asos_df, traini
         st.info("Nenhuma empresa encontrada em todas as unidades. Não há dados para exibir.")
         return
 
-    # --- 1. Filtra para entidades ATIVAS primeiro ---
-    active_companies = companies_df[companies_df['status'].str.lower() == 'ativo'].copy()
+    # --- 1. Considera apenas entidades ATIVAS ---
+    active_companies = companies_df[companies_df['ativo']]
     if active_companies.empty:
         st.info("Nenhuma empresa ativa encontrada. O dashboard considera apenas entidades ativas.")
         return
     
-    active_employees = pd.DataFrame()
-    if not employees_df.empty:
-        active_employees = employees_df[
-            (employees_df['status'].str.lower() == 'ativo') &
-            (employees_df['empresa_id'].isin(active_companies['id']))
-        ].copy()
-    
+    active_employees = employees_df[employees_df['ativo']] if not employees_df.empty else pd.DataFrame()
     if active_employees.empty:
         st.warning("Nenhum funcionário ativo encontrado. Pendências de ASOs e Treinamentos não serão calculadas.")
 
     # --- 2. Métricas Gerais ---
     # ✅ CORREÇÃO: Conta apenas unidades que TÊM dados
-    units_with_data = companies_df[companies_df['unidade'].notna()]['unidade'].unique()
-    total_units = len(units_with_data)
-    
-    total_active_companies = len(active_companies)
-    total_active_employees = len(active_employees)
+    total_units = companies_df['unidade'].nunique()
 
     col1, col2, col3 = st.columns(3)
     col1.metric("Unidades Operacionais", f"{total_units}")
-    col2.metric("Total de Empresas Ativas", total_active_companies)
-    col3.metric("Total de Funcionários Ativos", total_active_employees)
+    col2.metric("Total de Empresas Ativas", len(active_companies))
+    col3.metric("Total de Funcionários Ativos", len(active_employees))
     st.divider()
 
-    # --- 3. Cálculo de Pendências (Lógica Robusta) ---
-    today = date.today()
-    expired_asos, expired_trainings, expired_company_docs = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    # --- 3. Pendências: itens vigentes vencidos de entidades ativas ---
+    def expired_active(df):
+        return df[df['ativo'] & df['vencido']] if not df.empty else pd.DataFrame()
 
-    # ✅ CORREÇÃO: Processa ASOs apenas se houver funcionários ativos
-    if not asos_df.empty and not active_employees.empty:
-        asos_actives = asos_df[
-            asos_df['funcionario_id'].isin(active_employees['id'])
-        ].copy()
-        
-        if not asos_actives.empty and 'vencimento' in asos_actives.columns:
-            asos_actives.dropna(subset=['vencimento'], inplace=True)
-            
-            if not asos_actives.empty:
-                # ✅ CORREÇÃO: Filtra demissionais ANTES de calcular vencimento
-                asos_aptitude = asos_actives[
-                    ~asos_actives['tipo_aso'].str.lower().isin(['demissional'])
-                ].copy()
-                
-                if not asos_aptitude.empty:
-                    latest_asos = asos_aptitude.sort_values(
-                        'data_aso', ascending=False
-                    ).groupby('funcionario_id').head(1).copy()
-                    
-                    # ✅ CORREÇÃO: Verifica se há datas válidas
-                    latest_asos_valid = latest_asos[
-                        latest_asos['vencimento'].notna()
-                    ].copy()
-                    
-                    if not latest_asos_valid.empty:
-                        expired_asos = latest_asos_valid[
-                            latest_asos_valid['vencimento'].dt.date < today
-                        ].copy()
-
-    # ✅ CORREÇÃO: Processa Treinamentos apenas se houver funcionários ativos
-    if not trainings_df.empty and not active_employees.empty:
-        trainings_actives = trainings_df[
-            trainings_df['funcionario_id'].isin(active_employees['id'])
-        ].copy()
-        
-        if not trainings_actives.empty and 'vencimento' in trainings_actives.columns:
-            trainings_actives.dropna(subset=['vencimento'], inplace=True)
-            
-            if not trainings_actives.empty:
-                latest_trainings = trainings_actives.sort_values(
-                    'data', ascending=False
-                ).groupby(['funcionario_id', 'norma']).head(1).copy()
-                
-                # ✅ CORREÇÃO: Verifica se há datas válidas
-                latest_trainings_valid = latest_trainings[
-                    latest_trainings['vencimento'].notna()
-                ].copy()
-                
-                if not latest_trainings_valid.empty:
-                    expired_trainings = latest_trainings_valid[
-                        latest_trainings_valid['vencimento'].dt.date < today
-                    ].copy()
-
-    # ✅ CORREÇÃO: Processa Documentos apenas se houver empresas ativas
-    if not company_docs_df.empty and not active_companies.empty:
-        docs_actives = company_docs_df[
-            company_docs_df['empresa_id'].isin(active_companies['id'])
-        ].copy()
-        
-        if not docs_actives.empty and 'vencimento' in docs_actives.columns:
-            docs_actives.dropna(subset=['vencimento'], inplace=True)
-            
-            if not docs_actives.empty:
-                latest_docs = docs_actives.sort_values(
-                    'data_emissao', ascending=False
-                ).groupby(['empresa_id', 'tipo_documento']).head(1).copy()
-                
-                # ✅ CORREÇÃO: Verifica se há datas válidas
-                latest_docs_valid = latest_docs[
-                    latest_docs['vencimento'].notna()
-                ].copy()
-                
-                if not latest_docs_valid.empty:
-                    expired_company_docs = latest_docs_valid[
-                        latest_docs_valid['vencimento'].dt.date < today
-                    ].copy()
+    expired_asos = expired_active(asos_df)
+    expired_trainings = expired_active(trainings_df)
+    expired_company_docs = expired_active(company_docs_df)
 
     total_pendencies = len(expired_asos) + len(expired_trainings) + len(expired_company_docs)
     
@@ -225,34 +125,17 @@ def display_global_summary_dashboard(companies_df, employees_df, asos_df, traini
     # --- 5. Consolidação e Gráfico de Barras ---
     st.subheader("Gráfico de Pendências por Unidade Operacional")
 
-    # ✅ CORREÇÃO: Garante que 'unidade' exista nos DataFrames antes de agrupar
-    counts_list = []
-    
-    if not expired_asos.empty and 'unidade' in expired_asos.columns:
-        aso_counts = expired_asos.groupby('unidade').size().rename("ASOs Vencidos")
-        counts_list.append(aso_counts)
-    
-    if not expired_trainings.empty and 'unidade' in expired_trainings.columns:
-        training_counts = expired_trainings.groupby('unidade').size().rename("Treinamentos Vencidos")
-        counts_list.append(training_counts)
-    
-    if not expired_company_docs.empty and 'unidade' in expired_company_docs.columns:
-        docs_counts = expired_company_docs.groupby('unidade').size().rename("Docs. Empresa Vencidos")
-        counts_list.append(docs_counts)
+    categories = {
+        "ASOs Vencidos": expired_asos,
+        "Treinamentos Vencidos": expired_trainings,
+        "Docs. Empresa Vencidos": expired_company_docs,
+    }
+    counts_list = [
+        df.groupby('unidade').size().rename(label)
+        for label, df in categories.items() if not df.empty
+    ]
     
-    if not counts_list:
-        st.info("Nenhuma pendência encontrada para gerar o gráfico.")
-        return
-
     df_consolidated = pd.concat(counts_list, axis=1).fillna(0).astype(int)
-    
-    # ✅ CORREÇÃO CRÍTICA: Remove linhas com soma zero ANTES de qualquer operação
-    df_consolidated = df_consolidated[df_consolidated.sum(axis=1) > 0]
-
-    if df_consolidated.empty:
-        st.success("Todas as pendências foram resolvidas. Gráfico não será exibido.")
-        return
-
     st.bar_chart(df_consolidated)
     
     with st.expander("Ver tabela de dados de pendências consolidada"):
@@ -267,86 +150,14 @@ def display_global_summary_dashboard(companies_df, employees_df, asos_df, traini
     most_critical_unit = df_consolidated.sum(axis=1).idxmax()
     st.subheader(f"🔍 Detalhes da Unidade Mais Crítica: {most_critical_unit}")
 
-    # ✅ CORREÇÃO: Verifica se a unidade existe nos DataFrames ANTES de filtrar
-    unit_active_companies = active_companies[
-        active_companies['unidade'] == most_critical_unit
-    ].copy()
-    
-    unit_active_employees = active_employees[
-        active_employees['unidade'] == most_critical_unit
-    ].copy()
-
-    if unit_active_companies.empty:
-        st.warning(f"Nenhuma empresa ativa encontrada na unidade '{most_critical_unit}'.")
-        return
-
-    employee_to_company_id = unit_active_employees.set_index('id')['empresa_id']
-    company_id_to_name = unit_active_companies.set_index('id')['nome']
-    
-    pendencies_by_company = {}
+    unit_expired = pd.concat(
+        [df.loc[df['unidade'] == most_critical_unit, ['empresa']] for df in categories.values() if not df.empty],
+        ignore_index=True
+    ).dropna(subset=['empresa'])
 
-    # ✅ CORREÇÃO: Detalhamento de ASOs com verificação robusta
-    if not expired_asos.empty and 'unidade' in expired_asos.columns:
-        expired_asos_unit = expired_asos[
-            expired_asos['unidade'] == most_critical_unit
-        ].copy()
-        
-        if not expired_asos_unit.empty and not employee_to_company_id.empty:
-            expired_asos_unit['empresa_id'] = expired_asos_unit['funcionario_id'].map(
-                employee_to_company_id
-            )
-            expired_asos_unit['nome_empresa'] = expired_asos_unit['empresa_id'].map(
-                company_id_to_name
-            )
-            expired_asos_unit.dropna(subset=['nome_empresa'], inplace=True)
-            
-            if not expired_asos_unit.empty:
-                aso_counts = expired_asos_unit.groupby('nome_empresa').size().to_dict()
-                for comp, count in aso_counts.items():
-                    pendencies_by_company[comp] = pendencies_by_company.get(comp, 0) + count
-
-    # ✅ CORREÇÃO: Detalhamento de Treinamentos com verificação robusta
-    if not expired_trainings.empty and 'unidade' in expired_trainings.columns:
-        expired_trainings_unit = expired_trainings[
-            expired_trainings['unidade'] == most_critical_unit
-        ].copy()
-        
-        if not expired_trainings_unit.empty and not employee_to_company_id.empty:
-            expired_trainings_unit['empresa_id'] = expired_trainings_unit['funcionario_id'].map(
-                employee_to_company_id
-            )
-            expired_trainings_unit['nome_empresa'] = expired_trainings_unit['empresa_id'].map(
-                company_id_to_name
-            )
-            expired_trainings_unit.dropna(subset=['nome_empresa'], inplace=True)
-            
-            if not expired_trainings_unit.empty:
-                training_counts = expired_trainings_unit.groupby('nome_empresa').size().to_dict()
-                for comp, count in training_counts.items():
-                    pendencies_by_company[comp] = pendencies_by_company.get(comp, 0) + count
-
-    # ✅ CORREÇÃO: Detalhamento de Documentos com verificação robusta
-    if not expired_company_docs.empty and 'unidade' in expired_company_docs.columns:
-        expired_docs_unit = expired_company_docs[
-            expired_company_docs['unidade'] == most_critical_unit
-        ].copy()
-        
-        if not expired_docs_unit.empty:
-            expired_docs_unit['nome_empresa'] = expired_docs_unit['empresa_id'].map(
-                company_id_to_name
-            )
-            expired_docs_unit.dropna(subset=['nome_empresa'], inplace=True)
-            
-            if not expired_docs_unit.empty:
-                doc_counts = expired_docs_unit.groupby('nome_empresa').size().to_dict()
-                for comp, count in doc_counts.items():
-                    pendencies_by_company[comp] = pendencies_by_company.get(comp, 0) + count
-
-    if pendencies_by_company:
-        company_pendencies_df = pd.DataFrame(
-            list(pendencies_by_company.items()), 
-            columns=['Empresa', 'Nº de Pendências']
-        )
+    if not unit_expired.empty:
+        company_pendencies_df = unit_expired.groupby('empresa').size().reset_index(name='Nº de Pendências')
+        company_pendencies_df.rename(columns={'empresa': 'Empresa'}, inplace=True)
         st.dataframe(
             company_pendencies_df.sort_values(by='Nº de Pendências', ascending=False), 
             use_container_width=True, 
@@ -354,7 +165,8 @@ def display_global_summary_dashboard(companies_df, employees_df, asos_df, traini
         )
     else:
         st.info(f"Nenhuma pendência encontrada na unidade '{most_critical_unit}'.")
-        
+
+
 @st.dialog("Gerenciar Usuário")
 def user_dialog(user_data=None):
     is_edit_mode = user_data is not None
@@ -434,12 +246,39 @@ def show_admin_page():
 
         with tab_logs:
             st.header("📜 Logs de Auditoria do Sistema")
-            matrix_manager_global = GlobalMatrixManager()
-            logs_df = matrix_manager_global.get_audit_logs()
+            log_reader = get_audit_log_reader()
+            col_mode, col_opts, col_refresh = st.columns([2, 3, 1])
+            log_mode = col_mode.radio("Consultar por", ["Registros recentes", "Período"], horizontal=True, key="log_mode")
+            force_refresh = col_refresh.button("🔄 Atualizar", key="log_refresh")
+
+            if log_mode == "Registros recentes":
+                c1, c2 = col_opts.columns(2)
+                page_size = c1.selectbox("Registros por página", [50, 100, 200, 500], index=2, key="log_page_size")
+                page_number = c2.number_input("Página", min_value=1, value=1, step=1, key="log_page") - 1
+                logs_df = log_reader.page(int(page_number), page_size, force_refresh=force_refresh)
+            else:
+                today = date.today()
+                period = col_opts.date_input("Período", value=(today - timedelta(days=7), today), key="log_period")
+                if isinstance(period, (list, tuple)) and len(period) == 2:
+                    logs_df = log_reader.between(period[0], period[1], force_refresh=force_refresh)
+                else:
+                    st.info("Selecione a data inicial e a final do período.")
+                    logs_df = pd.DataFrame()
+
             if not logs_df.empty:
-                st.dataframe(logs_df.sort_values(by='timestamp', ascending=False), width='stretch', hide_index=True)
+                st.dataframe(logs_df, width='stretch', hide_index=True)
             else:
                 st.info("Nenhum registro de log encontrado.")
+
+            with st.expander("🗄️ Arquivo local das partições encerradas"):
+                st.caption("Os logs são particionados por mês. Partições encerradas podem ser copiadas para um arquivo local compactado, e as consultas a esses meses deixam de acessar a API.")
+                if st.button("Arquivar partições encerradas", key="archive_log_partitions"):
+                    with st.spinner("Arquivando partições..."):
+                        archived = archive_closed_partitions(log_reader.sheet_ops)
+                    if archived:
+                        st.success(f"Partições arquivadas: {', '.join(archived)}")
+                    else:
+                        st.info("Nenhuma partição pendente de arquivamento.")
         
         with tab_global_manage:
             st.header("Gerenciamento Global do Sistema")
@@ -521,6 +360,110 @@ def show_admin_page():
                     
                     st.balloons()
 
+            with st.expander("🧪 Revalidação de Treinamentos pelas Regras de NR"):
+                rules = get_nr_rules()
+                st.markdown(f"""
+                Avalia todos os treinamentos gravados contra as regras vigentes (versão **{rules.version}**):
+                carga horária mínima, vencimento calculado, data de realização e normas sem regra.
+                As unidades são processadas em paralelo.
+
+                Com a correção ativada, os vencimentos divergentes são regravados em lote (uma escrita por unidade).
+                """)
+                unit_names = [u.get('nome_unidade') for u in matrix_manager_global.get_all_units() if u.get('nome_unidade')]
+                selected_units = st.multiselect("Unidades", unit_names, default=unit_names, key="revalidation_units")
+                apply_fixes = st.checkbox("Corrigir vencimentos divergentes", key="revalidation_apply")
+
+                if st.button("🔍 Revalidar Treinamentos", key="run_revalidation", disabled=not selected_units):
+                    from operations.training_revalidation import run_revalidation
+
+                    units = [u for u in matrix_manager_global.get_all_units() if u.get('nome_unidade') in selected_units]
+                    with st.spinner(f"Revalidando treinamentos de {len(units)} unidade(s)..."):
+                        findings, summary = run_revalidation(units, apply_fixes=apply_fixes)
+                    log_action("REVALIDATE_TRAININGS", {
+                        "units": selected_units, "rules_version": rules.version,
+                        "findings": len(findings), "apply_fixes": apply_fixes,
+                    })
+                    if apply_fixes:
+                        load_aggregated_data.clear()
+
+                    st.markdown("### Resumo por Unidade")
+                    st.dataframe(summary, width='stretch', hide_index=True)
+                    if findings.empty:
+                        st.success("Nenhum problema encontrado nos treinamentos.")
+                    else:
+                        st.markdown(f"### Achados ({len(findings)})")
+                        st.dataframe(
+                            findings.drop(columns=['data_invalida', 'carga_insuficiente', 'vencimento_divergente', 'sem_regra']),
+                            width='stretch', hide_index=True,
+                            column_config={
+                                "data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+                                "vencimento": st.column_config.DateColumn("Vencimento", format="DD/MM/YYYY"),
+                                "vencimento_regra": st.column_config.DateColumn("Vencimento pela Regra", format="DD/MM/YYYY"),
+                            },
+                        )
+                        st.download_button(
+                            "📥 Baixar achados (CSV)", findings.to_csv(index=False).encode('utf-8'),
+                            file_name=f"revalidacao_treinamentos_v{rules.version}.csv", mime="text/csv",
+                        )
+
+            with st.expander("🧠 Cache de Respostas da IA"):
+                from AI.extraction_cache import get_extraction_cache
+
+                ai_cache = get_extraction_cache()
+                if ai_cache is None:
+                    st.warning("O cache de respostas da IA não está disponível neste servidor.")
+                else:
+                    cache_stats = ai_cache.stats()
+                    c1, c2, c3, c4 = st.columns(4)
+                    c1.metric("Respostas guardadas", cache_stats['entradas'])
+                    c2.metric("Tamanho", f"{cache_stats['tamanho_bytes'] / (1024 * 1024):.1f} / {cache_stats['limite_bytes'] // (1024 * 1024)} MB")
+                    c3.metric("Taxa de acerto", f"{cache_stats['taxa_acerto']:.0%}", help=f"{cache_stats['acertos']} acertos, {cache_stats['faltas']} faltas desde o início do processo.")
+                    c4.metric("Removidas (LRU)", cache_stats['remocoes'])
+                    if st.button("Limpar cache da IA", key="clear_ai_cache"):
+                        ai_cache.clear()
+                        log_action("CLEAR_AI_CACHE", {"entries": cache_stats['entradas']})
+                        st.success("Cache da IA limpo.")
+
+            with st.expander("📈 Métricas da IA"):
+                from AI.metrics import get_metrics_store, latency_summary, daily_spend
+
+                metrics_store = get_metrics_store()
+                if metrics_store is None:
+                    st.warning("O registro de métricas da IA não está disponível neste servidor.")
+                else:
+                    metrics_days = st.selectbox("Período", [1, 7, 30, 90], index=2, format_func=lambda d: f"Últimos {d} dia(s)", key="ai_metrics_days")
+                    calls_df = metrics_store.load(metrics_days)
+                    if calls_df.empty:
+                        st.info("Nenhuma chamada à IA registrada no período.")
+                    else:
+                        model_calls = calls_df[calls_df['cache_hit'] == 0]
+                        c1, c2, c3, c4 = st.columns(4)
+                        c1.metric("Chamadas", len(calls_df), help=f"{len(model_calls)} ao modelo, {len(calls_df) - len(model_calls)} respondidas pelo cache.")
+                        c2.metric("Latência p95", f"{model_calls['latencia_ms'].quantile(0.95) / 1000:.1f} s" if not model_calls.empty else "-")
+                        c3.metric("Com erro", int(calls_df['erro'].notna().sum()))
+                        c4.metric("Custo estimado", f"US$ {calls_df['custo_usd'].sum():.2f}")
+
+                        st.markdown("**Latência e volume por modelo e tarefa**")
+                        st.dataframe(
+                            latency_summary(calls_df), hide_index=True, width='stretch',
+                            column_config={
+                                "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.0f"),
+                                "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.0f"),
+                                "custo_usd": st.column_config.NumberColumn("Custo (US$)", format="%.4f"),
+                            },
+                        )
+
+                        errors = calls_df['erro'].value_counts()
+                        if not errors.empty:
+                            st.markdown("**Erros por tipo**")
+                            st.dataframe(errors.rename_axis('erro').reset_index(name='ocorrências'), hide_index=True)
+
+                        unit_names = {u['spreadsheet_id']: u['nome_unidade'] for u in GlobalMatrixManager().get_all_units()}
+                        calls_df['unidade'] = calls_df['unidade'].map(lambda sid: unit_names.get(sid, sid or 'Global'))
+                        st.markdown("**Custo estimado por dia e unidade (US$)**")
+                        st.bar_chart(daily_spend(calls_df))
+                        st.caption("Custo estimado pelos tokens informados pela API e pela tabela de preços em AI/metrics.py; respostas do cache não contam.")
+
             with st.expander("Provisionar Nova Unidade Operacional"):
                 with st.form("provision_form"):
                     new_unit_name = st.text_input("Nome da Nova Unidade")
@@ -586,12 +529,11 @@ def show_admin_page():
             st.warning("Aguardando a inicialização dos dados da unidade...")
             st.stop()
 
-        employee_manager = st.session_state.employee_manager
-        matrix_manager_unidade = st.session_state.matrix_manager_unidade
-        nr_analyzer = st.session_state.nr_analyzer
+        employee_manager = get_unit_manager('employee_manager')
+        matrix_manager_unidade = get_unit_manager('matrix_manager_unidade')
 
         st.subheader("Visão Geral de Pendências da Unidade")
-        display_minimalist_metrics(employee_manager)
+        display_minimalist_metrics(employee_manager, get_unit_manager('docs_manager'), matrix_manager_unidade)
         st.divider()
 
         tab_list_unidade = ["Gerenciar Empresas", "Gerenciar Funcionários", "Gerenciar Matriz", "Assistente de Matriz (IA)"]
@@ -649,7 +591,48 @@ def show_admin_page():
                             st.rerun()
                         else:
                             st.error("Todos os campos são obrigatórios.")
-        
+
+        with st.expander("📥 Importar Empresas e Funcionários em Lote (CSV/XLSX)"):
+            st.caption(
+                "Colunas esperadas: empresa, cnpj, nome, cargo, data_admissao (DD/MM/AAAA). "
+                "CNPJs já cadastrados usam a empresa existente; CNPJs novos criam a empresa. "
+                "Linhas só com empresa e CNPJ cadastram apenas a empresa."
+            )
+            from operations.bulk_import import BulkImporter, read_import_file, STATUS_OK
+
+            import_file = st.file_uploader("Arquivo", type=["csv", "xlsx"], key="bulk_import_file")
+            if import_file:
+                try:
+                    import_df = read_import_file(import_file)
+                except Exception as e:
+                    st.error(f"Não foi possível ler o arquivo: {e}")
+                    import_df = None
+
+                if import_df is not None:
+                    importer = BulkImporter(employee_manager)
+                    plan = importer.validate(import_df)
+                    valid_rows = int((plan['erros'].map(len) == 0).sum())
+                    col1, col2 = st.columns(2)
+                    col1.metric("Linhas válidas", valid_rows)
+                    col2.metric("Linhas com erro", len(plan) - valid_rows)
+                    st.dataframe(
+                        plan.assign(erros=plan['erros'].map('; '.join)).reset_index()[['linha', 'empresa', 'cnpj', 'nome', 'cargo', 'data_admissao', 'erros']],
+                        width='stretch', hide_index=True,
+                    )
+                    if st.button(f"🚀 Importar {valid_rows} linha(s) válida(s)", type="primary", disabled=valid_rows == 0, key="run_bulk_import"):
+                        with st.spinner("Gravando em lote..."):
+                            import_result = importer.run(plan)
+                        st.session_state.bulk_import_result = import_result
+
+            if 'bulk_import_result' in st.session_state:
+                import_result = st.session_state.bulk_import_result
+                imported = int((import_result['status'] == STATUS_OK).sum())
+                st.success(f"Importação concluída: {imported} de {len(import_result)} linha(s) importada(s).")
+                st.dataframe(import_result, width='stretch', hide_index=True)
+                if st.button("Limpar resultado", key="clear_bulk_import"):
+                    del st.session_state.bulk_import_result
+                    st.rerun()
+
         st.subheader("Funcionários Cadastrados na Unidade")
         company_filter = st.selectbox("Filtrar por Empresa", options=['Todas'] + employee_manager.companies_df['id'].tolist(), format_func=lambda x: 'Todas' if x == 'Todas' else employee_manager.get_company_name(x))
         
@@ -715,7 +698,7 @@ def show_admin_page():
                 st.markdown("#### Mapear Treinamento para Função")
                 if not matrix_manager_unidade.functions_df.empty:
                     func_id = st.selectbox("Selecione a Função", options=matrix_manager_unidade.functions_df['id'], format_func=lambda id: matrix_manager_unidade.functions_df[matrix_manager_unidade.functions_df['id'] == id]['nome_funcao'].iloc[0])
-                    norm = st.selectbox("Selecione o Treinamento", options=sorted(list(employee_manager.nr_config.keys())))
+                    norm = st.selectbox("Selecione o Treinamento", options=get_nr_rules().normas)
                     if st.form_submit_button("Mapear"):
                         _, msg = matrix_manager_unidade.add_training_to_function(func_id, norm)
                         st.success(msg)
@@ -747,7 +730,7 @@ def show_admin_page():
             if st.button("Gerar Recomendações da IA"):
                 func_name_rec = matrix_manager_unidade.functions_df[matrix_manager_unidade.functions_df['id'] == func_id_rec]['nome_funcao'].iloc[0]
                 with st.spinner("IA pensando..."):
-                    recs, msg = matrix_manager_unidade.get_training_recommendations_for_function(func_name_rec, nr_analyzer)
+                    recs, msg = matrix_manager_unidade.get_training_recommendations_for_function(func_name_rec, get_unit_manager('nr_analyzer'))
                 if recs is not None:
                     st.session_state.recommendations = recs
                     st.session_state.selected_function_for_rec = func_id_rec
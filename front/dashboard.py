@@ -1,10 +1,11 @@
 import streamlit as st
 from datetime import date
 import pandas as pd
-from fuzzywuzzy import fuzz
 import logging
 
 from auth.auth_utils import check_permission
+from operations.manager_pool import get_unit_manager
+from operations.compliance import get_unit_compliance, STATUS_OK
 from ui.ui_helpers import (
     mostrar_info_normas,
     highlight_expired,
@@ -93,10 +94,10 @@ def show_dashboard_page():
         st.warning("Selecione uma unidade operacional para visualizar o dashboard.")
         return
         
-    employee_manager = st.session_state.employee_manager
-    docs_manager = st.session_state.docs_manager
-    epi_manager = st.session_state.epi_manager
-    matrix_manager_unidade = st.session_state.matrix_manager_unidade
+    employee_manager = get_unit_manager('employee_manager')
+    docs_manager = get_unit_manager('docs_manager')
+    epi_manager = get_unit_manager('epi_manager')
+    matrix_manager_unidade = get_unit_manager('matrix_manager_unidade')
     
     st.title("Dashboard de Conformidade")
     
@@ -143,40 +144,28 @@ def show_dashboard_page():
                 employees = employee_manager.get_employees_by_company(selected_company)
                 
                 if not employees.empty:
+                    # Status de todos os funcionários da unidade, calculado em uma única passada
+                    employee_status = get_unit_compliance(employee_manager, docs_manager, matrix_manager_unidade)['employees']
                     for index, employee in employees.iterrows():
                         employee_id = employee.get('id')
                         employee_name = employee.get('nome', 'N/A')
                         employee_cargo = employee.get('cargo', 'N/A')
-                        today = date.today()
+                        status = employee_status.loc[employee_id]
 
-                        aso_status, aso_vencimento = 'Não encontrado', None
+                        aso_status = status['aso_status']
+                        aso_vencimento = status['aso_vencimento'] if pd.notna(status['aso_vencimento']) else None
                         latest_asos = employee_manager.get_latest_aso_by_employee(employee_id)
-                        if isinstance(latest_asos, pd.DataFrame) and not latest_asos.empty:
-                            aptitude_asos = latest_asos[~latest_asos['tipo_aso'].str.lower().isin(['demissional'])].copy()
-                            if not aptitude_asos.empty:
-                                current_aso = aptitude_asos.sort_values('data_aso', ascending=False).iloc[0]
-                                vencimento_obj = current_aso.get('vencimento')
-                                if pd.notna(vencimento_obj):
-                                    aso_vencimento = vencimento_obj
-                                    aso_status = 'Válido' if aso_vencimento.date() >= today else 'Vencido'
-                                else:
-                                    aso_status = 'Venc. Inválido'
-                            else:
-                                aso_status = 'Apenas Demissional'
-
                         all_trainings = employee_manager.get_all_trainings_by_employee(employee_id)
-                        trainings_total, trainings_expired_count = 0, 0
-                        if isinstance(all_trainings, pd.DataFrame) and not all_trainings.empty:
-                            trainings_total = len(all_trainings)
-                            trainings_expired_count = (all_trainings['vencimento'].dt.date < today).sum()
+                        trainings_total = status['treinamentos_total']
+                        trainings_expired_count = status['treinamentos_vencidos']
 
-                        overall_status = 'Em Dia' if aso_status != 'Vencido' and trainings_expired_count == 0 else 'Pendente'
-                        status_icon = "✅" if overall_status == 'Em Dia' else "⚠️"
+                        overall_status = status['status_geral']
+                        status_icon = "✅" if overall_status == STATUS_OK else "⚠️"
                         
                         with st.expander(f"{status_icon} **{employee_name}** - *{employee_cargo}*"):
-                            num_pendencias = trainings_expired_count + (1 if aso_status == 'Vencido' else 0)
+                            num_pendencias = status['pendencias']
                             col1, col2, col3 = st.columns(3)
-                            col1.metric("Status Geral", overall_status, f"{num_pendencias} pendência(s)" if num_pendencias > 0 else "Nenhuma", delta_color="inverse" if overall_status != 'Em Dia' else "off")
+                            col1.metric("Status Geral", overall_status, f"{num_pendencias} pendência(s)" if num_pendencias > 0 else "Nenhuma", delta_color="inverse" if overall_status != STATUS_OK else "off")
                             col2.metric("Status do ASO", aso_status, help=f"Vencimento: {aso_vencimento.strftime('%d/%m/%Y') if aso_vencimento else 'N/A'}")
                             col3.metric("Treinamentos Vencidos", f"{trainings_expired_count} de {trainings_total}")
                             
@@ -259,76 +248,17 @@ def show_dashboard_page():
                             if not employee_cargo or employee_cargo == 'N/A':
                                 st.info("Cargo não definido, impossibilitando análise de matriz.")
                             else:
-                                matched_function = matrix_manager_unidade.find_closest_function(employee_cargo)
+                                matched_function = status['funcao_matriz']
                                 if not matched_function:
                                     st.success(f"O cargo '{employee_cargo}' não possui treinamentos obrigatórios na matriz da unidade.")
                                 else:
                                     if matched_function.lower() != employee_cargo.lower():
                                         st.caption(f"Analisando com base na função da matriz mais próxima: **'{matched_function}'**")
                                     
-                                    required_trainings = matrix_manager_unidade.get_required_trainings_for_function(matched_function)
-                                    
-                                    if not required_trainings:
+                                    if not status['treinamentos_obrigatorios']:
                                         st.success(f"Nenhum treinamento obrigatório mapeado para a função '{matched_function}'.")
                                     else:
-                                        # ✅ Cria lista de treinamentos realizados (norma + módulo normalizados)
-                                        completed_trainings = []
-
-                                        if isinstance(all_trainings, pd.DataFrame) and not all_trainings.empty:
-                                            for _, row in all_trainings.iterrows():
-                                                norma = str(row.get('norma', '')).strip().upper()
-                                                modulo = str(row.get('modulo', 'N/A')).strip().title()
-                                                
-                                                # Normalização especial
-                                                if 'NR-10' in norma:
-                                                    if 'SEP' in norma or 'SEP' in modulo.upper():
-                                                        completed_trainings.append('nr-10 sep')
-                                                        completed_trainings.append('nr-10-sep')
-                                                    else:
-                                                        completed_trainings.append('nr-10')
-                                                        completed_trainings.append('nr-10 básico')
-                                                
-                                                elif 'NR-33' in norma:
-                                                    if 'SUPERVISOR' in modulo.upper():
-                                                        completed_trainings.append('nr-33 supervisor')
-                                                    elif 'TRABALHADOR' in modulo.upper() or 'AUTORIZADO' in modulo.upper():
-                                                        completed_trainings.append('nr-33 trabalhador autorizado')
-                                                    completed_trainings.append('nr-33')
-                                                
-                                                else:
-                                                    # Adiciona variações normalizadas
-                                                    completed_trainings.append(norma.lower())
-                                                    
-                                                    if modulo and modulo not in ['N/A', 'nan', '']:
-                                                        completed_trainings.append(f"{norma} - {modulo}".lower())
-                                                        completed_trainings.append(f"{norma} {modulo}".lower())
-                                                        completed_trainings.append(f"{norma}-{modulo}".lower())
-
-                                        # ✅ Verifica treinamentos faltantes
-                                        missing = []
-                                        for req in required_trainings:
-                                            req_lower = req.lower().strip()
-                                            
-                                            # ✅ CORREÇÃO CRÍTICA: NR-10 Básico NÃO cobre NR-10 SEP
-                                            if 'nr-10 sep' in req_lower or 'nr-10-sep' in req_lower:
-                                                # Verifica especificamente por SEP
-                                                has_sep = any('sep' in comp for comp in completed_trainings if 'nr-10' in comp)
-                                                if not has_sep:
-                                                    missing.append(req)
-                                                continue
-                                            
-                                            # Verifica match exato ou fuzzy (score > 85)
-                                            has_match = any(
-                                                req_lower == comp or 
-                                                req_lower in comp or 
-                                                comp in req_lower or
-                                                fuzz.ratio(req_lower, comp) > 85
-                                                for comp in completed_trainings
-                                            )
-                                            
-                                            if not has_match:
-                                                missing.append(req)
-
+                                        missing = status['treinamentos_faltantes']
                                         if not missing:
                                             st.success("✅ Todos os treinamentos obrigatórios foram realizados.")
                                         else:
@@ -400,7 +330,7 @@ def show_dashboard_page():
                                         # ✅ CORREÇÃO: Criar plano de ação APÓS salvamento bem-sucedido
                                         audit_result = doc_info.get('audit_result', {})
                                         if audit_result and 'não conforme' in audit_result.get('summary', '').lower():
-                                            action_plan_manager = st.session_state.action_plan_manager
+                                            action_plan_manager = get_unit_manager('action_plan_manager')
                                             non_conformities = [
                                                 item for item in audit_result.get('details', []) 
                                                 if item.get('status', '').lower() == 'não conforme'
@@ -478,7 +408,7 @@ def show_dashboard_page():
                                             # ✅ CORREÇÃO: Criar plano de ação APÓS salvamento bem-sucedido
                                             audit_result = aso_info.get('audit_result', {})
                                             if audit_result and 'não conforme' in audit_result.get('summary', '').lower():
-                                                action_plan_manager = st.session_state.action_plan_manager
+                                                action_plan_manager = get_unit_manager('action_plan_manager')
                                                 non_conformities = [
                                                     item for item in audit_result.get('details', [])
                                                     if item.get('status', '').lower() == 'não conforme'
@@ -557,7 +487,7 @@ def show_dashboard_page():
                                             # ✅ CORREÇÃO: Criar plano de ação APÓS salvamento bem-sucedido
                                             audit_result = training_info.get('audit_result', {})
                                             if audit_result and 'não conforme' in audit_result.get('summary', '').lower():
-                                                action_plan_manager = st.session_state.action_plan_manager
+                                                action_plan_manager = get_unit_manager('action_plan_manager')
                                                 non_conformities = [
                                                     item for item in audit_result.get('details', [])
                                                     if item.get('status', '').lower() == 'não conforme'
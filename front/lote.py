@@ -0,0 +1,87 @@
+import streamlit as st
+import logging
+
+from auth.auth_utils import check_permission
+from operations.manager_pool import get_unit_manager
+from operations.batch_pipeline import (
+    BatchPipeline, expand_uploads, status_table,
+    STAGE_LIMITS, STATUS_SAVED, STATUS_SKIPPED, STATUS_ERROR
+)
+from front.dashboard import format_company_display
+
+logger = logging.getLogger('segsisone_app.lote')
+
+def show_lote_page():
+    logger.info("Iniciando a renderização da página de entrada em lote.")
+    if not st.session_state.get('managers_initialized'):
+        st.warning("Selecione uma unidade operacional para enviar documentos em lote.")
+        return
+    check_permission(level='editor')
+
+    employee_manager = get_unit_manager('employee_manager')
+    docs_manager = get_unit_manager('docs_manager')
+
+    st.title("Entrada de Documentos em Lote")
+    st.markdown(
+        "Envie vários PDFs ou arquivos `.zip` de uma empresa (ASOs, certificados de treinamento e PGR/PCMSO/PPR/PCA). "
+        "Cada arquivo é classificado, associado ao funcionário pelo nome, analisado, auditado e enviado ao Drive; "
+        "os registros são gravados na planilha de uma só vez ao final."
+    )
+    st.caption(
+        f"Processamento simultâneo: até {STAGE_LIMITS['extract']} extrações, {STAGE_LIMITS['audit']} auditorias e "
+        f"{STAGE_LIMITS['upload']} uploads. Arquivos já cadastrados na unidade são ignorados sem consultar a IA."
+    )
+
+    company_options = [None] + employee_manager.companies_df['id'].astype(str).tolist()
+    selected_company = st.selectbox(
+        "Empresa dos documentos:",
+        options=company_options,
+        format_func=lambda cid: format_company_display(cid, employee_manager.companies_df),
+        key="lote_company_selector",
+        placeholder="Selecione uma empresa..."
+    )
+    uploaded_files = st.file_uploader(
+        "PDFs ou arquivos .zip", type=['pdf', 'zip'], accept_multiple_files=True, key="lote_uploader"
+    )
+    run_audit = st.checkbox("Executar auditoria de conformidade com IA", value=True, key="lote_run_audit",
+                            help="A auditoria usa o modelo de maior custo; desmarque para apenas extrair e cadastrar.")
+
+    if st.button("🚀 Processar Lote", type="primary", disabled=not (selected_company and uploaded_files)):
+        items = expand_uploads(uploaded_files)
+        if not items:
+            st.warning("Nenhum PDF encontrado nos arquivos enviados.")
+            return
+
+        pipeline = BatchPipeline(
+            employee_manager, docs_manager,
+            get_unit_manager('nr_analyzer'), get_unit_manager('action_plan_manager'),
+            selected_company, run_audit=run_audit
+        )
+        progress_bar = st.progress(0.0, text=f"Processando {len(items)} arquivo(s)...")
+        table_placeholder = st.empty()
+
+        def on_progress(current_items):
+            done = sum(1 for item in current_items if not item.is_active)
+            progress_bar.progress(done / len(current_items), text=f"{done} de {len(current_items)} arquivo(s) concluído(s)")
+            table_placeholder.dataframe(status_table(current_items), hide_index=True, use_container_width=True)
+
+        pipeline.run(items, on_progress=on_progress)
+        progress_bar.empty()
+        table_placeholder.empty()
+        st.session_state.lote_result = status_table(items)
+
+    result = st.session_state.get('lote_result')
+    if result is not None and not result.empty:
+        st.markdown("---")
+        st.subheader("Resultado do Lote")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Salvos", int((result['status'] == STATUS_SAVED).sum()))
+        col2.metric("Ignorados", int((result['status'] == STATUS_SKIPPED).sum()))
+        col3.metric("Com erro", int((result['status'] == STATUS_ERROR).sum()))
+        st.dataframe(result, hide_index=True, use_container_width=True)
+        st.download_button(
+            "📥 Baixar relatório (CSV)",
+            data=result.to_csv(index=False).encode('utf-8-sig'),
+            file_name="resultado_lote.csv",
+            mime="text/csv"
+        )
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import date
 from auth.auth_utils import is_user_logged_in, authenticate_user
+from operations.manager_pool import get_unit_manager
 
 def format_company_display(cid, companies_df):
     if cid is None:
@@ -80,9 +81,9 @@ def show_plano_acao_page():
         st.warning("Aguardando inicialização dos dados da unidade...")
         return
     
-    action_plan_manager = st.session_state.action_plan_manager
-    employee_manager = st.session_state.employee_manager
-    docs_manager = st.session_state.docs_manager
+    action_plan_manager = get_unit_manager('action_plan_manager')
+    employee_manager = get_unit_manager('employee_manager')
+    docs_manager = get_unit_manager('docs_manager')
     
     # Seletor de empresa
     company_options = [None] + employee_manager.companies_df['id'].tolist()
@@ -13,6 +13,12 @@ CENTRAL_DRIVE_FOLDER_ID = "1klJot9630Hxo2vWLSDGQH-QC3yux5KT5"
 # Nome da aba na planilha matriz para registrar os logs centralizados.
 CENTRAL_LOG_SHEET_NAME = "log_auditoria"
 
+# Aba (na planilha matriz) com o índice das partições mensais do log (log_auditoria_AAAA_MM).
+AUDIT_LOG_INDEX_SHEET_NAME = "log_auditoria_particoes"
+
+# Diretório local para caches em disco (ex.: cópia incremental dos logs de auditoria).
+LOCAL_CACHE_DIR = os.getenv("SEGSISONE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".segsisone_cache"))
+
 def get_credentials_dict():
     """
     Retorna as credenciais do serviço do Google, seja do Streamlit Cloud,
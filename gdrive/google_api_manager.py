@@ -1,12 +1,11 @@
+import io
 import streamlit as st
-import os
-import tempfile
 import yaml
 import gspread
 import logging 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload
 from .config import get_credentials_dict
 
 logger = logging.getLogger('segsisone_app.google_api_manager')
@@ -56,22 +55,20 @@ class GoogleApiManager:
     # --- Métodos do Google Drive ---
 
     def upload_file(self, folder_id: str, arquivo, novo_nome: str = None):
-        """Faz upload de um arquivo para uma pasta específica no Google Drive."""
+        """
+        Faz upload de um arquivo para uma pasta específica no Google Drive.
+        O conteúdo é enviado direto da memória (sem arquivo temporário).
+        """
         if not folder_id:
             st.error("Erro de programação: ID da pasta não foi fornecido para o upload.")
             return None
         
-        temp_file_path = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(arquivo.name)[1]) as temp_file:
-                temp_file.write(arquivo.getvalue())
-                temp_file_path = temp_file.name
-
             file_metadata = {
                 'name': novo_nome if novo_nome else arquivo.name,
                 'parents': [folder_id]
             }
-            media = MediaFileUpload(temp_file_path, mimetype=arquivo.type, resumable=True)
+            media = MediaIoBaseUpload(io.BytesIO(arquivo.getvalue()), mimetype=getattr(arquivo, 'type', None) or 'application/pdf', resumable=True)
             
             file = self.drive_service.files().create(
                 body=file_metadata, media_body=media, fields='id,webViewLink'
@@ -85,9 +82,6 @@ class GoogleApiManager:
             else:
                 st.error(f"Erro ao fazer upload do arquivo: {str(e)}")
             return None
-        finally:
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
 
     def create_folder(self, name: str, parent_folder_id: str = None):
         """Cria uma nova pasta no Google Drive e retorna seu ID."""
@@ -0,0 +1,101 @@
+import time
+import logging
+from types import MappingProxyType
+
+import streamlit as st
+
+from gdrive.config import MATRIX_SPREADSHEET_ID
+from gdrive.matrix_manager import load_matrix_sheets_data
+from operations.data_versions import get_data_version
+
+logger = logging.getLogger('segsisone_app.matrix_directory')
+
+# Mesmo TTL de load_matrix_sheets_data: edições feitas direto na planilha também são percebidas.
+DIRECTORY_TTL_SECONDS = 300
+
+USER_FIELDS = ('email', 'nome', 'role', 'unidade_associada')
+UNIT_FIELDS = ('nome_unidade', 'spreadsheet_id', 'folder_id')
+
+
+def normalize_email(email: str) -> str:
+    return (email or '').lower().strip()
+
+
+def _rows_to_records(data: list | None, fields: tuple) -> list[dict]:
+    """Converte linhas cruas da planilha em dicionários, garantindo os campos esperados."""
+    if not data or len(data) < 2:
+        return []
+    header = data[0]
+    records = []
+    for row in data[1:]:
+        record = dict(zip(header, row))
+        for field in fields:
+            record.setdefault(field, None)
+        records.append(record)
+    return records
+
+
+class MatrixDirectory:
+    """
+    Diretório imutável de usuários e unidades da Planilha Matriz, com busca O(1)
+    por e-mail normalizado e por nome da unidade. Não constrói DataFrames.
+    """
+
+    def __init__(self, users_data: list | None, units_data: list | None):
+        users = {}
+        for record in _rows_to_records(users_data, USER_FIELDS):
+            record['email'] = normalize_email(record['email'])
+            if record['email']:
+                # Em caso de duplicidade, vale a primeira linha (mesmo comportamento do filtro anterior).
+                users.setdefault(record['email'], MappingProxyType(record))
+
+        units = {}
+        for record in _rows_to_records(units_data, UNIT_FIELDS):
+            if record['nome_unidade']:
+                units.setdefault(record['nome_unidade'], MappingProxyType(record))
+
+        self._users = MappingProxyType(users)
+        self._units = MappingProxyType(units)
+        self._unit_list = tuple(units.values())
+
+    def get_user_info(self, email: str) -> dict | None:
+        user = self._users.get(normalize_email(email))
+        return dict(user) if user else None
+
+    def get_unit_info(self, unit_name: str) -> dict | None:
+        unit = self._units.get(unit_name)
+        return dict(unit) if unit else None
+
+    def get_all_units(self) -> list:
+        return [dict(unit) for unit in self._unit_list]
+
+    @property
+    def unit_names(self) -> tuple:
+        return tuple(unit['nome_unidade'] for unit in self._unit_list)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+@st.cache_resource(max_entries=2)
+def _build_matrix_directory(version: int, ttl_bucket: int) -> MatrixDirectory:
+    users_data, units_data, _, _ = load_matrix_sheets_data()
+    if users_data is None:
+        # Exceções não são guardadas pelo cache_resource: a próxima chamada tenta de novo.
+        raise RuntimeError("Dados da Planilha Matriz indisponíveis.")
+    directory = MatrixDirectory(users_data, units_data)
+    logger.info(f"Diretório da matriz construído (versão {version}): {len(directory)} usuários, {len(directory.unit_names)} unidades.")
+    return directory
+
+
+def get_matrix_directory() -> MatrixDirectory:
+    """
+    Retorna o diretório compartilhado entre sessões. Ele é reconstruído quando a
+    Planilha Matriz é alterada pelo app (versão dos dados) ou quando o TTL expira.
+    """
+    version = get_data_version(MATRIX_SPREADSHEET_ID)
+    try:
+        return _build_matrix_directory(version, int(time.time() // DIRECTORY_TTL_SECONDS))
+    except Exception as e:
+        logger.error(f"Não foi possível construir o diretório da matriz: {e}")
+        return MatrixDirectory(None, None)
@@ -2,9 +2,11 @@ import streamlit as st
 import pandas as pd
 import logging
 from operations.sheet import SheetOperations
-from gdrive.config import MATRIX_SPREADSHEET_ID, CENTRAL_LOG_SHEET_NAME 
+from gdrive.config import MATRIX_SPREADSHEET_ID
 from fuzzywuzzy import process
 from operations.audit_logger import log_action
+from operations.audit_log_reader import get_audit_log_reader
+from operations.data_versions import bump_data_version
 
 
 logger = logging.getLogger('segsisone_app.matrix_manager')
@@ -13,28 +15,34 @@ logger = logging.getLogger('segsisone_app.matrix_manager')
 @st.cache_data(ttl=300)
 def load_matrix_sheets_data():
     """
-    Carrega TODAS as abas de dados da Planilha Matriz global.
+    Carrega as abas de controle da Planilha Matriz global.
+    Os logs de auditoria não fazem parte desta carga: são lidos sob demanda
+    pelo AuditLogReader (operations/audit_log_reader.py).
     """
     logger.info("Carregando dados da Planilha Matriz (pode usar cache)...")
     try:
         sheet_ops = SheetOperations(MATRIX_SPREADSHEET_ID)
         if not sheet_ops.spreadsheet:
             st.error("Erro Crítico: Não foi possível conectar à Planilha Matriz de controle.")
-            return None, None, None, None, None
+            return None, None, None, None
 
         users_data = sheet_ops.carregar_dados_aba("usuarios")
         units_data = sheet_ops.carregar_dados_aba("unidades")
         functions_data = sheet_ops.carregar_dados_aba("funcoes")
         matrix_data = sheet_ops.carregar_dados_aba("matriz_treinamentos")
-        log_data = sheet_ops.carregar_dados_aba(CENTRAL_LOG_SHEET_NAME)
         
         logger.info("Dados da Planilha Matriz carregados com sucesso.")
-        return users_data, units_data, functions_data, matrix_data, log_data
+        return users_data, units_data, functions_data, matrix_data
         
     except Exception as e:
         logger.critical(f"Falha crítica ao carregar dados da Planilha Matriz: {e}", exc_info=True)
         return None, None, None, None
 
+def invalidate_matrix_cache():
+    """Descarta os dados da matriz em cache e sinaliza a mudança (ex.: para o diretório de usuários)."""
+    load_matrix_sheets_data.clear()
+    bump_data_version(MATRIX_SPREADSHEET_ID)
+
 class MatrixManager:
     def __init__(self):
         """
@@ -46,7 +54,6 @@ class MatrixManager:
         self.units_df = pd.DataFrame()
         self.functions_df = pd.DataFrame()
         self.training_matrix_df = pd.DataFrame()
-        self.log_df = pd.DataFrame()
         self.data_loaded_successfully = False
         self._load_data_from_cache()
 
@@ -55,14 +62,13 @@ class MatrixManager:
         Carrega os dados da função em cache e os transforma em DataFrames robustos,
         garantindo que as colunas esperadas sempre existam.
         """
-        users_data, units_data, functions_data, matrix_data, log_data = load_matrix_sheets_data()
+        users_data, units_data, functions_data, matrix_data = load_matrix_sheets_data()
 
         # Define as colunas esperadas para cada aba
         user_cols = ['email', 'nome', 'role', 'unidade_associada']
         unit_cols = ['nome_unidade', 'spreadsheet_id', 'folder_id']
         func_cols = ['id', 'nome_funcao', 'descricao']
         matrix_cols = ['id', 'id_funcao', 'norma_obrigatoria']
-        log_cols = ['timestamp', 'user_email', 'user_role', 'action', 'details', 'target_uo']
 
         # --- Carrega Usuários ---
         if users_data and len(users_data) > 1:
@@ -108,16 +114,6 @@ class MatrixManager:
             self.training_matrix_df = pd.DataFrame(columns=matrix_cols)
             logger.warning("A aba 'matriz_treinamentos' da Planilha Matriz está vazia ou contém apenas cabeçalho.")
 
-        # --- Carrega Logs de Auditoria ---
-        if log_data and len(log_data) > 1:
-            self.log_df = pd.DataFrame(log_data[1:], columns=log_data[0])
-            for col in log_cols:
-                if col not in self.log_df.columns:
-                    self.log_df[col] = None
-        else:
-            self.log_df = pd.DataFrame(columns=log_cols)
-            logger.info("A aba 'log_auditoria' da Planilha Matriz está vazia ou contém apenas cabeçalho.")
-        
         self.data_loaded_successfully = True
         
     # --- Métodos para Usuários e Unidades ---
@@ -134,9 +130,9 @@ class MatrixManager:
     def get_all_units(self) -> list:
         return self.units_df.to_dict(orient='records') if not self.units_df.empty else []
 
-    def get_audit_logs(self) -> pd.DataFrame:
-        """Retorna o DataFrame de logs de auditoria."""
-        return self.log_df
+    def get_audit_logs(self, last_n: int = 200) -> pd.DataFrame:
+        """Retorna os `last_n` registros de auditoria mais recentes (leitura paginada e incremental)."""
+        return get_audit_log_reader().tail(last_n)
 
     def get_all_users(self) -> list:
         return self.users_df.to_dict(orient='records') if not self.users_df.empty else []
@@ -162,7 +158,7 @@ class MatrixManager:
                     }
                 )
                 
-                load_matrix_sheets_data.clear()
+                invalidate_matrix_cache()
                 logger.info(f"Nova unidade '{unit_data[0]}' adicionada. Cache invalidado.")
                 return True
                 
@@ -194,7 +190,7 @@ class MatrixManager:
                     }
                 )
                 
-                load_matrix_sheets_data.clear()
+                invalidate_matrix_cache()
                 logger.info(f"Novo usuário '{user_data[0]}' adicionado. Cache invalidado.")
                 return True
                 
@@ -233,7 +229,7 @@ class MatrixManager:
             if cells_to_update:
                 worksheet.update_cells(cells_to_update)
                 log_action("UPDATE_USER", {"email": original_email, "updates": updates})
-                load_matrix_sheets_data.clear()
+                invalidate_matrix_cache()
                 return True
             return False
         except Exception as e:
@@ -253,7 +249,7 @@ class MatrixManager:
             success = sheet_ops.excluir_linha_por_indice("usuarios", row_to_delete_in_sheet)
             if success:
                 log_action("REMOVE_USER", {"removed_user_email": user_email_clean})
-                load_matrix_sheets_data.clear()
+                invalidate_matrix_cache()
                 return True
             return False
         except Exception as e:
@@ -288,7 +284,7 @@ class MatrixManager:
         sheet_ops = SheetOperations(MATRIX_SPREADSHEET_ID)
         new_id = sheet_ops.adc_dados_aba("funcoes", [name, description])
         if new_id:
-            load_matrix_sheets_data.clear()
+            invalidate_matrix_cache()
             return new_id, "Função adicionada com sucesso."
         return None, "Falha ao adicionar função."
 
@@ -298,6 +294,6 @@ class MatrixManager:
         sheet_ops = SheetOperations(MATRIX_SPREADSHEET_ID)
         new_id = sheet_ops.adc_dados_aba("matriz_treinamentos", [str(function_id), required_norm])
         if new_id:
-            load_matrix_sheets_data.clear()
+            invalidate_matrix_cache()
             return new_id, "Treinamento mapeado com sucesso."
         return None, "Falha ao mapear treinamento."
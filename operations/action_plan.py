@@ -40,23 +40,15 @@ class ActionPlanManager:
             self.action_plan_df = pd.DataFrame(columns=self.columns)
             self.data_loaded_successfully = False
 
-    def add_action_item(self, audit_run_id, company_id, doc_id, item_details, employee_id=None):
-        """
-        Adiciona um novo item ao plano de ação.
-        
-        ✅ AGORA COM id_funcionario na planilha
-        """
-        if not self.data_loaded_successfully:
-            st.error("Não é possível adicionar item de ação, pois os dados da planilha não foram carregados.")
-            return None
-    
+    def build_action_item_row(self, audit_run_id, company_id, doc_id, item_details, employee_id=None) -> list:
+        """Linha da aba 'plano_acao' (sem o ID) para uma não conformidade da auditoria."""
         item_title = item_details.get('item_verificacao', 'Não conformidade não especificada')
         item_observation = item_details.get('observacao', 'Sem detalhes fornecidos.')
         full_description = f"{item_title.strip()}: {item_observation.strip()}"
         
         # A ordem dos dados corresponde à ordem das colunas na planilha, exceto pelo 'id',
         # que é gerado automaticamente pelo método adc_dados_aba.
-        new_data = [
+        return [
             str(audit_run_id),                                  # audit_run_id
             str(company_id),                                    # id_empresa
             str(doc_id),                                        # id_documento_original
@@ -70,6 +62,20 @@ class ActionPlanManager:
             date.today().strftime("%d/%m/%Y"),                  # data_criacao
             ""                                                  # data_conclusao
         ]
+
+    def add_action_item(self, audit_run_id, company_id, doc_id, item_details, employee_id=None):
+        """
+        Adiciona um novo item ao plano de ação.
+        
+        ✅ AGORA COM id_funcionario na planilha
+        """
+        if not self.data_loaded_successfully:
+            st.error("Não é possível adicionar item de ação, pois os dados da planilha não foram carregados.")
+            return None
+    
+        item_title = item_details.get('item_verificacao', 'Não conformidade não especificada')
+        new_data = self.build_action_item_row(audit_run_id, company_id, doc_id, item_details, employee_id)
+        full_description = new_data[4]
         
         item_id = self.sheet_ops.adc_dados_aba("plano_acao", new_data)
         
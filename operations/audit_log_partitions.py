@@ -0,0 +1,170 @@
+import os
+import gzip
+import json
+import logging
+import threading
+import calendar
+from datetime import datetime, date
+
+import streamlit as st
+from gspread.exceptions import APIError, WorksheetNotFound
+
+from gdrive.config import CENTRAL_LOG_SHEET_NAME, AUDIT_LOG_INDEX_SHEET_NAME, LOCAL_CACHE_DIR
+
+logger = logging.getLogger('segsisone_app.audit_log_partitions')
+
+LOG_COLUMNS = ['timestamp', 'user_email', 'user_role', 'action', 'details', 'target_uo']
+INDEX_COLUMNS = ['particao', 'inicio', 'fim', 'criado_em']
+ARCHIVE_DIR = os.path.join(LOCAL_CACHE_DIR, "audit_archive")
+
+
+def partition_name_for(moment: date) -> str:
+    """Nome da partição mensal que recebe os logs de uma data (ex.: log_auditoria_2025_03)."""
+    return f"{CENTRAL_LOG_SHEET_NAME}_{moment.year:04d}_{moment.month:02d}"
+
+
+def _month_bounds(moment: date) -> tuple[str, str]:
+    last_day = calendar.monthrange(moment.year, moment.month)[1]
+    return f"{moment.year:04d}-{moment.month:02d}-01", f"{moment.year:04d}-{moment.month:02d}-{last_day:02d}"
+
+
+@st.cache_resource
+def _get_partition_state() -> dict:
+    """Partições já confirmadas neste processo, para não consultar o índice a cada log."""
+    return {'lock': threading.Lock(), 'known': set()}
+
+
+@st.cache_data(ttl=60)
+def _load_index_rows(_spreadsheet) -> list:
+    """Lê a aba de índice sem alertas na UI caso ela ainda não exista (nenhuma rotação ocorreu)."""
+    try:
+        return _spreadsheet.worksheet(AUDIT_LOG_INDEX_SHEET_NAME).get_all_values()
+    except WorksheetNotFound:
+        return []
+
+
+def load_partition_index(sheet_ops) -> list[dict]:
+    """
+    Retorna as partições conhecidas, da mais antiga para a mais recente.
+    A aba legada (log_auditoria) é sempre incluída como a partição mais antiga,
+    cobrindo tudo o que foi registrado antes da primeira partição mensal.
+    """
+    partitions = []
+    try:
+        data = _load_index_rows(sheet_ops.spreadsheet) if sheet_ops.spreadsheet else []
+    except Exception as e:
+        logger.warning(f"Não foi possível ler o índice de partições do log: {e}")
+        data = None
+    if data and len(data) > 1:
+        header = data[0]
+        for row in data[1:]:
+            entry = dict(zip(header, row))
+            if entry.get('particao'):
+                partitions.append(entry)
+    partitions.sort(key=lambda p: p.get('inicio', ''))
+
+    legacy_end = '9999-12-31'
+    if partitions:
+        first_start = datetime.strptime(partitions[0]['inicio'], '%Y-%m-%d').date()
+        legacy_end = date.fromordinal(first_start.toordinal() - 1).isoformat()
+    legacy = {'particao': CENTRAL_LOG_SHEET_NAME, 'inicio': '0000-01-01', 'fim': legacy_end, 'criado_em': ''}
+    return [legacy] + partitions
+
+
+def partitions_for_range(partitions: list[dict], start: date, end: date) -> list[dict]:
+    """Filtra as partições cujo intervalo se sobrepõe a [start, end]."""
+    start_key, end_key = start.isoformat(), end.isoformat()
+    return [p for p in partitions if p.get('inicio', '') <= end_key and p.get('fim', '9999-12-31') >= start_key]
+
+
+def ensure_partition(sheet_ops, moment: datetime | None = None) -> str:
+    """
+    Garante que a partição mensal da data exista (criando a aba e registrando-a no índice)
+    e retorna o seu nome. A verificação só acontece na primeira escrita do mês por processo.
+    """
+    moment = moment or datetime.now()
+    name = partition_name_for(moment)
+    state = _get_partition_state()
+    if name in state['known']:
+        return name
+
+    with state['lock']:
+        if name in state['known']:
+            return name
+        spreadsheet = sheet_ops.spreadsheet
+        try:
+            spreadsheet.worksheet(name)
+        except WorksheetNotFound:
+            try:
+                worksheet = spreadsheet.add_worksheet(title=name, rows=1000, cols=len(LOG_COLUMNS))
+                worksheet.update([LOG_COLUMNS], 'A1')
+                logger.info(f"Partição de log '{name}' criada.")
+            except APIError as e:
+                # Outra instância pode ter criado a aba ao mesmo tempo.
+                logger.warning(f"Falha ao criar a partição '{name}' (possivelmente já existe): {e}")
+
+        _register_in_index(sheet_ops, name, moment)
+        state['known'].add(name)
+    return name
+
+
+def _register_in_index(sheet_ops, name: str, moment: date):
+    try:
+        index_ws = sheet_ops.spreadsheet.worksheet(AUDIT_LOG_INDEX_SHEET_NAME)
+    except WorksheetNotFound:
+        index_ws = sheet_ops.spreadsheet.add_worksheet(title=AUDIT_LOG_INDEX_SHEET_NAME, rows=100, cols=len(INDEX_COLUMNS))
+        index_ws.update([INDEX_COLUMNS], 'A1')
+
+    if name in index_ws.col_values(1):
+        return
+    inicio, fim = _month_bounds(moment)
+    # RAW evita que o Sheets converta as datas para o formato local, o que quebraria as comparações.
+    index_ws.append_row([name, inicio, fim, datetime.now().strftime("%Y-%m-%d %H:%M:%S")], value_input_option='RAW')
+    _load_index_rows.clear()
+    logger.info(f"Partição '{name}' registrada no índice de logs.")
+
+
+# --- Arquivo local compactado ---
+
+def archive_path(partition_name: str, archive_dir: str = ARCHIVE_DIR) -> str:
+    return os.path.join(archive_dir, f"{partition_name}.jsonl.gz")
+
+
+def read_archive(partition_name: str, archive_dir: str = ARCHIVE_DIR) -> list | None:
+    """Lê as linhas de uma partição arquivada localmente. Retorna None se não houver arquivo."""
+    path = archive_path(partition_name, archive_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except Exception as e:
+        logger.warning(f"Arquivo local da partição '{partition_name}' ilegível: {e}")
+        return None
+
+
+def archive_closed_partitions(sheet_ops, archive_dir: str = ARCHIVE_DIR) -> list[str]:
+    """
+    Grava uma cópia compactada (JSONL + gzip) de cada partição já encerrada que ainda
+    não foi arquivada. Partições encerradas não recebem mais escritas, então o arquivo
+    local pode substituir as leituras à API. Retorna os nomes arquivados.
+    """
+    current = partition_name_for(datetime.now())
+    archived = []
+    os.makedirs(archive_dir, exist_ok=True)
+    for partition in load_partition_index(sheet_ops):
+        name = partition['particao']
+        if name == current or os.path.exists(archive_path(name, archive_dir)):
+            continue
+        worksheet = sheet_ops._get_worksheet(name)
+        if worksheet is None:
+            continue
+        rows = worksheet.get_all_values()[1:]
+        tmp_path = archive_path(name, archive_dir) + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, archive_path(name, archive_dir))
+        archived.append(name)
+        logger.info(f"Partição '{name}' arquivada localmente com {len(rows)} linhas.")
+    return archived
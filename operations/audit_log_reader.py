@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import date, datetime, time as dt_time
+
+import pandas as pd
+import streamlit as st
+
+from operations.sheet import SheetOperations
+from operations.audit_log_partitions import load_partition_index, partitions_for_range, read_archive
+from gdrive.config import MATRIX_SPREADSHEET_ID, LOCAL_CACHE_DIR
+
+logger = logging.getLogger('segsisone_app.audit_log_reader')
+
+LOG_COLUMNS = ['timestamp', 'user_email', 'user_role', 'action', 'details', 'target_uo']
+LOG_RANGE_LAST_COLUMN = 'F'
+# Intervalo mínimo entre consultas à API para buscar linhas novas.
+MIN_SYNC_INTERVAL_SECONDS = 30
+# Quantidade de linhas buscadas por requisição ao carregar registros mais antigos.
+FETCH_CHUNK_ROWS = 500
+# Formatos aceitos na coluna de data/hora: o gravado por log_action e os que a planilha
+# exibe para linhas antigas gravadas com USER_ENTERED (convertidas em data no locale pt-BR).
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y')
+
+
+def parse_log_timestamp(value) -> datetime | None:
+    """Data/hora de uma linha do log em qualquer dos formatos aceitos; None se ilegível."""
+    text = str(value or '').strip()
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class _TabCache:
+    """
+    Cópia local (em disco) de um trecho contíguo de uma aba de log.
+    Guarda o número da primeira linha da planilha presente no cache, o que permite
+    buscar apenas as linhas novas (após o fim) ou as mais antigas (antes do início).
+    """
+
+    def __init__(self, tab_name: str, cache_dir: str):
+        self.tab_name = tab_name
+        self.path = os.path.join(cache_dir, f"audit_log_{tab_name}.json")
+        self.first_row = None  # Linha da planilha correspondente a rows[0]
+        self.rows = []
+        self.closed = False  # Partição encerrada: não recebe mais escritas
+        self.last_sync = 0.0
+        self._read_from_disk()
+
+    @property
+    def next_row(self) -> int | None:
+        return None if self.first_row is None else self.first_row + len(self.rows)
+
+    @property
+    def is_complete(self) -> bool:
+        """True se o cache já contém desde a primeira linha de dados da aba."""
+        return self.first_row == 2
+
+    def _read_from_disk(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.first_row = data.get('first_row')
+            self.rows = data.get('rows', [])
+            self.closed = data.get('closed', False)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Cache local do log '{self.tab_name}' ilegível, será reconstruído: {e}")
+            self.first_row, self.rows = None, []
+
+    def write_to_disk(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'first_row': self.first_row, 'rows': self.rows, 'closed': self.closed}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar o cache local do log '{self.tab_name}': {e}")
+
+
+class AuditLogReader:
+    """
+    Leitor paginado e incremental dos logs de auditoria da Planilha Matriz.
+    Nunca baixa a aba inteira: busca as últimas linhas, depois apenas as linhas novas,
+    e carrega registros antigos sob demanda (paginação ou intervalo de datas).
+    Os logs são particionados por mês; apenas as partições necessárias são consultadas
+    e partições encerradas com arquivo local compactado não geram chamadas à API.
+    """
+
+    def __init__(self, cache_dir: str = LOCAL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._sheet_ops = None
+        self._tabs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sheet_ops(self) -> SheetOperations:
+        if self._sheet_ops is None:
+            self._sheet_ops = SheetOperations(MATRIX_SPREADSHEET_ID)
+        return self._sheet_ops
+
+    def _get_tab(self, tab_name: str) -> _TabCache:
+        if tab_name not in self._tabs:
+            self._tabs[tab_name] = _TabCache(tab_name, self.cache_dir)
+        return self._tabs[tab_name]
+
+    def _fetch(self, worksheet, first_row: int, last_row: int | None = None) -> list:
+        """
+        Busca um intervalo de linhas da aba. `last_row=None` busca até o fim.
+        Os valores vêm sem a formatação da planilha; datas vêm como texto.
+        """
+        end = f"{LOG_RANGE_LAST_COLUMN}{last_row}" if last_row else LOG_RANGE_LAST_COLUMN
+        values = worksheet.get(
+            f"A{first_row}:{end}", value_render_option='UNFORMATTED_VALUE', date_time_render_option='FORMATTED_STRING'
+        )
+        return [[str(v) for v in row] + [''] * (len(LOG_COLUMNS) - len(row)) for row in values]
+
+    def _sync(self, tab: _TabCache, initial_rows: int, force: bool = False):
+        """Traz para o cache as linhas novas da aba (ou as últimas linhas, no primeiro acesso)."""
+        if not force and tab.first_row is not None and time.monotonic() - tab.last_sync < MIN_SYNC_INTERVAL_SECONDS:
+            return
+        worksheet = self.sheet_ops._get_worksheet(tab.tab_name)
+        if worksheet is None:
+            return
+
+        if tab.first_row is None:
+            # row_count vem dos metadados da aba; é um limite superior para a última linha com dados.
+            # A API omite as linhas vazias do final, então o resultado termina na última linha preenchida.
+            last_row = worksheet.row_count
+            while True:
+                first_row = max(2, last_row - initial_rows + 1)
+                rows = self._fetch(worksheet, first_row, last_row)
+                if rows or first_row == 2:
+                    break
+                last_row = first_row - 1
+            tab.rows = rows
+            tab.first_row = first_row
+            logger.info(f"Log '{tab.tab_name}': {len(tab.rows)} linhas finais carregadas a partir da linha {first_row}.")
+        else:
+            new_rows = self._fetch(worksheet, tab.next_row)
+            if new_rows:
+                tab.rows.extend(new_rows)
+                logger.info(f"Log '{tab.tab_name}': {len(new_rows)} linhas novas sincronizadas.")
+
+        tab.last_sync = time.monotonic()
+        tab.write_to_disk()
+
+    def _load_older(self, tab: _TabCache, count: int) -> bool:
+        """Carrega até `count` linhas anteriores ao início do cache. Retorna False se não houver mais."""
+        if tab.first_row is None or tab.is_complete:
+            return False
+        worksheet = self.sheet_ops._get_worksheet(tab.tab_name)
+        if worksheet is None:
+            return False
+        first_row = max(2, tab.first_row - count)
+        older_rows = self._fetch(worksheet, first_row, tab.first_row - 1)
+        # Linhas vazias no meio do intervalo são preservadas para manter a numeração.
+        older_rows += [[''] * len(LOG_COLUMNS)] * (tab.first_row - first_row - len(older_rows))
+        tab.rows = older_rows + tab.rows
+        tab.first_row = first_row
+        tab.write_to_disk()
+        return True
+
+    def _to_dataframe(self, rows: list) -> pd.DataFrame:
+        # As colunas seguem a ordem fixa de log_action em todas as partições.
+        df = pd.DataFrame([r[:len(LOG_COLUMNS)] for r in rows if any(r)], columns=LOG_COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'].map(parse_log_timestamp))
+        return df.sort_values('timestamp', ascending=False, na_position='last').reset_index(drop=True)
+
+    def _prepare_tab(self, partition_name: str, is_current: bool, initial_rows: int, force: bool) -> _TabCache:
+        """Deixa o cache de uma partição pronto para leitura, com o mínimo de chamadas à API."""
+        tab = self._get_tab(partition_name)
+        if is_current:
+            self._sync(tab, initial_rows=initial_rows, force=force)
+            return tab
+        if tab.closed:
+            return tab
+        archived_rows = read_archive(partition_name)
+        if archived_rows is not None:
+            tab.rows = [list(r) + [''] * (len(LOG_COLUMNS) - len(r)) for r in archived_rows]
+            tab.first_row = 2
+        else:
+            # Última sincronização: a partição não receberá mais linhas.
+            self._sync(tab, initial_rows=initial_rows, force=True)
+        tab.closed = True
+        tab.write_to_disk()
+        return tab
+
+    def tail(self, n: int = 200, force_refresh: bool = False) -> pd.DataFrame:
+        """Retorna os `n` registros mais recentes (mais novo primeiro)."""
+        return self.page(0, n, force_refresh=force_refresh)
+
+    def page(self, page_number: int, page_size: int = 200, force_refresh: bool = False) -> pd.DataFrame:
+        """Retorna a página `page_number` (0 = mais recente) com `page_size` registros."""
+        needed = (page_number + 1) * page_size
+        with self._lock:
+            collected = []  # Linhas por partição, da mais recente para a mais antiga
+            total = 0
+            try:
+                partitions = list(reversed(load_partition_index(self.sheet_ops)))
+                for position, partition in enumerate(partitions):
+                    tab = self._prepare_tab(partition['particao'], position == 0, max(needed - total, FETCH_CHUNK_ROWS), force_refresh)
+                    while total + len(tab.rows) < needed and self._load_older(tab, max(needed - total - len(tab.rows), FETCH_CHUNK_ROWS)):
+                        pass
+                    collected.append(tab.rows)
+                    total += len(tab.rows)
+                    if total >= needed:
+                        break
+            except Exception as e:
+                logger.error(f"Falha ao sincronizar o log de auditoria: {e}", exc_info=True)
+            all_rows = [row for rows in reversed(collected) for row in rows]
+            end = len(all_rows) - page_number * page_size
+            rows = all_rows[max(0, end - page_size):max(0, end)]
+            return self._to_dataframe(rows)
+
+    def between(self, start_date: date, end_date: date, force_refresh: bool = False) -> pd.DataFrame:
+        """Retorna os registros entre duas datas (inclusive), consultando apenas as partições do período."""
+        start = datetime.combine(start_date, dt_time.min)
+        end = datetime.combine(end_date, dt_time.max)
+        with self._lock:
+            rows = []
+            try:
+                partitions = load_partition_index(self.sheet_ops)
+                current_name = partitions[-1]['particao']
+                for partition in partitions_for_range(partitions, start_date, end_date):
+                    name = partition['particao']
+                    tab = self._prepare_tab(name, name == current_name, FETCH_CHUNK_ROWS, force_refresh)
+                    # Os logs são acrescentados em ordem cronológica: carrega para trás até passar do início.
+                    while self._oldest_timestamp(tab) >= start and self._load_older(tab, FETCH_CHUNK_ROWS):
+                        pass
+                    for r in tab.rows:
+                        timestamp = parse_log_timestamp(r[0])
+                        if timestamp is not None and start <= timestamp <= end:
+                            rows.append(r)
+            except Exception as e:
+                logger.error(f"Falha ao sincronizar o log de auditoria: {e}", exc_info=True)
+            return self._to_dataframe(rows)
+
+    @staticmethod
+    def _oldest_timestamp(tab: _TabCache) -> datetime:
+        for row in tab.rows:
+            timestamp = parse_log_timestamp(row[0]) if row else None
+            if timestamp is not None:
+                return timestamp
+        return datetime.max
+
+
+@st.cache_resource
+def get_audit_log_reader() -> AuditLogReader:
+    """Leitor compartilhado entre sessões (o cache local é único por processo)."""
+    return AuditLogReader()
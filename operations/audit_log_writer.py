@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+import streamlit as st
+
+from operations.sheet import SheetOperations
+from operations.audit_log_partitions import ensure_partition
+from gdrive.config import MATRIX_SPREADSHEET_ID, LOCAL_CACHE_DIR
+
+logger = logging.getLogger('segsisone_app.audit_log_writer')
+
+# Envia o lote quando atingir este número de entradas...
+FLUSH_MAX_ENTRIES = 50
+# ...ou quando a entrada mais antiga estiver esperando há este tempo.
+FLUSH_INTERVAL_SECONDS = 5
+# Espera máxima entre novas tentativas após falha (cota, rede).
+MAX_RETRY_BACKOFF_SECONDS = 300
+# Acima deste tamanho, o spool já enviado é compactado.
+SPOOL_COMPACT_BYTES = 1024 * 1024
+
+SPOOL_PATH = os.path.join(LOCAL_CACHE_DIR, "audit_spool.jsonl")
+
+
+class AuditLogWriter:
+    """
+    Gravador assíncrono dos logs de auditoria.
+
+    Cada entrada é primeiro acrescentada a um spool local (arquivo JSONL só de acréscimo)
+    e colocada em uma fila; uma thread em segundo plano envia os lotes com `append_rows`.
+    Um arquivo de offset marca até onde o spool já foi enviado, então entradas pendentes
+    sobrevivem a quedas do processo ou erros de cota e são reenviadas na inicialização.
+    A entrega é "pelo menos uma vez": uma queda entre o envio e a gravação do offset
+    pode duplicar o último lote.
+    """
+
+    def __init__(self, spool_path: str = SPOOL_PATH):
+        self.spool_path = spool_path
+        self.offset_path = f"{spool_path}.offset"
+        self._queue = queue.Queue()
+        self._spool_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._sheet_ops = None
+        self._pending = []  # (linha, offset no spool após a entrada)
+        self._stop = threading.Event()
+        os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+        self._replay_spool()
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def sheet_ops(self) -> SheetOperations:
+        # Uma única conexão com a Planilha Matriz, reaproveitada por todos os envios.
+        if self._sheet_ops is None or not self._sheet_ops.spreadsheet:
+            self._sheet_ops = SheetOperations(MATRIX_SPREADSHEET_ID)
+        return self._sheet_ops
+
+    # --- Spool ---
+
+    def _read_offset(self) -> int:
+        try:
+            with open(self.offset_path, 'r') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_offset(self, offset: int):
+        tmp_path = f"{self.offset_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(offset))
+        os.replace(tmp_path, self.offset_path)
+
+    def _replay_spool(self):
+        """Recoloca na fila as entradas do spool que ainda não foram enviadas."""
+        offset = self._read_offset()
+        try:
+            with open(self.spool_path, 'rb') as f:
+                f.seek(offset)
+                replayed = 0
+                for line in f:
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        self._queue.put((json.loads(line), offset))
+                        replayed += 1
+                    except json.JSONDecodeError:
+                        # Linha truncada por uma queda durante a escrita.
+                        logger.warning("Linha corrompida ignorada no spool de logs.")
+            if replayed:
+                logger.warning(f"{replayed} entradas de log pendentes no spool serão reenviadas.")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Falha ao ler o spool de logs: {e}", exc_info=True)
+
+    def enqueue(self, log_row: list):
+        """Registra a entrada no spool (durável) e a agenda para envio. Não faz I/O de rede."""
+        line = (json.dumps(log_row, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._spool_lock:
+            with open(self.spool_path, 'ab') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                end_offset = f.tell()
+            self._queue.put((log_row, end_offset))
+
+    def _compact_spool(self, flushed_offset: int):
+        """Remove do spool a parte já enviada quando ele cresce demais."""
+        with self._spool_lock:
+            try:
+                if os.path.getsize(self.spool_path) < SPOOL_COMPACT_BYTES or flushed_offset != os.path.getsize(self.spool_path):
+                    return
+                # Tudo foi enviado e nada novo foi escrito: o spool pode ser zerado.
+                open(self.spool_path, 'wb').close()
+                self._write_offset(0)
+                logger.info("Spool de logs compactado.")
+            except OSError as e:
+                logger.warning(f"Não foi possível compactar o spool de logs: {e}")
+
+    # --- Envio ---
+
+    def _run(self):
+        backoff = FLUSH_INTERVAL_SECONDS
+        while not self._stop.is_set():
+            self._collect(timeout=FLUSH_INTERVAL_SECONDS)
+            if not self._pending:
+                continue
+            if self.flush():
+                backoff = FLUSH_INTERVAL_SECONDS
+            else:
+                logger.warning(f"Envio de logs falhou; nova tentativa em {backoff}s.")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_RETRY_BACKOFF_SECONDS)
+
+    def _collect(self, timeout: float):
+        """Aguarda entradas até completar um lote ou o intervalo de envio expirar."""
+        deadline = time.monotonic() + timeout
+        while len(self._pending) < FLUSH_MAX_ENTRIES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                self._pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+    def flush(self) -> bool:
+        """Envia as entradas pendentes, agrupadas por partição mensal. Retorna True se tudo foi enviado."""
+        with self._flush_lock:
+            while True:
+                try:
+                    self._pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._pending:
+                return True
+            try:
+                sheet_ops = self.sheet_ops
+                if not sheet_ops.spreadsheet:
+                    return False
+                # Sequências consecutivas da mesma partição, na ordem do spool, para que o
+                # offset só avance sobre entradas efetivamente enviadas.
+                runs = []
+                for entry in self._pending:
+                    moment = datetime.strptime(entry[0][0], "%Y-%m-%d %H:%M:%S")
+                    partition_name = ensure_partition(sheet_ops, moment)
+                    if runs and runs[-1][0] == partition_name:
+                        runs[-1][1].append(entry)
+                    else:
+                        runs.append((partition_name, [entry]))
+
+                for partition_name, entries in runs:
+                    worksheet = sheet_ops._get_worksheet(partition_name)
+                    if worksheet is None:
+                        return False
+                    # RAW: o timestamp fica como texto '%Y-%m-%d %H:%M:%S', formato que o leitor compara e interpreta.
+                    worksheet.append_rows([row for row, _ in entries], value_input_option='RAW')
+                    flushed_offset = entries[-1][1]
+                    self._write_offset(flushed_offset)
+                    self._pending = self._pending[len(entries):]
+                    logger.info(f"{len(entries)} entradas de log enviadas para '{partition_name}'.")
+
+                self._compact_spool(flushed_offset)
+                return True
+            except Exception as e:
+                logger.error(f"Falha ao enviar lote de logs: {e}", exc_info=True)
+                return False
+
+    def close(self):
+        """Tenta enviar o que estiver pendente antes de encerrar o processo."""
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+
+@st.cache_resource
+def get_audit_log_writer() -> AuditLogWriter:
+    """Gravador único por processo, compartilhado entre as sessões."""
+    return AuditLogWriter()
@@ -2,8 +2,7 @@ import streamlit as st
 from datetime import datetime
 import json
 import logging
-from operations.sheet import SheetOperations
-from gdrive.config import MATRIX_SPREADSHEET_ID, CENTRAL_LOG_SHEET_NAME
+from operations.audit_log_writer import get_audit_log_writer
 
 # Create a logger
 logger = logging.getLogger(__name__)
@@ -22,8 +21,10 @@ logger.addHandler(handler)
 
 def log_action(action: str, details: dict):
     """
-    Registra uma ação do usuário na aba de log central da Planilha Matriz.
+    Registra uma ação do usuário na partição mensal do log central da Planilha Matriz.
     Agora, as informações do usuário são obtidas diretamente da sessão.
+    O envio é assíncrono: a entrada vai para o spool local e é gravada em lote
+    pelo AuditLogWriter, sem bloquear a operação do usuário.
     """
     try:
 
@@ -35,10 +36,9 @@ def log_action(action: str, details: dict):
         details_str = json.dumps(details, ensure_ascii=False)
         log_row = [timestamp, user_email, user_role, action, details_str, target_unit]
 
-        matrix_sheet_ops = SheetOperations(MATRIX_SPREADSHEET_ID)
-        matrix_sheet_ops.adc_linha_simples(CENTRAL_LOG_SHEET_NAME, log_row)
+        get_audit_log_writer().enqueue(log_row)
         
-        print(f"LOG SUCCESS: Action '{action}' by '{user_email}' logged.")
+        print(f"LOG QUEUED: Action '{action}' by '{user_email}' queued.")
 
     except Exception as e:
         print(f"LOG FAILED: Could not log action '{action}'. Reason: {e}")
\ No newline at end of file
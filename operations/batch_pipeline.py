@@ -0,0 +1,461 @@
+import io
+import os
+import re
+import json
+import time
+import logging
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+import streamlit as st
+from fuzzywuzzy import fuzz, process
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from AI.extraction_cache import hash_bytes
+from analysis.nr_analyzer import use_combined_mode
+from operations.audit_logger import log_action
+from operations.hash_index import get_hash_index, describe_reuse
+from operations.normalization import padronizar_norma
+from operations.nr_rules import get_nr_rules
+
+logger = logging.getLogger('segsisone_app.batch_pipeline')
+
+# Chamadas simultâneas por etapa. A extração e a classificação usam o modelo de extração;
+# a auditoria usa o modelo de auditoria, de cota bem menor.
+STAGE_LIMITS = {'classify': 4, 'extract': 4, 'audit': 2, 'upload': 4}
+POOL_SIZE = 8
+# Arquivos maiores que isso (dentro ou fora do zip) são recusados.
+MAX_FILE_BYTES = 25 * 1024 * 1024
+# Arquivos que falham por cota/instabilidade da IA voltam para a fila até este número de vezes,
+# após a espera sugerida pela API (ou QUOTA_PAUSE_SECONDS).
+MAX_AI_REQUEUES = 2
+QUOTA_PAUSE_SECONDS = 30
+# Pontuação mínima para associar o nome do trabalhador a um funcionário da empresa.
+MIN_NAME_SCORE = 85
+
+TABLE_BY_TYPE = {'ASO': 'asos', 'Treinamento': 'treinamentos', 'Doc. Empresa': 'documentos_empresa'}
+COMPANY_DOC_TYPES = ('PGR', 'PCMSO', 'PPR', 'PCA')
+
+STATUS_QUEUED = '⏳ Na fila'
+STATUS_READY = '📝 Pronto para gravar'
+STATUS_WAITING = '⏸️ Aguardando a cota da IA'
+STATUS_SAVED = '✅ Salvo'
+STATUS_SKIPPED = '⏭️ Ignorado'
+STATUS_ERROR = '❌ Erro'
+STAGE_STATUS = {
+    'classify': '🔎 Classificando',
+    'extract': '📄 Extraindo dados',
+    'audit': '🧐 Auditando',
+    'upload': '☁️ Enviando ao Drive',
+}
+
+CLASSIFY_PROMPT = """
+Você é um assistente de triagem de documentos de Saúde e Segurança do Trabalho.
+Responda APENAS com um bloco JSON válido, sem texto antes ou depois:
+
+{
+"tipo": "Um dos valores: 'ASO', 'Treinamento' (certificado de treinamento/capacitação de NR), 'Doc. Empresa' (PGR, PCMSO, PPR ou PCA) ou 'Outro'.",
+"nome_trabalhador": "Nome completo do trabalhador a quem o documento se refere, ou null se for um documento da empresa."
+}
+"""
+
+
+class _AIFailure(Exception):
+    """Falha de uma chamada à IA dentro de uma etapa, com o AIResult correspondente."""
+
+    def __init__(self, result):
+        super().__init__(result.message)
+        self.result = result
+
+
+class _PDFUpload(io.BytesIO):
+    """Conteúdo em memória com a mesma interface usada dos arquivos do st.file_uploader."""
+
+    def __init__(self, content: bytes, name: str):
+        super().__init__(content)
+        self.name = name
+        self.type = 'application/pdf'
+
+
+class BatchItem:
+    """Um PDF do lote e o seu andamento pelas etapas."""
+
+    def __init__(self, name: str, content: bytes, origem: str = ''):
+        self.name = name
+        self.content = content
+        self.origem = origem
+        self.arquivo_hash = None
+        self.doc_type = None
+        self.nome_trabalhador = None
+        self.funcionario_id = None
+        self.info = None
+        self.audit_result = None
+        self.arquivo_id = None
+        self.record_id = None
+        self.status = STATUS_QUEUED
+        self.mensagem = ''
+        self.seconds = 0.0
+
+    @property
+    def is_active(self) -> bool:
+        return self.status not in (STATUS_SKIPPED, STATUS_ERROR, STATUS_SAVED)
+
+    def finish(self, status: str, mensagem: str):
+        self.status, self.mensagem = status, mensagem
+
+    def as_upload(self) -> _PDFUpload:
+        return _PDFUpload(self.content, self.name)
+
+
+def expand_uploads(uploaded_files) -> list[BatchItem]:
+    """Lê os PDFs enviados e os PDFs dentro dos arquivos .zip (subpastas incluídas)."""
+    items = []
+    for uploaded in uploaded_files:
+        if uploaded.name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(io.BytesIO(uploaded.getvalue())) as archive:
+                    for member in archive.infolist():
+                        base_name = os.path.basename(member.filename)
+                        if member.is_dir() or not base_name.lower().endswith('.pdf') or member.filename.startswith('__MACOSX/') or base_name.startswith('._'):
+                            continue
+                        if member.file_size > MAX_FILE_BYTES:
+                            item = BatchItem(base_name, b'', uploaded.name)
+                            item.finish(STATUS_ERROR, "Arquivo acima do tamanho máximo")
+                        else:
+                            item = BatchItem(base_name, archive.read(member), uploaded.name)
+                        items.append(item)
+            except zipfile.BadZipFile:
+                item = BatchItem(uploaded.name, b'', uploaded.name)
+                item.finish(STATUS_ERROR, "Arquivo .zip inválido ou corrompido")
+                items.append(item)
+        else:
+            item = BatchItem(uploaded.name, uploaded.getvalue())
+            if len(item.content) > MAX_FILE_BYTES:
+                item.finish(STATUS_ERROR, "Arquivo acima do tamanho máximo")
+            items.append(item)
+    return items
+
+
+def non_conformities(audit_result: dict | None) -> list[dict]:
+    """Itens 'Não Conforme' de uma auditoria, sem o resumo executivo."""
+    if not audit_result or 'não conforme' not in audit_result.get('summary', '').lower():
+        return []
+    return [
+        item for item in audit_result.get('details', [])
+        if item.get('status', '').lower() == 'não conforme'
+        and 'resumo executivo' not in item.get('item_verificacao', '').lower()
+    ]
+
+
+def _norma_from_name(file_name: str) -> str:
+    """Norma conhecida indicada pelo nome do arquivo ('NR 35.pdf' -> 'NR-35'); '' se não houver."""
+    norma = padronizar_norma(os.path.splitext(file_name)[0].upper())
+    return norma if norma in get_nr_rules().normas else ''
+
+
+def _guess_type_from_name(file_name: str) -> str | None:
+    stem = os.path.splitext(file_name)[0].upper()
+    tokens = set(re.split(r'[^A-Z0-9]+', stem))
+    if 'ASO' in tokens:
+        return 'ASO'
+    if tokens.intersection(COMPANY_DOC_TYPES):
+        return 'Doc. Empresa'
+    if _norma_from_name(file_name):
+        return 'Treinamento'
+    return None
+
+
+class BatchPipeline:
+    """
+    Entrada em lote dos PDFs de uma empresa: hash -> duplicidade -> classificação ->
+    extração -> auditoria -> upload -> gravação.
+
+    Hash e duplicidade rodam antes de qualquer chamada à IA. As etapas seguintes são
+    executadas por arquivo em um pool de threads, cada uma limitada pelo seu semáforo
+    (STAGE_LIMITS), de modo que o ritmo é dado pela cota dos modelos. A gravação acontece
+    uma única vez no final: uma chamada em lote por aba e uma recarga dos dados.
+    """
+
+    def __init__(self, employee_manager, docs_manager, nr_analyzer, action_plan_manager, company_id: str, run_audit: bool = True):
+        self.employee_manager = employee_manager
+        self.docs_manager = docs_manager
+        self.nr_analyzer = nr_analyzer
+        self.action_plan_manager = action_plan_manager
+        self.company_id = str(company_id)
+        self.run_audit = run_audit and nr_analyzer is not None
+        self._limits = {stage: threading.BoundedSemaphore(limit) for stage, limit in STAGE_LIMITS.items()}
+        employees = employee_manager.get_employees_by_company(self.company_id)
+        self._employees = dict(zip(employees['id'].astype(str).tolist(), employees['nome'].astype(str).tolist())) if not employees.empty else {}
+
+    # --- Etapas 1 e 2: hash e duplicidade (sem IA) ---
+
+    def prepare(self, items: list[BatchItem]) -> list[BatchItem]:
+        hash_index = get_hash_index(self.employee_manager.spreadsheet_id)
+        seen = {}
+        for item in items:
+            if not item.is_active:
+                continue
+            item.arquivo_hash = hash_bytes(item.content)
+            if item.arquivo_hash in seen:
+                item.finish(STATUS_SKIPPED, f"Duplicado no lote (mesmo conteúdo de '{seen[item.arquivo_hash]}')")
+                continue
+            seen[item.arquivo_hash] = item.name
+            existing = sorted(hash_index.entries(item.arquivo_hash))
+            if existing:
+                item.finish(STATUS_SKIPPED, f"Já cadastrado: {describe_reuse(existing)}")
+        return items
+
+    # --- Etapas 3 a 6: por arquivo, com concorrência limitada por etapa ---
+
+    def _stage(self, item: BatchItem, stage: str, func):
+        with self._limits[stage]:
+            item.status = STAGE_STATUS[stage]
+            return func(item)
+
+    def _match_employee(self, *names) -> str | None:
+        """ID do funcionário da empresa com o nome mais parecido; None se ausente ou ambíguo."""
+        if not self._employees:
+            return None
+        for name in names:
+            query = re.sub(r'[_\-.\d]+', ' ', name or '').strip()
+            if not query:
+                continue
+            matches = process.extract(query, self._employees, scorer=fuzz.token_set_ratio, limit=2)
+            if not matches or matches[0][1] < MIN_NAME_SCORE:
+                continue
+            if len(matches) > 1 and matches[1][1] == matches[0][1]:
+                continue
+            return matches[0][2]
+        return None
+
+    def _classify(self, item: BatchItem):
+        """Tenta pelo nome do arquivo; só consulta a IA quando o tipo ou o funcionário não ficam claros."""
+        item.doc_type = _guess_type_from_name(item.name)
+        stem = os.path.splitext(item.name)[0]
+        if item.doc_type == 'Doc. Empresa':
+            return
+        if item.doc_type is not None:
+            item.funcionario_id = self._match_employee(stem)
+            if item.funcionario_id:
+                return
+
+        result = self.employee_manager.pdf_analyzer.ask([item.content], CLASSIFY_PROMPT, expect_json=True)
+        if not result.ok:
+            raise _AIFailure(result)
+        match = re.search(r'\{.*\}', result.text, re.DOTALL)
+        data = json.loads(match.group(0)) if match else {}
+        tipo = str(data.get('tipo') or '').strip()
+        item.doc_type = item.doc_type or (tipo if tipo in TABLE_BY_TYPE else None)
+        item.nome_trabalhador = data.get('nome_trabalhador')
+        if item.doc_type in ('ASO', 'Treinamento'):
+            item.funcionario_id = self._match_employee(item.nome_trabalhador, stem)
+
+    def _extract(self, item: BatchItem):
+        upload = item.as_upload()
+        info = None
+        if self.run_audit and item.doc_type in ('ASO', 'Treinamento') and use_combined_mode(item.doc_type) and item.audit_result is None:
+            # Modo combinado: a auditoria sai na mesma chamada; o que vier inválido segue pelo caminho separado.
+            info, item.audit_result = self.employee_manager.analyze_pdf_with_audit(
+                upload, item.doc_type, self.nr_analyzer, _norma_from_name(item.name)
+            )
+        if not info:
+            if item.doc_type == 'ASO':
+                info = self.employee_manager.analyze_aso_pdf(upload)
+            elif item.doc_type == 'Treinamento':
+                info = self.employee_manager.analyze_training_pdf(upload)
+            else:
+                info = self.docs_manager.analyze_company_doc_pdf(upload)
+        if item.doc_type == 'Treinamento' and info and info.get('data'):
+            info['vencimento'] = self.employee_manager.calcular_vencimento_treinamento(
+                info['data'], info.get('norma'), info.get('modulo'), info.get('tipo_treinamento', 'formação')
+            )
+        if not info:
+            analyzer = self.docs_manager.pdf_analyzer if item.doc_type == 'Doc. Empresa' else self.employee_manager.pdf_analyzer
+            last_result = analyzer.last_result
+            if last_result is not None and not last_result.ok:
+                raise _AIFailure(last_result)
+        if info:
+            info['type'] = item.doc_type
+            info['arquivo_hash'] = item.arquivo_hash
+        item.info = info
+
+    def _audit(self, item: BatchItem):
+        if item.audit_result is not None:  # já veio da chamada combinada
+            return
+        item.audit_result = self.nr_analyzer.perform_initial_audit(item.info, item.content) or {"summary": "Falha na Auditoria", "details": []}
+
+    def _file_name(self, item: BatchItem) -> str:
+        """Mesmo padrão de nomes usado no cadastro individual (front/dashboard.py)."""
+        info = item.info
+        if item.doc_type == 'ASO':
+            emp_name = self.employee_manager.get_employee_name(item.funcionario_id)
+            return f"ASO_{emp_name}_{info['data_aso'].strftime('%Y%m%d')}.pdf"
+        if item.doc_type == 'Treinamento':
+            emp_name = self.employee_manager.get_employee_name(item.funcionario_id)
+            return f"TRAINING_{emp_name}_{info['norma']}_{info['data'].strftime('%Y%m%d')}.pdf"
+        company_name = self.employee_manager.get_company_name(self.company_id)
+        return f"{info['tipo_documento']}_{company_name}_{info['data_emissao'].strftime('%Y%m%d')}.pdf"
+
+    def _upload(self, item: BatchItem):
+        item.arquivo_id = self.employee_manager.upload_documento_e_obter_link(item.as_upload(), self._file_name(item))
+
+    def _validate(self, item: BatchItem) -> str | None:
+        """Mesmas regras do cadastro individual; retorna a mensagem de erro ou None."""
+        if item.doc_type == 'Treinamento':
+            if not item.info.get('vencimento'):
+                return "Vencimento não pôde ser calculado para esta norma"
+            is_valid, msg = self.employee_manager.validate_training_data({**item.info, 'funcionario_id': item.funcionario_id})
+            return None if is_valid else msg
+        if item.doc_type == 'Doc. Empresa' and not item.info.get('vencimento'):
+            return "Regra de validade não encontrada para o documento"
+        return None
+
+    def _run_stages(self, item: BatchItem):
+        self._stage(item, 'classify', self._classify)
+        if item.doc_type is None:
+            return item.finish(STATUS_SKIPPED, "Tipo de documento não suportado no lote (ASO, Treinamento ou Doc. Empresa)")
+        if item.doc_type in ('ASO', 'Treinamento') and not item.funcionario_id:
+            nome = f" '{item.nome_trabalhador}'" if item.nome_trabalhador else ""
+            return item.finish(STATUS_ERROR, f"Funcionário{nome} não identificado entre os funcionários da empresa")
+
+        self._stage(item, 'extract', self._extract)
+        if not item.info:
+            return item.finish(STATUS_ERROR, "Não foi possível extrair as informações do documento")
+        error = self._validate(item)
+        if error:
+            return item.finish(STATUS_ERROR, error)
+
+        if self.run_audit:
+            self._stage(item, 'audit', self._audit)
+        self._stage(item, 'upload', self._upload)
+        if not item.arquivo_id:
+            return item.finish(STATUS_ERROR, "Falha no upload para o Google Drive")
+        item.finish(STATUS_READY, "")
+
+    def _process(self, item: BatchItem):
+        start = time.monotonic()
+        try:
+            for attempt in range(MAX_AI_REQUEUES + 1):
+                try:
+                    return self._run_stages(item)
+                except _AIFailure as failure:
+                    result = failure.result
+                    if not result.retryable or attempt == MAX_AI_REQUEUES:
+                        return item.finish(STATUS_ERROR, result.user_message)
+                    pause = max(result.retry_after or 0, QUOTA_PAUSE_SECONDS)
+                    item.finish(STATUS_WAITING, f"Nova tentativa em {pause:.0f}s ({result.user_message})")
+                    time.sleep(pause)
+        except Exception as e:
+            logger.error(f"Lote: erro ao processar '{item.name}': {e}", exc_info=True)
+            item.finish(STATUS_ERROR, f"Erro inesperado: {e}")
+        finally:
+            item.seconds = time.monotonic() - start
+
+    def run(self, items: list[BatchItem], on_progress=None, progress_interval: float = 1.0) -> list[BatchItem]:
+        """
+        Processa o lote e grava os resultados. `on_progress(items)` é chamado na thread
+        principal a cada `progress_interval` segundos, para atualizar a tabela de status.
+        """
+        self.prepare(items)
+        pending_items = [item for item in items if item.is_active]
+        if pending_items:
+            # Inicializa na thread principal o que é carregado sob demanda (spinners, cache_resource).
+            self.employee_manager.pdf_analyzer
+            self.docs_manager.pdf_analyzer
+            if self.run_audit:
+                self.nr_analyzer.rag_df
+
+            # As threads do lote herdam o contexto da sessão (mensagens st.* e cache continuam funcionando).
+            ctx = get_script_run_ctx()
+            executor = ThreadPoolExecutor(
+                max_workers=POOL_SIZE, thread_name_prefix="lote",
+                initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+            )
+            try:
+                pending = {executor.submit(self._process, item) for item in pending_items}
+                while pending:
+                    _, pending = wait(pending, timeout=progress_interval, return_when=FIRST_COMPLETED)
+                    if on_progress:
+                        on_progress(items)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        self._write([item for item in items if item.status == STATUS_READY])
+        if on_progress:
+            on_progress(items)
+        return items
+
+    # --- Etapa 7: gravação em lote ---
+
+    def _write(self, items: list[BatchItem]):
+        if not items:
+            return
+        groups = {}
+        for item in items:
+            groups.setdefault(TABLE_BY_TYPE[item.doc_type], []).append(item)
+
+        builders = {
+            'asos': lambda item: self.employee_manager.build_aso_row({**item.info, 'funcionario_id': item.funcionario_id, 'arquivo_id': item.arquivo_id}),
+            'treinamentos': lambda item: self.employee_manager.build_training_row({**item.info, 'funcionario_id': item.funcionario_id, 'anexo': item.arquivo_id}),
+            'documentos_empresa': lambda item: self.docs_manager.build_company_doc_row(
+                self.company_id, item.info['tipo_documento'], item.info['data_emissao'], item.info['vencimento'], item.arquivo_id, item.arquivo_hash
+            ),
+        }
+        for tabela, group in groups.items():
+            sheet_ops = self.docs_manager.sheet_ops if tabela == 'documentos_empresa' else self.employee_manager.sheet_ops
+            ids = sheet_ops.adc_dados_aba_em_lote(tabela, [builders[tabela](item) for item in group])
+            for i, item in enumerate(group):
+                if ids:
+                    item.record_id = str(ids[i])
+                    item.finish(STATUS_SAVED, "")
+                else:
+                    logger.error(f"Lote: falha ao gravar '{item.name}' em '{tabela}'; arquivo já enviado: {item.arquivo_id}")
+                    item.finish(STATUS_ERROR, "Falha ao gravar na planilha (o arquivo foi enviado ao Drive)")
+
+        # Não conformidades das auditorias, também em uma única escrita.
+        prefixes = {'asos': 'audit_aso', 'treinamentos': 'audit_trn', 'documentos_empresa': 'audit_doc'}
+        action_rows = []
+        for item in items:
+            if item.status != STATUS_SAVED or self.action_plan_manager is None:
+                continue
+            found = non_conformities(item.audit_result)
+            for item_details in found:
+                action_rows.append(self.action_plan_manager.build_action_item_row(
+                    f"{prefixes[TABLE_BY_TYPE[item.doc_type]]}_{item.record_id}", self.company_id,
+                    item.record_id, item_details, item.funcionario_id
+                ))
+            if found:
+                item.mensagem = f"{len(found)} não conformidade(s) no Plano de Ação"
+        if action_rows:
+            if not self.action_plan_manager.sheet_ops.adc_dados_aba_em_lote("plano_acao", action_rows):
+                st.error("Os documentos foram salvos, mas não foi possível registrar as não conformidades no Plano de Ação.")
+
+        saved = [item for item in items if item.status == STATUS_SAVED]
+        st.cache_data.clear()
+        self.employee_manager.load_data()
+        self.docs_manager.load_company_data()
+        if self.action_plan_manager is not None:
+            self.action_plan_manager.load_data()
+        log_action("BATCH_INTAKE", {
+            "company_id": self.company_id,
+            "files_saved": len(saved),
+            "by_type": {t: sum(1 for i in saved if i.doc_type == t) for t in TABLE_BY_TYPE},
+            "action_items": len(action_rows),
+        })
+        logger.info(f"Lote: {len(saved)} documento(s) e {len(action_rows)} item(ns) de plano de ação gravados.")
+
+
+def status_table(items: list[BatchItem]) -> pd.DataFrame:
+    """Tabela de status por arquivo para exibição/download."""
+    return pd.DataFrame([{
+        'arquivo': item.name,
+        'origem': item.origem,
+        'tipo': item.doc_type or '',
+        'funcionario_id': item.funcionario_id or '',
+        'status': item.status,
+        'mensagem': item.mensagem,
+        'registro_id': item.record_id or '',
+        'segundos': round(item.seconds, 1),
+    } for item in items])
@@ -0,0 +1,206 @@
+import io
+import logging
+import unicodedata
+from datetime import date
+from functools import lru_cache
+
+import pandas as pd
+import streamlit as st
+
+from operations.audit_logger import log_action
+from operations.normalization import parse_flexible_date_series
+
+logger = logging.getLogger('segsisone_app.bulk_import')
+
+# Linhas por chamada append_rows (cada chamada também lê a coluna de IDs uma vez).
+CHUNK_SIZE = 200
+
+# Cabeçalhos aceitos no arquivo (sem acentos, minúsculos) -> coluna interna.
+COLUMN_ALIASES = {
+    'empresa': 'empresa', 'nome_empresa': 'empresa', 'razao_social': 'empresa',
+    'cnpj': 'cnpj',
+    'nome': 'nome', 'funcionario': 'nome', 'nome_funcionario': 'nome', 'colaborador': 'nome',
+    'cargo': 'cargo', 'funcao': 'cargo',
+    'data_admissao': 'data_admissao', 'admissao': 'data_admissao', 'data_de_admissao': 'data_admissao',
+}
+IMPORT_COLUMNS = ['empresa', 'cnpj', 'nome', 'cargo', 'data_admissao']
+
+STATUS_OK = '✅ Importado'
+STATUS_ERROR = '❌ Erro'
+
+
+def _normalize_header(header) -> str:
+    text = unicodedata.normalize('NFKD', str(header)).encode('ascii', 'ignore').decode()
+    return '_'.join(text.strip().lower().split())
+
+
+@lru_cache(maxsize=4096)
+def _is_valid_cnpj(digits: str) -> bool:
+    """Valida os dois dígitos verificadores de um CNPJ com 14 dígitos."""
+    if len(digits) != 14 or len(set(digits)) == 1:
+        return False
+    numbers = [int(d) for d in digits]
+    for size in (12, 13):
+        weights = list(range(size - 7, 1, -1)) + list(range(9, 1, -1))
+        remainder = sum(n * w for n, w in zip(numbers[:size], weights)) % 11
+        if numbers[size] != (0 if remainder < 2 else 11 - remainder):
+            return False
+    return True
+
+
+def _cnpj_digits(cnpj: pd.Series) -> pd.Series:
+    """Só os dígitos, completados com zeros à esquerda (planilhas e Excel perdem o zero inicial)."""
+    digits = cnpj.astype(str).str.replace(r'\D', '', regex=True)
+    return digits.where(digits == '', digits.str.zfill(14))
+
+
+def _format_cnpj(digits: str) -> str:
+    """CNPJ com máscara (gravado como texto, preservando o zero inicial)."""
+    return f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/{digits[8:12]}-{digits[12:]}"
+
+
+def read_import_file(uploaded_file) -> pd.DataFrame:
+    """Lê um CSV (',' ou ';') ou XLSX com todas as colunas como texto e cabeçalhos padronizados."""
+    content = uploaded_file.getvalue()
+    if uploaded_file.name.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(io.BytesIO(content), dtype=str)
+    else:
+        try:
+            text = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            text = content.decode('latin-1')
+        df = pd.read_csv(io.StringIO(text), dtype=str, sep=None, engine='python')
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(_normalize_header(c), _normalize_header(c)))
+    for col in IMPORT_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+    df = df[IMPORT_COLUMNS].fillna('').apply(lambda col: col.str.strip())
+    # Número da linha no arquivo (cabeçalho = linha 1), usado no relatório.
+    df.index = pd.RangeIndex(2, len(df) + 2, name='linha')
+    return df[(df != '').any(axis=1)]
+
+
+class BulkImporter:
+    """
+    Importação em lote de empresas e funcionários de uma unidade.
+    `validate` confere o arquivo localmente contra os dados já carregados; `run` grava as
+    linhas válidas com `append_rows` em blocos e recarrega os dados uma única vez no final.
+    """
+
+    def __init__(self, employee_manager):
+        self.employee_manager = employee_manager
+        self.sheet_ops = employee_manager.sheet_ops
+
+    def validate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Retorna o plano de importação: uma linha por linha do arquivo, com `cnpj_digitos`,
+        `empresa_id` (quando a empresa já existe), `data_admissao_dt` e a lista `erros`.
+        Linhas sem funcionário (apenas empresa/CNPJ) cadastram somente a empresa.
+        """
+        plan = df.copy()
+        plan['cnpj_digitos'] = _cnpj_digits(plan['cnpj'])
+        plan['data_admissao_dt'] = parse_flexible_date_series(plan['data_admissao'])
+        plan['tem_funcionario'] = (plan[['nome', 'cargo', 'data_admissao']] != '').any(axis=1)
+        errors = {linha: [] for linha in plan.index}
+
+        def flag(mask: pd.Series, message: str):
+            for linha in plan.index[mask.to_numpy()]:
+                errors[linha].append(message)
+
+        # Empresas: CNPJ válido, já cadastrado (e ativo) ou novo com nome.
+        companies = self.employee_manager.companies_df
+        existing = pd.DataFrame(columns=['id', 'status', 'cnpj_digitos'])
+        if not companies.empty:
+            existing = companies.reset_index(drop=True)[['id', 'status']].assign(
+                cnpj_digitos=_cnpj_digits(companies['cnpj']).to_numpy()
+            ).drop_duplicates(subset='cnpj_digitos')
+        existing_by_cnpj = existing.set_index('cnpj_digitos')
+        plan['empresa_id'] = plan['cnpj_digitos'].map(existing_by_cnpj['id'])
+        company_status = plan['cnpj_digitos'].map(existing_by_cnpj['status']).fillna('').str.lower()
+        is_new_company = plan['empresa_id'].isna()
+
+        valid_cnpj = plan['cnpj_digitos'].map(_is_valid_cnpj)
+        flag(plan['cnpj_digitos'] == '', "CNPJ não informado")
+        flag((plan['cnpj_digitos'] != '') & ~valid_cnpj, "CNPJ inválido")
+        flag(~is_new_company & (company_status != 'ativo'), "Empresa arquivada")
+        flag(is_new_company & (plan['empresa'] == ''), "Nome da empresa obrigatório para CNPJ não cadastrado")
+        names_per_cnpj = plan.loc[is_new_company & (plan['empresa'] != '')].groupby('cnpj_digitos')['empresa'].agg(lambda names: names.str.upper().nunique())
+        flag(is_new_company & plan['cnpj_digitos'].map(names_per_cnpj).gt(1), "CNPJ com nomes de empresa diferentes no arquivo")
+
+        # Funcionários: campos obrigatórios, data e duplicidade (no arquivo e na unidade).
+        employees = plan['tem_funcionario']
+        flag(employees & (plan['nome'] == ''), "Nome do funcionário não informado")
+        flag(employees & (plan['cargo'] == ''), "Cargo não informado")
+        flag(employees & plan['data_admissao_dt'].isna(), "Data de admissão ausente ou inválida")
+        flag(employees & (plan['data_admissao_dt'] > pd.Timestamp(date.today())), "Data de admissão futura")
+
+        name_key = plan['nome'].str.upper()
+        flag(employees & (plan['nome'] != '') & pd.DataFrame({'c': plan['cnpj_digitos'], 'n': name_key}).duplicated(),
+             "Funcionário repetido no arquivo")
+        current = self.employee_manager.employees_df
+        if not current.empty:
+            current_keys = set(zip(current['empresa_id'].astype(str).tolist(), current['nome'].astype(str).str.strip().str.upper().tolist()))
+            already = [
+                (empresa_id, nome) in current_keys if isinstance(empresa_id, str) else False
+                for empresa_id, nome in zip(plan['empresa_id'].tolist(), name_key.tolist())
+            ]
+            flag(employees & pd.Series(already, index=plan.index), "Funcionário já cadastrado nesta empresa")
+
+        plan['erros'] = pd.Series(errors)
+        return plan
+
+    def _append_in_chunks(self, aba_name: str, rows: list) -> list:
+        """Grava `rows` em blocos; retorna um ID (ou None, se o bloco falhou) por linha."""
+        ids = []
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = rows[start:start + CHUNK_SIZE]
+            chunk_ids = self.sheet_ops.adc_dados_aba_em_lote(aba_name, chunk)
+            ids.extend([str(i) for i in chunk_ids] if chunk_ids else [None] * len(chunk))
+        return ids
+
+    def run(self, plan: pd.DataFrame) -> pd.DataFrame:
+        """Grava as linhas sem erros e retorna o resultado por linha do arquivo."""
+        valid = plan[plan['erros'].map(len) == 0]
+        result = plan[['empresa', 'nome']].copy()
+        result['status'] = STATUS_ERROR
+        result['mensagem'] = plan['erros'].map('; '.join)
+        result['empresa_id'] = plan['empresa_id'].astype(object)
+        result['funcionario_id'] = pd.Series(None, index=plan.index, dtype=object)
+
+        # 1. Empresas novas (uma por CNPJ), para obter os IDs usados pelos funcionários.
+        new_companies = valid[valid['empresa_id'].isna()].drop_duplicates(subset='cnpj_digitos')
+        company_ids = dict(zip(
+            new_companies['cnpj_digitos'].tolist(),
+            self._append_in_chunks("empresas", [[row.empresa, _format_cnpj(row.cnpj_digitos), "Ativo"] for row in new_companies.itertuples()]),
+        ))
+        empresa_ids = valid['empresa_id'].fillna(valid['cnpj_digitos'].map(company_ids))
+        result.loc[valid.index, 'empresa_id'] = empresa_ids
+        failed_company = empresa_ids.isna()
+        result.loc[failed_company[failed_company].index, 'mensagem'] = "Falha ao cadastrar a empresa"
+
+        # 2. Funcionários das empresas existentes ou recém-criadas.
+        to_add = valid[~failed_company & valid['tem_funcionario']]
+        employee_ids = self._append_in_chunks("funcionarios", [
+            [row.nome, empresa_ids[row.Index], row.cargo, row.data_admissao_dt.strftime("%d/%m/%Y"), "Ativo"]
+            for row in to_add.itertuples()
+        ])
+        result.loc[to_add.index, 'funcionario_id'] = employee_ids
+        saved = pd.Series([i is not None for i in employee_ids], index=to_add.index, dtype=bool)
+        result.loc[saved[saved].index, ['status', 'mensagem']] = [STATUS_OK, "Funcionário cadastrado"]
+        result.loc[saved[~saved].index, 'mensagem'] = "Falha ao gravar o funcionário"
+
+        company_only = valid[~failed_company & ~valid['tem_funcionario']]
+        result.loc[company_only.index, ['status', 'mensagem']] = [STATUS_OK, "Empresa cadastrada ou já existente"]
+
+        # 3. Uma única recarga para todas as escritas.
+        created_companies = sum(1 for i in company_ids.values() if i is not None)
+        created_employees = int(saved.sum())
+        if created_companies or created_employees:
+            st.cache_data.clear()
+            self.employee_manager.load_data()
+        log_action("BULK_IMPORT", {
+            "rows": len(plan), "companies_created": created_companies,
+            "employees_created": created_employees, "rows_with_errors": int((result['status'] != STATUS_OK).sum()),
+        })
+        logger.info(f"Importação em lote: {created_companies} empresas e {created_employees} funcionários cadastrados.")
+        return result.reset_index()
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 from operations.sheet import SheetOperations
+from operations.normalization import add_training_normalization_columns
+from operations.unit_indexes import build_current_trainings, build_latest_asos
 import logging
 
 logger = logging.getLogger(__name__)
@@ -76,7 +78,9 @@ def load_all_unit_data(spreadsheet_id: str) -> dict:
             'companies': pd.DataFrame(),
             'employees': pd.DataFrame(),
             'asos': pd.DataFrame(),
+            'latest_asos': pd.DataFrame(),
             'trainings': pd.DataFrame(),
+            'current_trainings': pd.DataFrame(),
             'epis': pd.DataFrame(),
             'company_docs': pd.DataFrame(),
             'action_plan': pd.DataFrame()
@@ -109,5 +113,12 @@ def load_all_unit_data(spreadsheet_id: str) -> dict:
                 if col in df.columns:
                     df[col] = pd.to_datetime(df[col], format='%d/%m/%Y', errors='coerce')
     
-    # 5. Retorna TUDO de uma vez
+    # 5. Normaliza norma/módulo dos treinamentos uma única vez (vetorizado)
+    data['trainings'] = add_training_normalization_columns(data['trainings'])
+    
+    # 6. Tabelas derivadas, construídas uma vez por carga da unidade
+    data['current_trainings'] = build_current_trainings(data['trainings'])
+    data['latest_asos'] = build_latest_asos(data['asos'])
+    
+    # 7. Retorna TUDO de uma vez
     return data
\ No newline at end of file
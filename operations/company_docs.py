@@ -1,16 +1,18 @@
 import pandas as pd
 import streamlit as st
-from datetime import datetime, timedelta, date
+from datetime import date
 import re
 import logging
 from operations.sheet import SheetOperations
 from AI.api_Operation import PDFQA
-import tempfile
-import os
 from operations.audit_logger import log_action
 from operations.cached_loaders import load_all_unit_data
 from gdrive.google_api_manager import GoogleApiManager
-from operations.file_hash import calcular_hash_arquivo, verificar_hash_seguro
+from operations.file_hash import calcular_hash_arquivo
+from operations.hash_index import get_hash_index, describe_reuse
+from operations.data_versions import get_data_version
+from operations.normalization import parse_flexible_date
+from operations.nr_rules import get_nr_rules
 
 logger = logging.getLogger('segsisone_app.company_docs_manager')
 
@@ -38,7 +40,7 @@ class CompanyDocsManager:
     @property
     def pdf_analyzer(self):
         if self._pdf_analyzer is None:
-            self._pdf_analyzer = PDFQA()
+            self._pdf_analyzer = PDFQA(unit_id=self.spreadsheet_id)
         return self._pdf_analyzer
 
 
@@ -71,29 +73,16 @@ class CompanyDocsManager:
         return pd.DataFrame()
         
     def _parse_flexible_date(self, date_string: str) -> date | None:
-        if not date_string or date_string.lower() == 'n/a': return None
-        match = re.search(r'(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4})|(\d{1,2} de \w+ de \d{4})|(\d{4}[/\-.]\d{1,2}[/\-.]\d{1,2})', date_string, re.IGNORECASE)
-        if not match: return None
-        clean_date_string = match.group(0).replace('.', '/')
-        formats = ['%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y', '%d de %B de %Y', '%Y-%m-%d']
-        for fmt in formats:
-            try: return datetime.strptime(clean_date_string, fmt).date()
-            except ValueError: continue
-        return None
+        return parse_flexible_date(date_string)
 
     def analyze_company_doc_pdf(self, pdf_file):
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(pdf_file.getvalue())
-                temp_path = temp_file.name
-            
             combined_question = """
             Por favor, analise o documento e responda as seguintes perguntas, uma por linha:
             1. Qual o tipo deste documento? Responda 'PGR', 'PCMSO', 'PPR', 'PCA' ou 'Outro'.
             2. Qual a data de emissão, vigência ou elaboração do documento? Responda a data no formato DD/MM/AAAA.
             """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], combined_question)
-            os.unlink(temp_path)
+            answer, _ = self.pdf_analyzer.answer_question([pdf_file.getvalue()], combined_question)
             
             if not answer: return None
             
@@ -119,12 +108,12 @@ class CompanyDocsManager:
             elif "PCA" in doc_type_str: doc_type = "PCA"
             else: doc_type = "Outro"
             
-            if doc_type == "PGR":
-                vencimento = data_emissao + timedelta(days=2*365)
-                st.info("Documento identificado como PGR. Vencimento calculado para 2 anos.")
-            else:
-                vencimento = data_emissao + timedelta(days=365)
-                st.info(f"Documento identificado como {doc_type}. Vencimento calculado para 1 ano.")
+            vencimento = get_nr_rules().company_doc_expiry(data_emissao, doc_type)
+            if not vencimento:
+                st.error(f"Regra de validade não encontrada para o documento '{doc_type}'.")
+                return None
+            dias_validade = (vencimento - data_emissao).days
+            st.info(f"Documento identificado como {doc_type}. Vencimento calculado para {dias_validade // 365} ano(s).")
             
             return {
                 'tipo_documento': doc_type,
@@ -135,32 +124,36 @@ class CompanyDocsManager:
             st.error(f"Erro ao analisar o PDF do documento: {e}")
             return None
 
-    def add_company_document(self, empresa_id, tipo_documento, data_emissao, vencimento, arquivo_id, arquivo_hash=None):
-        empresa_id_str = str(empresa_id)
-        
-        # Verifica duplicata por hash APENAS se a coluna existir e tiver dados
-        
-        if arquivo_hash and verificar_hash_seguro(self.docs_df, 'arquivo_hash'):
-            duplicata = self.docs_df[
-                (self.docs_df['empresa_id'] == empresa_id_str) &
-                (self.docs_df['arquivo_hash'] == arquivo_hash)
-            ]
-            
-            if not duplicata.empty:
-                st.warning(f"⚠️ Este arquivo PDF já foi cadastrado anteriormente para esta empresa (Documento do tipo '{duplicata.iloc[0]['tipo_documento']}').")
-                return None
-        
-        new_data = [
-            empresa_id_str, 
+    def build_company_doc_row(self, empresa_id, tipo_documento, data_emissao, vencimento, arquivo_id, arquivo_hash=None) -> list:
+        """Linha da aba 'documentos_empresa' (sem o ID), na ordem das colunas da planilha."""
+        return [
+            str(empresa_id), 
             str(tipo_documento), 
             data_emissao.strftime("%d/%m/%Y"), 
             vencimento.strftime("%d/%m/%Y"), 
             str(arquivo_id),
             arquivo_hash or ''
         ]
+
+    def add_company_document(self, empresa_id, tipo_documento, data_emissao, vencimento, arquivo_id, arquivo_hash=None):
+        empresa_id_str = str(empresa_id)
+        
+        # Verifica duplicata por hash no índice da unidade (registros legados sem hash são ignorados)
+        hash_index = get_hash_index(self.spreadsheet_id)
+        duplicata = hash_index.find_duplicate(arquivo_hash, 'documentos_empresa', empresa_id_str)
+        if duplicata:
+            tipo = self.docs_df.loc[self.docs_df['id'] == duplicata.record_id, 'tipo_documento'] if 'tipo_documento' in self.docs_df.columns else pd.Series(dtype=object)
+            st.warning(f"⚠️ Este arquivo PDF já foi cadastrado anteriormente para esta empresa (Documento do tipo '{tipo.iloc[0] if not tipo.empty else 'N/A'}').")
+            return None
+        reuse = hash_index.find_reuse(arquivo_hash, 'documentos_empresa', empresa_id_str)
+        if reuse:
+            st.warning(f"⚠️ Este arquivo PDF também está cadastrado em: {describe_reuse(reuse)}.")
+        
+        new_data = self.build_company_doc_row(empresa_id_str, tipo_documento, data_emissao, vencimento, arquivo_id, arquivo_hash)
         try:
             doc_id = self.sheet_ops.adc_dados_aba("documentos_empresa", new_data)
             if doc_id:
+                hash_index.add(arquivo_hash, 'documentos_empresa', empresa_id_str, doc_id, get_data_version(self.spreadsheet_id))
                 st.cache_data.clear()
                 self.load_company_data()
                 return doc_id
@@ -0,0 +1,306 @@
+import logging
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+logger = logging.getLogger('segsisone_app.compliance')
+
+ASO_VALID = 'Válido'
+ASO_EXPIRED = 'Vencido'
+ASO_INVALID_DUE_DATE = 'Venc. Inválido'
+ASO_ONLY_DISMISSAL = 'Apenas Demissional'
+ASO_NOT_FOUND = 'Não encontrado'
+
+STATUS_OK = 'Em Dia'
+STATUS_PENDING = 'Pendente'
+
+_EMPTY_MODULES = ('N/A', 'NAN', '')
+
+
+def _is_active(status: pd.Series) -> pd.Series:
+    return status.fillna('').astype(str).str.lower() == 'ativo'
+
+
+def _lookup(keys: pd.Series, values) -> pd.Series:
+    """Série para `.map()` indexada por `keys`; em IDs duplicados vale a primeira linha."""
+    lookup = pd.Series(np.asarray(values), index=keys.to_numpy())
+    return lookup[~lookup.index.duplicated()]
+
+
+def _add_due_date_columns(df: pd.DataFrame, today: date) -> pd.DataFrame:
+    """Acrescenta vencimento_dt (date), dias_para_vencer e vencido a uma tabela de documentos."""
+    vencimento = pd.to_datetime(df['vencimento'], errors='coerce') if 'vencimento' in df.columns else pd.Series(pd.NaT, index=df.index)
+    days = (vencimento.dt.normalize() - pd.Timestamp(today)).dt.days
+    df['vencimento_dt'] = vencimento.dt.date
+    df['dias_para_vencer'] = days
+    df['vencido'] = days.lt(0)
+    return df
+
+
+# --- Matriz de treinamentos ---
+
+def _completed_tokens(norma, modulo) -> frozenset:
+    """Variações de nome com que um treinamento realizado pode aparecer na matriz."""
+    norma = str(norma if pd.notna(norma) else '').strip().upper()
+    modulo = str(modulo if pd.notna(modulo) else 'N/A').strip().title()
+    tokens = set()
+    if 'NR-10' in norma:
+        if 'SEP' in norma or 'SEP' in modulo.upper():
+            tokens.update(('nr-10 sep', 'nr-10-sep'))
+        else:
+            tokens.update(('nr-10', 'nr-10 básico'))
+    elif 'NR-33' in norma:
+        if 'SUPERVISOR' in modulo.upper():
+            tokens.add('nr-33 supervisor')
+        elif 'TRABALHADOR' in modulo.upper() or 'AUTORIZADO' in modulo.upper():
+            tokens.add('nr-33 trabalhador autorizado')
+        tokens.add('nr-33')
+    else:
+        tokens.add(norma.lower())
+        if modulo and modulo.upper() not in _EMPTY_MODULES:
+            tokens.update((f"{norma} - {modulo}".lower(), f"{norma} {modulo}".lower(), f"{norma}-{modulo}".lower()))
+    return frozenset(tokens)
+
+
+@lru_cache(maxsize=4096)
+def _requirement_matches(req_lower: str, completed: str) -> bool:
+    return req_lower == completed or req_lower in completed or completed in req_lower or fuzz.ratio(req_lower, completed) > 85
+
+
+def find_missing_trainings(required_trainings, completed_tokens) -> tuple:
+    """
+    Compara os treinamentos obrigatórios da função com os realizados.
+    Correspondência exata, por inclusão ou fuzzy (> 85); NR-10 Básico não cobre NR-10 SEP.
+    """
+    missing = []
+    for req in required_trainings:
+        req_lower = req.lower().strip()
+        if 'nr-10 sep' in req_lower or 'nr-10-sep' in req_lower:
+            if not any('sep' in comp for comp in completed_tokens if 'nr-10' in comp):
+                missing.append(req)
+            continue
+        if not any(_requirement_matches(req_lower, comp) for comp in completed_tokens):
+            missing.append(req)
+    return tuple(sorted(missing))
+
+
+def _matrix_columns(employees: pd.DataFrame, current_trainings: pd.DataFrame, matrix_manager) -> pd.DataFrame:
+    """
+    Função da matriz, total de obrigatórios e treinamentos faltantes por funcionário.
+    A busca fuzzy do cargo é feita uma vez por cargo distinto e a comparação com a
+    matriz uma vez por combinação distinta (função, treinamentos realizados).
+    """
+    cargos = employees['cargo'].fillna('').astype(str).str.strip()
+    function_by_cargo = {}
+    required_by_function = {}
+    for cargo in cargos.unique():
+        if not cargo or cargo == 'N/A':
+            function_by_cargo[cargo] = None
+            continue
+        function = matrix_manager.find_closest_function(cargo)
+        function_by_cargo[cargo] = function
+        if function and function not in required_by_function:
+            required_by_function[function] = tuple(matrix_manager.get_required_trainings_for_function(function))
+
+    functions = cargos.map(function_by_cargo)
+    required = functions.map(lambda f: required_by_function.get(f, ()) if f else ())
+
+    # Treinamentos realizados só interessam a quem tem obrigatórios na matriz.
+    needs_check = required.map(bool)
+    checked_ids = set(employees.loc[needs_check, 'id'])
+    tokens_by_employee = {}
+    if checked_ids and not current_trainings.empty:
+        done = current_trainings[current_trainings['funcionario_id'].isin(checked_ids)]
+        normas = done['norma'] if 'norma' in done.columns else pd.Series('', index=done.index)
+        modulos = done['modulo'] if 'modulo' in done.columns else pd.Series('N/A', index=done.index)
+        pair_tokens = {}
+        for employee_id, pair in zip(done['funcionario_id'].tolist(), zip(normas.tolist(), modulos.tolist())):
+            if pair not in pair_tokens:
+                pair_tokens[pair] = _completed_tokens(*pair)
+            tokens_by_employee.setdefault(employee_id, set()).update(pair_tokens[pair])
+
+    missing_memo = {}
+    missing = []
+    for employee_id, function, req in zip(employees['id'].tolist(), functions.tolist(), required.tolist()):
+        if not req:
+            missing.append(())
+            continue
+        key = (function, frozenset(tokens_by_employee.get(employee_id, ())))
+        if key not in missing_memo:
+            missing_memo[key] = find_missing_trainings(req, key[1])
+        missing.append(missing_memo[key])
+
+    return pd.DataFrame({
+        'funcao_matriz': functions.to_numpy(),
+        'treinamentos_obrigatorios': required.map(len).to_numpy(),
+        'treinamentos_faltantes': missing,
+    }, index=employees.index)
+
+
+# --- Motor de conformidade ---
+
+def compute_unit_compliance(
+    companies_df: pd.DataFrame,
+    employees_df: pd.DataFrame,
+    current_trainings_df: pd.DataFrame,
+    latest_asos_df: pd.DataFrame,
+    company_docs_df: pd.DataFrame | None = None,
+    matrix_manager=None,
+    today: date | None = None,
+) -> dict:
+    """
+    Calcula a situação de conformidade de uma unidade inteira em uma única passada vetorizada.
+
+    Recebe as tabelas já carregadas da unidade (treinamentos vigentes e ASOs mais recentes
+    de `load_all_unit_data`) e retorna um dicionário com:
+    - 'employees': uma linha por funcionário (status do ASO, treinamentos vencidos,
+      treinamentos faltantes da matriz, pendências e status geral "Em Dia"/"Pendente");
+    - 'companies': uma linha por empresa, com os totais de pendências;
+    - 'trainings', 'asos', 'company_docs': os itens vigentes com vencimento_dt,
+      dias_para_vencer, vencido, ativo, nome_funcionario e empresa.
+    As colunas 'ativo' consideram o status do funcionário e da empresa.
+    """
+    today = today or date.today()
+    companies = companies_df.reset_index(drop=True) if not companies_df.empty else pd.DataFrame(columns=['id', 'nome', 'status'])
+    employees = employees_df[~employees_df['id'].duplicated()].reset_index(drop=True) if not employees_df.empty \
+        else pd.DataFrame(columns=['id', 'nome', 'cargo', 'empresa_id', 'status'])
+    if 'cargo' not in employees.columns:
+        employees['cargo'] = None
+
+    company_active = _lookup(companies['id'], _is_active(companies['status']))
+    company_name = _lookup(companies['id'], companies['nome'])
+
+    # --- Funcionários ---
+    emp = pd.DataFrame({
+        'id': employees['id'].to_numpy(),
+        'nome': employees['nome'].to_numpy(),
+        'cargo': employees['cargo'].to_numpy(),
+        'empresa_id': employees['empresa_id'].to_numpy(),
+    })
+    emp['ativo'] = _is_active(employees['status']).to_numpy() & emp['empresa_id'].map(company_active).fillna(False).astype(bool).to_numpy()
+    employee_active = _lookup(emp['id'], emp['ativo'])
+    employee_company = _lookup(emp['id'], emp['empresa_id'])
+    employee_name = _lookup(emp['id'], emp['nome'])
+
+    def enrich_employee_items(items: pd.DataFrame) -> pd.DataFrame:
+        items = _add_due_date_columns(items.copy(), today)
+        items['empresa_id'] = items['funcionario_id'].map(employee_company)
+        items['nome_funcionario'] = items['funcionario_id'].map(employee_name)
+        items['empresa'] = items['empresa_id'].map(company_name)
+        items['ativo'] = items['funcionario_id'].map(employee_active).fillna(False).astype(bool)
+        return items
+
+    # --- Treinamentos vigentes ---
+    trainings = enrich_employee_items(current_trainings_df) if not current_trainings_df.empty \
+        else pd.DataFrame(columns=['funcionario_id', 'vencimento_dt', 'dias_para_vencer', 'vencido', 'ativo'])
+    training_counts = trainings.groupby('funcionario_id')['vencido'].agg(['size', 'sum'])
+    emp['treinamentos_total'] = emp['id'].map(training_counts['size']).fillna(0).astype(int)
+    emp['treinamentos_vencidos'] = emp['id'].map(training_counts['sum']).fillna(0).astype(int)
+
+    # --- ASO de aptidão vigente ---
+    if not latest_asos_df.empty:
+        asos = enrich_employee_items(latest_asos_df[latest_asos_df['is_current_aptitude']])
+        has_any_aso = emp['id'].map(set(latest_asos_df['funcionario_id']).__contains__)
+    else:
+        asos = pd.DataFrame(columns=['funcionario_id', 'vencimento', 'vencimento_dt', 'dias_para_vencer', 'vencido', 'ativo'])
+        has_any_aso = pd.Series(False, index=emp.index)
+    current_aso = asos.set_index('funcionario_id')
+    emp['aso_vencimento'] = emp['id'].map(pd.to_datetime(current_aso['vencimento'], errors='coerce'))
+    aso_days = emp['id'].map(current_aso['dias_para_vencer'])
+    has_current = emp['id'].map(set(current_aso.index).__contains__)
+    emp['aso_status'] = np.select(
+        [
+            has_current & aso_days.isna(),
+            has_current & aso_days.lt(0),
+            has_current,
+            has_any_aso,
+        ],
+        [ASO_INVALID_DUE_DATE, ASO_EXPIRED, ASO_VALID, ASO_ONLY_DISMISSAL],
+        default=ASO_NOT_FOUND,
+    )
+
+    # --- Matriz de treinamentos ---
+    if matrix_manager is not None and not emp.empty:
+        emp = emp.join(_matrix_columns(emp, current_trainings_df, matrix_manager))
+    else:
+        emp['funcao_matriz'] = None
+        emp['treinamentos_obrigatorios'] = 0
+        emp['treinamentos_faltantes'] = [()] * len(emp)
+
+    # O status geral considera vencimentos; treinamentos faltantes da matriz são informativos.
+    emp['pendencias'] = emp['treinamentos_vencidos'] + (emp['aso_status'] == ASO_EXPIRED).astype(int)
+    emp['status_geral'] = np.where(emp['pendencias'] == 0, STATUS_OK, STATUS_PENDING)
+    emp.index = emp['id']
+
+    # --- Documentos da empresa (mais recente por tipo) ---
+    if company_docs_df is not None and not company_docs_df.empty:
+        docs = company_docs_df.sort_values('data_emissao', ascending=False, kind='mergesort') \
+            .drop_duplicates(subset=['empresa_id', 'tipo_documento'], keep='first').copy()
+        docs = _add_due_date_columns(docs, today)
+        docs['empresa'] = docs['empresa_id'].map(company_name)
+        docs['ativo'] = docs['empresa_id'].map(company_active).fillna(False).astype(bool)
+        docs = docs.reset_index(drop=True)
+    else:
+        docs = pd.DataFrame(columns=['empresa_id', 'vencimento_dt', 'dias_para_vencer', 'vencido', 'ativo'])
+
+    # --- Empresas ---
+    emp_flags = pd.DataFrame({
+        'empresa_id': emp['empresa_id'].to_numpy(),
+        'funcionarios': 1,
+        'funcionarios_pendentes': (emp['pendencias'] > 0).to_numpy(dtype=int),
+        'asos_vencidos': (emp['aso_status'] == ASO_EXPIRED).to_numpy(dtype=int),
+        'treinamentos_vencidos': emp['treinamentos_vencidos'].to_numpy(),
+    })
+    by_company = emp_flags.groupby('empresa_id').sum()
+    docs_expired = docs[docs['vencido'].astype(bool)].groupby('empresa_id').size()
+    comp = pd.DataFrame({
+        'id': companies['id'].to_numpy(),
+        'nome': companies['nome'].to_numpy(),
+    })
+    comp['ativo'] = _is_active(companies['status']).to_numpy()
+    for column in ['funcionarios', 'funcionarios_pendentes', 'asos_vencidos', 'treinamentos_vencidos']:
+        comp[column] = comp['id'].map(by_company[column]).fillna(0).astype(int)
+    comp['documentos_vencidos'] = comp['id'].map(docs_expired).fillna(0).astype(int)
+    comp['pendencias'] = comp['asos_vencidos'] + comp['treinamentos_vencidos'] + comp['documentos_vencidos']
+    comp.index = comp['id']
+
+    return {
+        'employees': emp,
+        'companies': comp,
+        'trainings': trainings.reset_index(drop=True),
+        'asos': asos.reset_index(drop=True),
+        'company_docs': docs,
+    }
+
+
+def get_unit_compliance(employee_manager, docs_manager=None, matrix_manager=None, today: date | None = None) -> dict:
+    """
+    Retorna a conformidade da unidade dos managers informados, reaproveitando o último
+    resultado enquanto os DataFrames carregados (e a data) forem os mesmos.
+    """
+    today = today or date.today()
+    docs_df = docs_manager.docs_df if docs_manager is not None else None
+    key = (
+        employee_manager.companies_df, employee_manager.employees_df,
+        employee_manager.current_trainings_df, employee_manager.latest_asos_df, docs_df,
+        getattr(matrix_manager, '_functions_df', None), getattr(matrix_manager, '_matrix_df', None),
+    )
+    cached = getattr(employee_manager, '_compliance_cache', None)
+    if cached is not None:
+        cached_key, cached_today, cached_matrix, result = cached
+        if cached_today == today and cached_matrix is matrix_manager and all(a is b for a, b in zip(cached_key, key)):
+            return result
+
+    result = compute_unit_compliance(
+        employee_manager.companies_df, employee_manager.employees_df,
+        employee_manager.current_trainings_df, employee_manager.latest_asos_df,
+        company_docs_df=docs_df, matrix_manager=matrix_manager, today=today,
+    )
+    if matrix_manager is not None:
+        # A matriz é carregada sob demanda durante o cálculo; a chave usa os DataFrames carregados.
+        key = key[:5] + (matrix_manager._functions_df, matrix_manager._matrix_df)
+    employee_manager._compliance_cache = (key, today, matrix_manager, result)
+    return result
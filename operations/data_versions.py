@@ -0,0 +1,36 @@
+import threading
+import logging
+import streamlit as st
+
+logger = logging.getLogger('segsisone_app.data_versions')
+
+
+@st.cache_resource
+def _get_version_registry() -> dict:
+    """
+    Registro global (compartilhado entre sessões) com a versão dos dados de cada planilha.
+    Cada escrita bem-sucedida em uma planilha incrementa a sua versão, permitindo que
+    objetos mantidos em memória (managers, índices) saibam quando estão desatualizados.
+    """
+    return {'lock': threading.Lock(), 'versions': {}}
+
+
+def get_data_version(spreadsheet_id: str) -> int:
+    """Retorna a versão atual dos dados de uma planilha (0 se nunca foi alterada)."""
+    if not spreadsheet_id:
+        return 0
+    registry = _get_version_registry()
+    with registry['lock']:
+        return registry['versions'].get(spreadsheet_id, 0)
+
+
+def bump_data_version(spreadsheet_id: str) -> int:
+    """Incrementa a versão dos dados de uma planilha após uma escrita e retorna o novo valor."""
+    if not spreadsheet_id:
+        return 0
+    registry = _get_version_registry()
+    with registry['lock']:
+        new_version = registry['versions'].get(spreadsheet_id, 0) + 1
+        registry['versions'][spreadsheet_id] = new_version
+    logger.debug(f"Versão dos dados da planilha ...{spreadsheet_id[-6:]} agora é {new_version}.")
+    return new_version
@@ -1,21 +1,23 @@
 import pandas as pd
-from operations.file_hash import calcular_hash_arquivo, verificar_hash_seguro
+from operations.file_hash import calcular_hash_arquivo
 import streamlit as st
 from datetime import datetime, date, timedelta
 from gdrive.google_api_manager import GoogleApiManager
 from AI.api_Operation import PDFQA
+from AI.pdf_text import pre_extract_aso, pre_extract_training
 from operations.sheet import SheetOperations
-import tempfile
-import os
-import re
 import locale
 import json
-from dateutil.relativedelta import relativedelta
 from operations.audit_logger import log_action
 from auth.auth_utils import get_user_email
 from fuzzywuzzy import process
 import logging
 from operations.cached_loaders import load_all_unit_data
+from operations.unit_indexes import build_current_trainings, build_latest_asos
+from operations.normalization import padronizar_norma, parse_flexible_date
+from operations.nr_rules import get_nr_rules
+from operations.hash_index import get_hash_index, describe_reuse
+from operations.data_versions import get_data_version
 
 try:
     locale.setlocale(locale.LC_TIME, 'pt_BR.UTF-8')
@@ -24,6 +26,55 @@ except locale.Error:
 
 logger = logging.getLogger('segsisone_app.employee_manager')
 
+# Prompts de extração (o texto faz parte da chave do cache da IA: alterações invalidam as respostas guardadas).
+ASO_EXTRACTION_PROMPT = """        
+            Você é um assistente de extração de dados para documentos de Saúde e Segurança do Trabalho. Sua tarefa é analisar o ASO em PDF e extrair as informações abaixo.
+            REGRAS OBRIGATÓRIAS:
+            1.Responda APENAS com um bloco de código JSON válido. Não inclua a palavra "json" ou qualquer outro texto antes ou depois do bloco JSON.
+            2.Para todas as chaves de data, use ESTRITAMENTE o formato DD/MM/AAAA.
+            3.Se uma informação não for encontrada de forma clara e inequívoca, o valor da chave correspondente no JSON deve ser null (sem aspas).
+            4.IMPORTANTE: Os valores das chaves no JSON NÃO DEVEM conter o nome da chave.
+            ERRADO: "cargo": "Cargo: Operador"
+            CORRETO: "cargo": "Operador"
+            JSON a ser preenchido:
+
+            {
+            "data_aso": "A data de emissão ou realização do exame clínico. Formato: DD/MM/AAAA.",
+            "vencimento_aso": "A data de vencimento explícita no ASO, se houver. Formato: DD/MM/AAAA.",
+            "riscos": "Uma string contendo os riscos ocupacionais listados, separados por vírgula.",
+            "cargo": "O cargo ou função do trabalhador.",
+            "tipo_aso": "O tipo de exame. Identifique como um dos seguintes: 'Admissional', 'Periódico', 'Demissional', 'Mudança de Risco', 'Retorno ao Trabalho', 'Monitoramento Pontual'."
+            }
+
+            """
+
+TRAINING_EXTRACTION_PROMPT = """
+            Você é um especialista em análise de documentos de Saúde e Segurança do Trabalho.
+
+            **REGRAS CRÍTICAS:**
+            1.  Responda **APENAS com JSON válido**.
+            2.  Datas no formato **DD/MM/AAAA**.
+            3.  Para a chave "norma":
+                - Se mencionar "SEP", "Sistema Elétrico de Potência", "Alta Tensão" ou "Subestação", retorne **"NR-10 SEP"**
+                - Se for NR-10 sem menção a SEP, retorne **"NR-10"**
+            4.  Para a chave "modulo":
+                - Se for NR-10 SEP, retorne **"SEP"**
+                - Se for NR-10 comum, retorne **"Básico"** ou **"N/A"**
+                - Para NR-20, identifique: **"Básico"**, **"Intermediário"**, **"Avançado I"** ou **"Avançado II"**
+                - Para NR-33, identifique: **"Trabalhador Autorizado"** ou **"Supervisor"**
+                - Para outros, extraia o módulo ou retorne **"N/A"**
+
+            **JSON:**
+            ```json
+            {
+              "norma": "Nome da norma (ex: 'NR-10 SEP' se for SEP, 'NR-10' se for básico)",
+              "modulo": "Módulo específico (ex: 'SEP', 'Básico', 'Intermediário')",
+              "data_realizacao": "DD/MM/AAAA",
+              "tipo_treinamento": "'formação' ou 'reciclagem'",
+              "carga_horaria": "Número inteiro de horas"
+            }
+            """
+
 class EmployeeManager:
     def __init__(self, spreadsheet_id: str, folder_id: str):
         logger.info(f"Inicializando EmployeeManager para spreadsheet_id: ...{spreadsheet_id[-6:]}")
@@ -32,36 +83,29 @@ class EmployeeManager:
         self.folder_id = folder_id
         self.api_manager = GoogleApiManager()
         self._pdf_analyzer = None
+        self._current_trainings_by_employee = None
+        self._latest_asos_by_employee = None
+        self._compliance_cache = None
         self.data_loaded_successfully = False
         
         
-        self.nr20_config = {
-            'Básico': {'reciclagem_anos': 3, 'reciclagem_horas': 4, 'inicial_horas': 8},
-            'Intermediário': {'reciclagem_anos': 2, 'reciclagem_horas': 4, 'inicial_horas': 16},
-            'Avançado I': {'reciclagem_anos': 2, 'reciclagem_horas': 4, 'inicial_horas': 20},
-            'Avançado II': {'reciclagem_anos': 1, 'reciclagem_horas': 4, 'inicial_horas': 32}
-        }
-        self.nr_config = {
-            'NR-35': {'inicial_horas': 8, 'reciclagem_horas': 8, 'reciclagem_anos': 2},
-            'NR-10': {'inicial_horas': 20, 'reciclagem_horas': 20, 'reciclagem_anos': 2},
-            'NR-18': {'inicial_horas': 8, 'reciclagem_horas': 8, 'reciclagem_anos': 1},
-            'NR-06': {'inicial_horas': 3, 'reciclagem_horas': 3, 'reciclagem_anos': 10},
-            'NR-12': {'inicial_horas': 8, 'reciclagem_horas': 8, 'reciclagem_anos': 5},
-            'NR-34': {'inicial_horas': 8, 'reciclagem_horas': 8, 'reciclagem_anos': 1},
-            'NR-33': {'reciclagem_anos': 1},
-            'BRIGADA DE INCÊNDIO': {'reciclagem_anos': 1},
-            'NR-11': {'inicial_horas': 16, 'reciclagem_anos': 3, 'reciclagem_horas': 16}, 
-            'NBR-16710 RESGATE TÉCNICO': {'reciclagem_anos': 2},
-            'PERMISSÃO DE TRABALHO (PT)': {'reciclagem_anos': 1}
-        }
-        
         self.load_data()
 
     @property
     def pdf_analyzer(self):
-        if self._pdf_analyzer is None: self._pdf_analyzer = PDFQA()
+        if self._pdf_analyzer is None: self._pdf_analyzer = PDFQA(unit_id=self.spreadsheet_id)
         return self._pdf_analyzer
 
+    @property
+    def hash_index(self):
+        """Índice de hashes de arquivos da unidade (ASOs, treinamentos, EPIs e documentos)."""
+        return get_hash_index(self.spreadsheet_id)
+
+    @property
+    def nr_rules(self):
+        """Regras de carga horária e validade (nr_rules.yaml)."""
+        return get_nr_rules()
+
     def upload_documento_e_obter_link(self, arquivo, novo_nome: str):
         """
         Faz o upload de um arquivo para a pasta da unidade e retorna o link.
@@ -86,6 +130,12 @@ class EmployeeManager:
             self.employees_df = data['employees']
             self.aso_df = data['asos']
             self.training_df = data['trainings']
+            self.current_trainings_df = data.get('current_trainings')
+            if self.current_trainings_df is None:
+                self.current_trainings_df = build_current_trainings(self.training_df)
+            self.latest_asos_df = data.get('latest_asos')
+            if self.latest_asos_df is None:
+                self.latest_asos_df = build_latest_asos(self.aso_df)
             
             # ✅ CRIA ÍNDICES (acontece UMA VEZ no carregamento)
             if not self.companies_df.empty:
@@ -98,13 +148,15 @@ class EmployeeManager:
                 # ✅ Pré-agrupa por empresa (busca instantânea depois)
                 self._employees_by_company = self.employees_df.groupby('empresa_id')
             
-            if not self.aso_df.empty:
-                # ✅ Pré-agrupa ASOs por funcionário
-                self._asos_by_employee = self.aso_df.groupby('funcionario_id')
+            # ✅ ASO mais recente por (funcionário, tipo), com o ASO de aptidão vigente marcado
+            self._latest_asos_by_employee = (
+                self.latest_asos_df.groupby('funcionario_id') if not self.latest_asos_df.empty else None
+            )
             
-            if not self.training_df.empty:
-                # ✅ Pré-agrupa treinamentos por funcionário
-                self._trainings_by_employee = self.training_df.groupby('funcionario_id')
+            # ✅ Treinamentos vigentes por funcionário (tabela única da unidade)
+            self._current_trainings_by_employee = (
+                self.current_trainings_df.groupby('funcionario_id') if not self.current_trainings_df.empty else None
+            )
             
             self.data_loaded_successfully = True
             
@@ -113,138 +165,119 @@ class EmployeeManager:
             self.data_loaded_successfully = False
 
     def _parse_flexible_date(self, date_string: str) -> date | None:
-        if not date_string or not isinstance(date_string, str) or date_string.lower() == 'n/a': return None
-        match = re.search(r'(\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4})|(\d{1,2} de \w+ de \d{4})|(\d{4}[/\-.]\d{1,2}[/\-.]\d{1,2})', date_string, re.IGNORECASE)
-        if not match: return None
-        clean_date_string = match.group(0).replace('.', '/')
-        formats = ['%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y', '%d de %B de %Y', '%Y-%m-%d']
-        for fmt in formats:
-            try: return datetime.strptime(clean_date_string, fmt).date()
-            except ValueError: continue
-        return None
+        return parse_flexible_date(date_string)
 
     def analyze_aso_pdf(self, pdf_file):
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(pdf_file.getvalue())
-                temp_path = temp_file.name
-            
-            structured_prompt = """        
-            Você é um assistente de extração de dados para documentos de Saúde e Segurança do Trabalho. Sua tarefa é analisar o ASO em PDF e extrair as informações abaixo.
-            REGRAS OBRIGATÓRIAS:
-            1.Responda APENAS com um bloco de código JSON válido. Não inclua a palavra "json" ou qualquer outro texto antes ou depois do bloco JSON.
-            2.Para todas as chaves de data, use ESTRITAMENTE o formato DD/MM/AAAA.
-            3.Se uma informação não for encontrada de forma clara e inequívoca, o valor da chave correspondente no JSON deve ser null (sem aspas).
-            4.IMPORTANTE: Os valores das chaves no JSON NÃO DEVEM conter o nome da chave.
-            ERRADO: "cargo": "Cargo: Operador"
-            CORRETO: "cargo": "Operador"
-            JSON a ser preenchido:
-
-            {
-            "data_aso": "A data de emissão ou realização do exame clínico. Formato: DD/MM/AAAA.",
-            "vencimento_aso": "A data de vencimento explícita no ASO, se houver. Formato: DD/MM/AAAA.",
-            "riscos": "Uma string contendo os riscos ocupacionais listados, separados por vírgula.",
-            "cargo": "O cargo ou função do trabalhador.",
-            "tipo_aso": "O tipo de exame. Identifique como um dos seguintes: 'Admissional', 'Periódico', 'Demissional', 'Mudança de Risco', 'Retorno ao Trabalho', 'Monitoramento Pontual'."
-            }
+            # Camada de texto primeiro: ASOs digitais costumam dispensar a chamada à IA.
+            pre = pre_extract_aso(pdf_file.getvalue())
+            if pre.complete:
+                data = pre.fields
+            else:
+                answer, _ = self.pdf_analyzer.answer_question([pre.model_content], ASO_EXTRACTION_PROMPT, expect_json=True)
+                if not answer: return None
 
-            """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], structured_prompt)
-            os.unlink(temp_path)
-            if not answer: return None
-
-            cleaned_answer = answer.strip().replace("```json", "").replace("```", "")
-            data = json.loads(cleaned_answer)
-            data_aso = self._parse_flexible_date(data.get('data_aso'))
-            vencimento = self._parse_flexible_date(data.get('vencimento_aso'))
-            if not data_aso: return None
-                
-            tipo_aso = str(data.get('tipo_aso', 'Não identificado'))
-            if not vencimento and tipo_aso != 'Demissional':
-                if tipo_aso in ['Admissional', 'Periódico', 'Mudança de Risco', 'Retorno ao Trabalho']:
-                    vencimento = data_aso + relativedelta(years=1)
-                elif tipo_aso == 'Monitoramento Pontual':
-                    vencimento = data_aso + relativedelta(months=6)
-            
-            return {'data_aso': data_aso, 'vencimento': vencimento, 'riscos': data.get('riscos', ""), 'cargo': data.get('cargo', ""), 'tipo_aso': tipo_aso}
+                cleaned_answer = answer.strip().replace("```json", "").replace("```", "")
+                data = json.loads(cleaned_answer)
+            return self._aso_info(data)
         except Exception as e:
             st.error(f"Erro ao analisar PDF do ASO: {e}")
             return None
 
     def analyze_training_pdf(self, pdf_file):
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(pdf_file.getvalue())
-                temp_path = temp_file.name
-            
-            structured_prompt = """
-            Você é um especialista em análise de documentos de Saúde e Segurança do Trabalho.
-
-            **REGRAS CRÍTICAS:**
-            1.  Responda **APENAS com JSON válido**.
-            2.  Datas no formato **DD/MM/AAAA**.
-            3.  Para a chave "norma":
-                - Se mencionar "SEP", "Sistema Elétrico de Potência", "Alta Tensão" ou "Subestação", retorne **"NR-10 SEP"**
-                - Se for NR-10 sem menção a SEP, retorne **"NR-10"**
-            4.  Para a chave "modulo":
-                - Se for NR-10 SEP, retorne **"SEP"**
-                - Se for NR-10 comum, retorne **"Básico"** ou **"N/A"**
-                - Para NR-20, identifique: **"Básico"**, **"Intermediário"**, **"Avançado I"** ou **"Avançado II"**
-                - Para NR-33, identifique: **"Trabalhador Autorizado"** ou **"Supervisor"**
-                - Para outros, extraia o módulo ou retorne **"N/A"**
+            # Camada de texto primeiro: certificados digitais costumam dispensar a chamada à IA.
+            pre = pre_extract_training(pdf_file.getvalue())
+            if pre.complete:
+                data = pre.fields
+            else:
+                answer, _ = self.pdf_analyzer.answer_question([pre.model_content], TRAINING_EXTRACTION_PROMPT, expect_json=True)
+                if not answer: return None
 
-            **JSON:**
-            ```json
-            {
-              "norma": "Nome da norma (ex: 'NR-10 SEP' se for SEP, 'NR-10' se for básico)",
-              "modulo": "Módulo específico (ex: 'SEP', 'Básico', 'Intermediário')",
-              "data_realizacao": "DD/MM/AAAA",
-              "tipo_treinamento": "'formação' ou 'reciclagem'",
-              "carga_horaria": "Número inteiro de horas"
-            }
-            """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], structured_prompt)
-            os.unlink(temp_path)
-            if not answer: return None
-
-            cleaned_answer = answer.strip().replace("```json", "").replace("```", "")
-            data = json.loads(cleaned_answer)
-            data_realizacao = self._parse_flexible_date(data.get('data_realizacao'))
-            if not data_realizacao: return None
-                
-            norma_padronizada = self._padronizar_norma(data.get('norma'))
-            modulo = str(data.get('modulo', 'N/A')).strip()
-            tipo_treinamento = str(data.get('tipo_treinamento', 'formação')).lower()
-            carga_horaria = int(data.get('carga_horaria', 0)) if data.get('carga_horaria') is not None else 0
-            
-            # Garante que SEP seja identificado
-            if 'SEP' in norma_padronizada:
-                modulo = 'SEP'
-            elif norma_padronizada == 'NR-10' and modulo in ['N/A', '', 'nan']:
-                modulo = 'Básico'
-            
-            # Para NR-20, valida se o módulo está correto
-            if norma_padronizada == "NR-20":
-                modulos_validos = ['Básico', 'Intermediário', 'Avançado I', 'Avançado II']
-                if modulo not in modulos_validos:
-                    # Tenta inferir pela carga horária
-                    key_ch = 'inicial_horas' if tipo_treinamento == 'formação' else 'reciclagem_horas'
-                    for mod, config in self.nr20_config.items():
-                        if carga_horaria == config.get(key_ch):
-                            modulo = mod
-                            break
-            
-            return {
-                'data': data_realizacao,
-                'norma': norma_padronizada,
-                'modulo': modulo,
-                'tipo_treinamento': tipo_treinamento,
-                'carga_horaria': carga_horaria
-            }
+                cleaned_answer = answer.strip().replace("```json", "").replace("```", "")
+                data = json.loads(cleaned_answer)
+            return self._training_info(data)
         except Exception as e:
             st.error(f"Erro ao analisar PDF do Treinamento: {e}")
             return None
 
+    def analyze_pdf_with_audit(self, pdf_file, doc_type: str, nr_analyzer, norma_hint: str = '') -> tuple[dict | None, dict | None]:
+        """
+        Modo combinado para ASO/Treinamento: extração e auditoria numa única chamada ao modelo
+        de auditoria. Retorna (info, resultado da auditoria); o que vier None (resposta
+        malformada, falha da IA ou auditoria feita sem a norma extraída) deve ser obtido pelas
+        chamadas separadas (`analyze_*_pdf` / `perform_initial_audit`).
+        """
+        pre_extract, extraction_prompt, build_info = {
+            'ASO': (pre_extract_aso, ASO_EXTRACTION_PROMPT, self._aso_info),
+            'Treinamento': (pre_extract_training, TRAINING_EXTRACTION_PROMPT, self._training_info),
+        }[doc_type]
+        content = pdf_file.getvalue()
+        pre = pre_extract(content)
+        if pre.complete:
+            # A camada de texto já dispensa a extração: só a auditoria vai ao modelo.
+            return build_info(pre.fields), None
+
+        norma_hint = pre.fields.get('norma') or norma_hint
+        if doc_type == 'Treinamento' and not norma_hint:
+            # Sem norma prevista a auditoria combinada seria sempre descartada: segue o modo separado.
+            return None, None
+        audit_hint = {'type': doc_type, 'norma': norma_hint} if norma_hint else {'type': doc_type}
+        data, audit_result = nr_analyzer.perform_combined_analysis(audit_hint, content, extraction_prompt)
+        try:
+            info = build_info(data) if data else None
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Modo combinado: extração inválida para '{doc_type}': {e}")
+            info = None
+
+        if info and audit_result and doc_type == 'Treinamento' and info['norma'] != self._padronizar_norma(norma_hint):
+            # A auditoria foi feita sem a norma ou com a base de conhecimento de outra norma: é refeita
+            # à parte, com a mesma regra do fluxo paralelo (ui_helpers).
+            audit_result = None
+        return info, audit_result
+
+    def _aso_info(self, data: dict) -> dict | None:
+        """Campos do ASO a partir do JSON extraído (IA ou camada de texto); None sem data do exame."""
+        data_aso = self._parse_flexible_date(data.get('data_aso'))
+        vencimento = self._parse_flexible_date(data.get('vencimento_aso'))
+        if not data_aso: return None
+            
+        tipo_aso = str(data.get('tipo_aso', 'Não identificado'))
+        if not vencimento:
+            vencimento = self.nr_rules.aso_expiry(data_aso, tipo_aso)
+        
+        return {'data_aso': data_aso, 'vencimento': vencimento, 'riscos': data.get('riscos', ""), 'cargo': data.get('cargo', ""), 'tipo_aso': tipo_aso}
+
+    def _training_info(self, data: dict) -> dict | None:
+        """Campos do treinamento a partir do JSON extraído (IA ou camada de texto); None sem data de realização."""
+        data_realizacao = self._parse_flexible_date(data.get('data_realizacao'))
+        if not data_realizacao: return None
+            
+        norma_padronizada = self._padronizar_norma(data.get('norma'))
+        modulo = str(data.get('modulo', 'N/A')).strip()
+        tipo_treinamento = str(data.get('tipo_treinamento', 'formação')).lower()
+        carga_horaria = int(data.get('carga_horaria', 0)) if data.get('carga_horaria') is not None else 0
+        
+        # Garante que SEP seja identificado
+        if 'SEP' in norma_padronizada:
+            modulo = 'SEP'
+        elif norma_padronizada == 'NR-10' and modulo in ['N/A', '', 'nan']:
+            modulo = 'Básico'
+        
+        # Para NR-20, valida se o módulo está correto
+        if norma_padronizada == "NR-20":
+            if modulo not in self.nr_rules.modules_for(norma_padronizada):
+                # Tenta inferir pela carga horária
+                modulo = self.nr_rules.infer_module_by_hours(norma_padronizada, tipo_treinamento, carga_horaria) or modulo
+        
+        return {
+            'data': data_realizacao,
+            'norma': norma_padronizada,
+            'modulo': modulo,
+            'tipo_treinamento': tipo_treinamento,
+            'carga_horaria': carga_horaria
+        }
+
     def add_company(self, nome, cnpj):
         if not self.companies_df.empty and cnpj in self.companies_df['cnpj'].values:
             return None, "CNPJ já cadastrado."
@@ -263,34 +296,60 @@ class EmployeeManager:
             return employee_id, "Funcionário adicionado com sucesso"
         return None, "Erro ao adicionar funcionário."
 
-    def add_aso(self, aso_data: dict):
-        funcionario_id = str(aso_data.get('funcionario_id'))
-        arquivo_hash = aso_data.get('arquivo_hash')
-        
-        # Verifica duplicata por hash APENAS se a coluna existir e tiver dados
-        
-        if arquivo_hash and verificar_hash_seguro(self.aso_df, 'arquivo_hash'):
-            duplicata = self.aso_df[
-                (self.aso_df['funcionario_id'] == funcionario_id) &
-                (self.aso_df['arquivo_hash'] == arquivo_hash)
-            ]
-            
-            if not duplicata.empty:
-                st.warning(f"⚠️ Este arquivo PDF já foi cadastrado anteriormente para este funcionário (ASO do tipo '{duplicata.iloc[0]['tipo_aso']}').")
-                return None
-        
-        new_data = [
-            funcionario_id,
+    def build_aso_row(self, aso_data: dict) -> list:
+        """Linha da aba 'asos' (sem o ID), na ordem das colunas da planilha."""
+        return [
+            str(aso_data.get('funcionario_id')),
             aso_data.get('data_aso').strftime("%d/%m/%Y"),
             aso_data.get('vencimento').strftime("%d/%m/%Y") if aso_data.get('vencimento') else "N/A",
             str(aso_data.get('arquivo_id')),
-            arquivo_hash or '',
+            aso_data.get('arquivo_hash') or '',
             aso_data.get('riscos', 'N/A'),
             aso_data.get('cargo', 'N/A'),
             aso_data.get('tipo_aso', 'N/A')
         ]
-        aso_id = self.sheet_ops.adc_dados_aba("asos", new_data)
+
+    def build_training_row(self, training_data: dict) -> list:
+        """Linha da aba 'treinamentos' (sem o ID), com a norma e o módulo padronizados."""
+        norma = self._padronizar_norma(training_data.get('norma'))
+        modulo = str(training_data.get('modulo', 'N/A')).strip()
+        
+        # Normalização de módulo
+        if norma == 'NR-10 SEP' and modulo in ['N/A', '', 'nan']:
+            modulo = 'SEP'
+        elif norma == 'NR-10' and modulo in ['N/A', '', 'nan']:
+            modulo = 'Básico'
+        
+        return [
+            str(training_data.get('funcionario_id')),
+            training_data.get('data').strftime("%d/%m/%Y"),
+            training_data.get('vencimento').strftime("%d/%m/%Y"),
+            norma,
+            modulo,
+            "Válido",
+            str(training_data.get('anexo')),
+            training_data.get('arquivo_hash', '') or '',
+            str(training_data.get('tipo_treinamento', 'formação')),
+            str(training_data.get('carga_horaria', '0'))
+        ]
+
+    def add_aso(self, aso_data: dict):
+        funcionario_id = str(aso_data.get('funcionario_id'))
+        arquivo_hash = aso_data.get('arquivo_hash')
+        
+        # Verifica duplicata por hash no índice da unidade (registros legados sem hash são ignorados).
+        # O índice é lido antes da gravação: depois dela a versão dos dados muda e o acesso reconstruiria o índice.
+        hash_index = self.hash_index
+        duplicata = hash_index.find_duplicate(arquivo_hash, 'asos', funcionario_id)
+        if duplicata:
+            tipo = self.aso_df.loc[self.aso_df['id'] == duplicata.record_id, 'tipo_aso'] if 'tipo_aso' in self.aso_df.columns else pd.Series(dtype=object)
+            st.warning(f"⚠️ Este arquivo PDF já foi cadastrado anteriormente para este funcionário (ASO do tipo '{tipo.iloc[0] if not tipo.empty else 'N/A'}').")
+            return None
+        self._warn_hash_reuse(arquivo_hash, 'asos', funcionario_id, hash_index)
+        
+        aso_id = self.sheet_ops.adc_dados_aba("asos", self.build_aso_row(aso_data))
         if aso_id:
+            hash_index.add(arquivo_hash, 'asos', funcionario_id, aso_id, get_data_version(self.spreadsheet_id))
             st.cache_data.clear()
             self.load_data()
         return aso_id
@@ -308,27 +367,12 @@ class EmployeeManager:
             
             # 2. PREPARA os dados
             funcionario_id = str(training_data.get('funcionario_id'))
-            norma = self._padronizar_norma(training_data.get('norma'))
-            modulo = str(training_data.get('modulo', 'N/A')).strip()
+            arquivo_hash = training_data.get('arquivo_hash', '')
+            hash_index = self.hash_index  # lido antes da gravação (ver add_aso)
+            self._warn_hash_reuse(arquivo_hash, 'treinamentos', funcionario_id, hash_index)
             
-            # Normalização de módulo
-            if norma == 'NR-10 SEP' and modulo in ['N/A', '', 'nan']:
-                modulo = 'SEP'
-            elif norma == 'NR-10' and modulo in ['N/A', '', 'nan']:
-                modulo = 'Básico'
-            
-            new_data = [
-                funcionario_id,
-                training_data.get('data').strftime("%d/%m/%Y"),
-                training_data.get('vencimento').strftime("%d/%m/%Y"),
-                norma,
-                modulo,
-                "Válido",
-                str(training_data.get('anexo')),
-                training_data.get('arquivo_hash', ''),
-                str(training_data.get('tipo_treinamento', 'formação')),
-                str(training_data.get('carga_horaria', '0'))
-            ]
+            new_data = self.build_training_row(training_data)
+            norma, modulo = new_data[3], new_data[4]
             
             # 3. TENTA SALVAR
             logger.info(f"Salvando treinamento: {norma} - {modulo} para funcionário {funcionario_id}")
@@ -336,6 +380,7 @@ class EmployeeManager:
             
             # 4. VERIFICA SE DEU CERTO
             if training_id:
+                hash_index.add(arquivo_hash, 'treinamentos', funcionario_id, training_id, get_data_version(self.spreadsheet_id))
                 # ✅ SUCESSO - registra no log de auditoria
                 log_action("ADD_TRAINING", {
                     "training_id": training_id,
@@ -377,103 +422,48 @@ class EmployeeManager:
     def unarchive_employee(self, employee_id: str): return self._set_status("funcionarios", employee_id, "Ativo")
 
     def get_latest_aso_by_employee(self, employee_id):
+        """Retorna o ASO mais recente de cada tipo do funcionário (busca na tabela da unidade)."""
+        if self._latest_asos_by_employee is None:
+            return pd.DataFrame()
         try:
-            aso_docs = self._asos_by_employee.get_group(str(employee_id)).copy()
-            if aso_docs.empty: return pd.DataFrame()
-            
-            aso_docs['data_aso'] = pd.to_datetime(aso_docs['data_aso'], format='%d/%m/%Y', errors='coerce')
-            aso_docs['vencimento'] = pd.to_datetime(aso_docs['vencimento'], format='%d/%m/%Y', errors='coerce')
-            aso_docs.dropna(subset=['data_aso'], inplace=True)
-            if aso_docs.empty: return pd.DataFrame()
-
-            aso_docs['tipo_aso'] = aso_docs['tipo_aso'].fillna('N/A')
-            return aso_docs.sort_values('data_aso', ascending=False).groupby('tipo_aso').head(1)
+            latest_asos = self._latest_asos_by_employee.get_group(str(employee_id))
         except KeyError:
             return pd.DataFrame()
+        return latest_asos.drop(columns=['is_current_aptitude']).copy()
+
+    def get_current_aptitude_aso(self, employee_id) -> pd.Series | None:
+        """Retorna o ASO de aptidão vigente (mais recente não demissional) ou None."""
+        if self._latest_asos_by_employee is None:
+            return None
+        try:
+            latest_asos = self._latest_asos_by_employee.get_group(str(employee_id))
+        except KeyError:
+            return None
+        current = latest_asos[latest_asos['is_current_aptitude']]
+        return current.iloc[0] if not current.empty else None
 
     def get_all_trainings_by_employee(self, employee_id):
         """
         Retorna o treinamento mais recente para cada COMBINAÇÃO única de norma + módulo normalizado.
         Reciclagens ocultam formações vencidas, pois são consideradas atualizações válidas.
+        A seleção é feita uma vez para a unidade inteira (current_trainings_df); aqui é só uma busca.
         """
+        if self._current_trainings_by_employee is None:
+            return pd.DataFrame()
         try:
-            training_docs = self._trainings_by_employee.get_group(str(employee_id)).copy()
-            
-            if training_docs.empty: 
-                return pd.DataFrame()
-            
-            training_docs.dropna(subset=['data'], inplace=True)
-            
-            if training_docs.empty: 
-                return pd.DataFrame()
-
-            # Garante que as colunas essenciais existam
-            for col in ['norma', 'modulo', 'tipo_treinamento']:
-                if col not in training_docs.columns: 
-                    training_docs[col] = 'N/A'
-                training_docs[col] = training_docs[col].fillna('N/A')
-            
-            # ✅ NORMALIZAÇÃO: Norma e módulo para evitar duplicatas por case
-            training_docs['norma_normalizada'] = training_docs['norma'].str.strip().str.upper()
-            training_docs['modulo_normalizado'] = training_docs['modulo'].str.strip().str.title()
-            
-            # ✅ Tratamento especial para casos específicos
-            def normalizar_modulo_especial(row):
-                norma = row['norma_normalizada']
-                modulo = row['modulo_normalizado']
-                
-                # NR-10: SEP é diferente de Básico
-                if 'NR-10' in norma:
-                    if 'SEP' in norma or 'SEP' in modulo.upper():
-                        return 'SEP'
-                    elif modulo in ['N/A', 'Nan', '']:
-                        return 'Básico'
-                    return modulo
-                
-                # NR-33: Normaliza variações
-                if 'NR-33' in norma:
-                    if 'SUPERVISOR' in modulo.upper():
-                        return 'Supervisor'
-                    elif 'TRABALHADOR' in modulo.upper() or 'AUTORIZADO' in modulo.upper():
-                        return 'Trabalhador Autorizado'
-                    return modulo
-                
-                # NR-20: Normaliza módulos
-                if 'NR-20' in norma:
-                    modulos_validos = ['Básico', 'Intermediário', 'Avançado I', 'Avançado II']
-                    for valido in modulos_validos:
-                        if valido.upper() in modulo.upper():
-                            return valido
-                    return modulo
-                
-                # Permissão de Trabalho: Normaliza Emitente/Requisitante
-                if 'PERMISSÃO' in norma or 'PT' in norma:
-                    if 'EMITENTE' in modulo.upper():
-                        return 'Emitente'
-                    elif 'REQUISITANTE' in modulo.upper():
-                        return 'Requisitante'
-                    return modulo
-                
-                return modulo
-            
-            training_docs['modulo_final'] = training_docs.apply(normalizar_modulo_especial, axis=1)
-            
-            # ✅ CRÍTICO: Converte 'data' para datetime se ainda não for
-            training_docs['data_dt'] = pd.to_datetime(training_docs['data'], errors='coerce')
-            
-            # ✅ LÓGICA PRINCIPAL: Agrupa por (norma, módulo) e pega o MAIS RECENTE
-            # Isso significa que uma RECICLAGEM de 2024 vai ocultar uma FORMAÇÃO de 2020
-            latest_trainings = training_docs.sort_values(
-                'data_dt', ascending=False  # ✅ Ordena pela data mais recente primeiro
-            ).groupby(['norma_normalizada', 'modulo_final'], dropna=False).head(1)
-            
-            # Remove colunas auxiliares antes de retornar
-            latest_trainings = latest_trainings.drop(columns=['norma_normalizada', 'modulo_normalizado', 'modulo_final', 'data_dt'])
-            
-            return latest_trainings
+            latest_trainings = self._current_trainings_by_employee.get_group(str(employee_id)).copy()
         except KeyError:
             return pd.DataFrame()
 
+        # Garante que as colunas essenciais existam
+        for col in ['norma', 'modulo', 'tipo_treinamento']:
+            if col not in latest_trainings.columns: 
+                latest_trainings[col] = 'N/A'
+            latest_trainings[col] = latest_trainings[col].fillna('N/A')
+        
+        # Remove colunas auxiliares antes de retornar
+        return latest_trainings.drop(columns=['norma_normalizada', 'modulo_final'], errors='ignore')
+
     def get_company_name(self, company_id):
         if self.companies_df.empty: return f"ID {company_id}"
         company = self.companies_df[self.companies_df['id'] == str(company_id)]
@@ -529,42 +519,27 @@ class EmployeeManager:
         arquivo_hash = training_data.get('arquivo_hash')
         funcionario_id = str(training_data.get('funcionario_id'))
         
-        if arquivo_hash and verificar_hash_seguro(self.training_df, 'arquivo_hash'):
-            duplicata = self.training_df[
-                (self.training_df['funcionario_id'] == funcionario_id) &
-                (self.training_df['arquivo_hash'] == arquivo_hash)
-            ]
-            if not duplicata.empty:
-                return False, "❌ Este PDF já foi cadastrado anteriormente"
+        if self.hash_index.find_duplicate(arquivo_hash, 'treinamentos', funcionario_id):
+            return False, "❌ Este PDF já foi cadastrado anteriormente"
         
         # 7. TUDO OK!
         return True, "✅ Validação aprovada"
 
+    def _warn_hash_reuse(self, arquivo_hash, tabela: str, owner_id, hash_index=None):
+        """Avisa (sem bloquear) quando o mesmo arquivo já está cadastrado para outro funcionário ou em outra aba."""
+        reuse = (hash_index if hash_index is not None else self.hash_index).find_reuse(arquivo_hash, tabela, owner_id)
+        if reuse:
+            st.warning(f"⚠️ Este arquivo PDF também está cadastrado em: {describe_reuse(reuse)}.")
+
     def _padronizar_norma(self, norma):
-        if not norma: return "N/A"
-        norma_upper = str(norma).strip().upper()
-        if any(term in norma_upper for term in ["BRIGADA", "INCÊNDIO", "IT-17", "NR-23"]): return "BRIGADA DE INCÊNDIO"
-        if "16710" in norma_upper or "RESGATE TÉCNICO" in norma_upper: return "NBR-16710 RESGATE TÉCNICO"
-        if "PERMISSÃO" in norma_upper or re.search(r'\bPT\b', norma_upper): return "PERMISSÃO DE TRABALHO (PT)"
-        match = re.search(r'NR\s?-?(\d+)', norma_upper)
-        if match: return f"NR-{int(match.group(1)):02d}"
-        return norma_upper
+        return padronizar_norma(norma)
 
     def calcular_vencimento_treinamento(self, data, norma, modulo=None, tipo_treinamento='formação'):
         if not isinstance(data, (date, datetime)): return None
-        norma_padronizada = self._padronizar_norma(norma)
-        anos_validade = None
-        if norma_padronizada == "NR-20" and modulo:
-            config = self.nr20_config.get(modulo.strip().title())
-            if config: anos_validade = config.get('reciclagem_anos')
-        else:
-            config = self.nr_config.get(norma_padronizada)
-            if config: anos_validade = config.get('reciclagem_anos')
-        
-        if anos_validade is not None:
-            return data + relativedelta(years=int(anos_validade))
-        st.warning(f"Regras de vencimento não encontradas para '{norma_padronizada}'.")
-        return None
+        vencimento = self.nr_rules.training_expiry(data, norma, modulo)
+        if vencimento is None:
+            st.warning(f"Regras de vencimento não encontradas para '{self._padronizar_norma(norma)}'.")
+        return vencimento
 
     def delete_aso(self, aso_id: str, file_url: str):
         """
@@ -623,82 +598,4 @@ class EmployeeManager:
         Valida a carga horária de um treinamento com base na norma, módulo e tipo.
         Retorna (True, "Mensagem de sucesso") ou (False, "Mensagem de erro").
         """
-        norma_padronizada = self._padronizar_norma(norma)
-        tipo_treinamento = str(tipo_treinamento).lower() # Garante que seja minúsculo
-
-        # --- Lógica para NRs com regras simples (do dicionário nr_config) ---
-        if norma_padronizada in self.nr_config:
-            config = self.nr_config[norma_padronizada]
-            
-            # Verifica a carga horária de formação (inicial)
-            if tipo_treinamento == 'formação' and 'inicial_horas' in config:
-                if carga_horaria < config['inicial_horas']:
-                    return False, f"Carga horária para formação ({norma_padronizada}) deve ser de {config['inicial_horas']}h, mas foi de {carga_horaria}h."
-            
-            # Verifica a carga horária de reciclagem
-            elif tipo_treinamento == 'reciclagem' and 'reciclagem_horas' in config:
-                if carga_horaria < config['reciclagem_horas']:
-                    return False, f"Carga horária para reciclagem ({norma_padronizada}) deve ser de {config['reciclagem_horas']}h, mas foi de {carga_horaria}h."
-
-        # --- Lógicas Específicas e Complexas ---
-
-        # Lógica para NR-33 (Espaços Confinados)
-        if norma_padronizada == "NR-33":
-            modulo_normalizado = ""
-            if modulo:
-                if "supervisor" in modulo.lower():
-                    modulo_normalizado = "supervisor"
-                elif "trabalhador" in modulo.lower() or "autorizado" in modulo.lower():
-                    modulo_normalizado = "trabalhador"
-            
-            if tipo_treinamento == 'formação':
-                if modulo_normalizado == "supervisor" and carga_horaria < 40:
-                    return False, f"Carga horária para formação de Supervisor (NR-33) deve ser de 40h, mas foi de {carga_horaria}h."
-                if modulo_normalizado == "trabalhador" and carga_horaria < 16:
-                    return False, f"Carga horária para formação de Trabalhador Autorizado (NR-33) deve ser de 16h, mas foi de {carga_horaria}h."
-            
-            elif tipo_treinamento == 'reciclagem':
-                if carga_horaria < 8:
-                    return False, f"Carga horária para reciclagem (NR-33) deve ser de 8h, mas foi de {carga_horaria}h."
-        
-        # Lógica para Permissão de Trabalho (PT)
-        elif norma_padronizada == "PERMISSÃO DE TRABALHO (PT)":
-            modulo_lower = str(modulo).lower()
-            if "emitente" in modulo_lower:
-                if tipo_treinamento == 'formação' and carga_horaria < 16:
-                    return False, f"Carga horária para formação de Emitente de PT deve ser de 16h, mas foi de {carga_horaria}h."
-                elif tipo_treinamento == 'reciclagem' and carga_horaria < 4:
-                    return False, f"Carga horária para reciclagem de Emitente de PT deve ser de 4h, mas foi de {carga_horaria}h."
-            elif "requisitante" in modulo_lower:
-                if tipo_treinamento == 'formação' and carga_horaria < 8:
-                    return False, f"Carga horária para formação de Requisitante de PT deve ser de 8h, mas foi de {carga_horaria}h."
-                elif tipo_treinamento == 'reciclagem' and carga_horaria < 4:
-                    return False, f"Carga horária para reciclagem de Requisitante de PT deve ser de 4h, mas foi de {carga_horaria}h."
-          
-        # Lógica para Brigada de Incêndio
-        elif norma_padronizada == "BRIGADA DE INCÊNDIO":
-            is_avancado = "avançado" in str(modulo).lower()
-            if is_avancado:
-                if tipo_treinamento == 'formação' and carga_horaria < 24:
-                    return False, f"Carga horária para formação de Brigada Avançada deve ser de 24h, mas foi de {carga_horaria}h."
-                elif tipo_treinamento == 'reciclagem' and carga_horaria < 16:
-                    return False, f"Carga horária para reciclagem de Brigada Avançada deve ser de 16h, mas foi de {carga_horaria}h."
-
-        # Lógica para NR-11 (Movimentação de Cargas)
-        elif norma_padronizada == "NR-11":
-            if tipo_treinamento == 'formação' and carga_horaria < 16:
-                return False, f"Carga horária para formação (NR-11) parece baixa ({carga_horaria}h). O mínimo comum é 16h."
-            elif tipo_treinamento == 'reciclagem' and carga_horaria < 16:
-                 return False, f"Carga horária para reciclagem (NR-11) deve ser de 16h, mas foi de {carga_horaria}h."
-        
-        # Lógica para NBR 16710 (Resgate Técnico)
-        elif norma_padronizada == "NBR-16710 RESGATE TÉCNICO":
-            is_industrial_rescue = "industrial" in str(modulo).lower()
-            if is_industrial_rescue:
-                if tipo_treinamento == 'formação' and carga_horaria < 24:
-                    return False, f"Carga horária para formação de Resgate Técnico Industrial (NBR 16710) deve ser de no mínimo 24h, mas foi de {carga_horaria}h."
-                elif tipo_treinamento == 'reciclagem' and carga_horaria < 24:
-                    return False, f"Carga horária para reciclagem de Resgate Técnico Industrial (NBR 16710) deve ser de no mínimo 24h, mas foi de {carga_horaria}h."
-        
-        # Se nenhuma das condições de falha for atendida, o treinamento é considerado conforme.
-        return True, "Carga horária conforme."
+        return self.nr_rules.check_hours(norma, modulo, tipo_treinamento, carga_horaria)
@@ -1,13 +1,13 @@
 import streamlit as st
 import pandas as pd
 import json
-import tempfile
-import os
 import re
 from operations.sheet import SheetOperations
 from AI.api_Operation import PDFQA
 from operations.cached_loaders import load_epis_df
-from operations.file_hash import calcular_hash_arquivo, verificar_hash_seguro
+from operations.file_hash import calcular_hash_arquivo
+from operations.hash_index import get_hash_index, describe_reuse
+from operations.data_versions import get_data_version
 
 class EPIManager:
     def __init__(self, spreadsheet_id: str):
@@ -19,7 +19,7 @@ class EPIManager:
     @property
     def pdf_analyzer(self):
         if self._pdf_analyzer is None:
-            self._pdf_analyzer = PDFQA()
+            self._pdf_analyzer = PDFQA(unit_id=self.spreadsheet_id)
         return self._pdf_analyzer
 
     def load_epi_data(self):
@@ -59,10 +59,6 @@ class EPIManager:
     def analyze_epi_pdf(self, pdf_file):
         """Analisa o PDF da Ficha de EPI usando IA para extrair os itens."""
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(pdf_file.getvalue())
-                temp_path = temp_file.name
-
             structured_prompt = """
             Você é um especialista em análise de Fichas de Controle de EPI. Sua tarefa é analisar o documento e extrair as informações da tabela de equipamentos fornecidos e o nome do funcionário.
 
@@ -95,14 +91,11 @@ class EPIManager:
             }
             ```
             """
-            answer, _ = self.pdf_analyzer.answer_question([temp_path], structured_prompt)
+            answer, _ = self.pdf_analyzer.answer_question([pdf_file.getvalue()], structured_prompt, expect_json=True)
 
         except Exception as e:
             st.error(f"Erro ao processar o PDF da Ficha de EPI: {str(e)}")
             return None
-        finally:
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.unlink(temp_path)
 
         if not answer:
             st.error("A IA não retornou uma resposta para a Ficha de EPI.")
@@ -129,17 +122,14 @@ class EPIManager:
         """Adiciona múltiplos registros de EPI a partir de uma única ficha, evitando duplicatas por hash."""
         funcionario_id_str = str(funcionario_id)
         
-        # Verifica se o arquivo já foi cadastrado para este funcionário
-        
-        if arquivo_hash and verificar_hash_seguro(self.epi_df, 'arquivo_hash'):
-            duplicata = self.epi_df[
-                (self.epi_df['funcionario_id'] == funcionario_id_str) &
-                (self.epi_df['arquivo_hash'] == arquivo_hash)
-            ]
-            
-            if not duplicata.empty:
-                st.warning(f"⚠️ Esta ficha de EPI já foi cadastrada anteriormente para este funcionário.")
-                return None
+        # Verifica se o arquivo já foi cadastrado para este funcionário (índice de hashes da unidade)
+        hash_index = get_hash_index(self.spreadsheet_id)
+        if hash_index.find_duplicate(arquivo_hash, 'fichas_epi', funcionario_id_str):
+            st.warning(f"⚠️ Esta ficha de EPI já foi cadastrada anteriormente para este funcionário.")
+            return None
+        reuse = hash_index.find_reuse(arquivo_hash, 'fichas_epi', funcionario_id_str)
+        if reuse:
+            st.warning(f"⚠️ Este arquivo PDF também está cadastrado em: {describe_reuse(reuse)}.")
         
         saved_ids = []
         for item in itens_epi:
@@ -156,6 +146,7 @@ class EPIManager:
                 new_id = self.sheet_ops.adc_dados_aba("fichas_epi", new_data)
                 if new_id:
                     saved_ids.append(new_id)
+                    hash_index.add(arquivo_hash, 'fichas_epi', funcionario_id_str, new_id, get_data_version(self.spreadsheet_id))
             except Exception as e:
                 st.error(f"Erro ao adicionar o item '{item.get('descricao')}': {e}")
                 continue
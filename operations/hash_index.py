@@ -0,0 +1,132 @@
+import time
+import logging
+import threading
+from typing import NamedTuple
+
+import pandas as pd
+import streamlit as st
+
+from operations.data_versions import get_data_version
+from operations.cached_loaders import load_all_unit_data
+
+logger = logging.getLogger('segsisone_app.hash_index')
+
+# Abas com arquivo anexado: nome da aba -> (chave em load_all_unit_data, coluna do "dono" do arquivo).
+HASHED_TABLES = {
+    'asos': ('asos', 'funcionario_id'),
+    'treinamentos': ('trainings', 'funcionario_id'),
+    'fichas_epi': ('epis', 'funcionario_id'),
+    'documentos_empresa': ('company_docs', 'empresa_id'),
+}
+TABLE_LABELS = {
+    'asos': 'ASO',
+    'treinamentos': 'Treinamento',
+    'fichas_epi': 'Ficha de EPI',
+    'documentos_empresa': 'Documento da Empresa',
+}
+# Mesmo TTL dos loaders em cache (operations/cached_loaders.py).
+MAX_INDEX_AGE_SECONDS = 600
+
+
+class HashEntry(NamedTuple):
+    tabela: str
+    owner_id: str
+    record_id: str
+
+
+class HashIndex:
+    """
+    Índice hash do arquivo -> registros que usam o arquivo, para todas as abas com anexo
+    de uma unidade. Substitui as varreduras da coluna `arquivo_hash` por consultas O(1)
+    e permite detectar o mesmo PDF reaproveitado em outro funcionário ou em outra aba.
+    """
+
+    def __init__(self, data_version: int = 0):
+        self.data_version = data_version
+        self.built_at = time.monotonic()
+        self._entries: dict[str, set[HashEntry]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_unit_data(cls, data: dict, data_version: int = 0) -> 'HashIndex':
+        index = cls(data_version)
+        for tabela, (data_key, owner_col) in HASHED_TABLES.items():
+            df = data.get(data_key)
+            if df is None or df.empty or 'arquivo_hash' not in df.columns or owner_col not in df.columns:
+                continue
+            hashes = df['arquivo_hash'].fillna('').astype(str).str.strip()
+            has_hash = hashes != ''
+            record_ids = df['id'].astype(str) if 'id' in df.columns else pd.Series('', index=df.index)
+            for arquivo_hash, owner_id, record_id in zip(hashes[has_hash].tolist(), df.loc[has_hash, owner_col].astype(str).tolist(), record_ids[has_hash].tolist()):
+                index._entries.setdefault(arquivo_hash, set()).add(HashEntry(tabela, owner_id, record_id))
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self, arquivo_hash: str) -> frozenset:
+        with self._lock:
+            return frozenset(self._entries.get(arquivo_hash, ()))
+
+    def find_duplicate(self, arquivo_hash: str, tabela: str, owner_id) -> HashEntry | None:
+        """Registro da mesma aba e do mesmo dono (funcionário/empresa) com o mesmo arquivo."""
+        if not arquivo_hash: return None
+        owner_id = str(owner_id)
+        for entry in self.entries(arquivo_hash):
+            if entry.tabela == tabela and entry.owner_id == owner_id:
+                return entry
+        return None
+
+    def find_reuse(self, arquivo_hash: str, tabela: str, owner_id) -> list[HashEntry]:
+        """Registros que usam o mesmo arquivo em outra aba ou para outro dono."""
+        if not arquivo_hash: return []
+        owner_id = str(owner_id)
+        return sorted(e for e in self.entries(arquivo_hash) if e.tabela != tabela or e.owner_id != owner_id)
+
+    def add(self, arquivo_hash: str, tabela: str, owner_id, record_id, data_version: int | None = None):
+        """
+        Registra um arquivo recém-gravado. Se `data_version` for a versão seguinte à do
+        índice (isto é, a única escrita desde a construção foi esta), o índice continua
+        sincronizado e não precisa ser reconstruído.
+        """
+        if not arquivo_hash: return
+        with self._lock:
+            self._entries.setdefault(arquivo_hash, set()).add(HashEntry(tabela, str(owner_id), str(record_id)))
+            if data_version is not None and data_version == self.data_version + 1:
+                self.data_version = data_version
+
+
+def describe_reuse(entries: list[HashEntry]) -> str:
+    """Texto curto para avisos de reaproveitamento ('ASO (funcionário 123), ...')."""
+    parts = []
+    for entry in entries[:3]:
+        owner = "empresa" if entry.tabela == 'documentos_empresa' else "funcionário"
+        parts.append(f"{TABLE_LABELS.get(entry.tabela, entry.tabela)} ({owner} {entry.owner_id})")
+    if len(entries) > 3:
+        parts.append(f"e mais {len(entries) - 3} registro(s)")
+    return ", ".join(parts)
+
+
+@st.cache_resource
+def _get_index_registry() -> dict:
+    """Índices por planilha, compartilhados entre sessões."""
+    return {'lock': threading.Lock(), 'indexes': {}}
+
+
+def get_hash_index(spreadsheet_id: str) -> HashIndex:
+    """
+    Índice de hashes da unidade. É reconstruído quando a planilha recebe uma escrita que
+    não foi registrada nele (ex.: exclusões) ou quando excede o TTL dos dados em cache.
+    """
+    registry = _get_index_registry()
+    version = get_data_version(spreadsheet_id)
+    with registry['lock']:
+        index = registry['indexes'].get(spreadsheet_id)
+        if index is not None and index.data_version == version and (time.monotonic() - index.built_at) <= MAX_INDEX_AGE_SECONDS:
+            return index
+
+    index = HashIndex.from_unit_data(load_all_unit_data(spreadsheet_id), version)
+    logger.info(f"Índice de hashes da unidade ...{spreadsheet_id[-6:]} construído com {len(index)} arquivos.")
+    with registry['lock']:
+        registry['indexes'][spreadsheet_id] = index
+    return index
@@ -0,0 +1,228 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from operations.data_versions import get_data_version
+
+logger = logging.getLogger('segsisone_app.manager_pool')
+
+# Quantidade máxima de unidades mantidas "aquecidas" por sessão.
+MAX_POOLED_UNITS = 4
+# Orçamento aproximado (bytes) para os DataFrames mantidos pelos managers estacionados.
+MAX_POOL_BYTES = 256 * 1024 * 1024
+# Acima deste uso de memória do processo (RSS), apenas a unidade ativa é mantida.
+MAX_PROCESS_RSS_BYTES = int(os.environ.get('SEGSISONE_POOL_MAX_RSS_MB', 1536)) * 1024 * 1024
+# Mesmo TTL dos loaders em cache (operations/cached_loaders.py).
+MAX_SET_AGE_SECONDS = 600
+
+
+def _get_process_rss_bytes() -> int | None:
+    """Lê o uso atual de memória residente do processo (Linux). Retorna None se indisponível."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _estimate_object_bytes(obj) -> int:
+    """Soma o tamanho em memória dos DataFrames mantidos como atributos de um manager."""
+    total = 0
+    for value in vars(obj).values():
+        if isinstance(value, pd.DataFrame):
+            try:
+                total += int(value.memory_usage(deep=True).sum())
+            except Exception:
+                pass
+    return total
+
+
+def _build_employee_manager(spreadsheet_id: str, folder_id: str):
+    from operations.employee import EmployeeManager
+    return EmployeeManager(spreadsheet_id, folder_id)
+
+
+def _build_docs_manager(spreadsheet_id: str, folder_id: str):
+    from operations.company_docs import CompanyDocsManager
+    return CompanyDocsManager(spreadsheet_id, folder_id)
+
+
+def _build_epi_manager(spreadsheet_id: str, folder_id: str):
+    from operations.epi import EPIManager
+    return EPIManager(spreadsheet_id)
+
+
+def _build_action_plan_manager(spreadsheet_id: str, folder_id: str):
+    from operations.action_plan import ActionPlanManager
+    return ActionPlanManager(spreadsheet_id)
+
+
+def _build_nr_analyzer(spreadsheet_id: str, folder_id: str):
+    from analysis.nr_analyzer import NRAnalyzer
+    return NRAnalyzer(spreadsheet_id)
+
+
+def _build_training_matrix_manager(spreadsheet_id: str, folder_id: str):
+    from operations.training_matrix_manager import MatrixManager as TrainingMatrixManager
+    return TrainingMatrixManager(spreadsheet_id)
+
+
+# Registro de managers da unidade: nome -> fábrica. As importações ficam dentro das
+# fábricas para que cada página só carregue os subsistemas que realmente usa.
+UNIT_MANAGER_FACTORIES = {
+    'employee_manager': _build_employee_manager,
+    'docs_manager': _build_docs_manager,
+    'epi_manager': _build_epi_manager,
+    'action_plan_manager': _build_action_plan_manager,
+    'nr_analyzer': _build_nr_analyzer,
+    'matrix_manager_unidade': _build_training_matrix_manager,
+}
+
+
+class UnitManagerSet:
+    """
+    Conjunto de managers de uma unidade. Cada manager é criado apenas no primeiro
+    acesso (via `get`) e reaproveitado depois disso.
+    """
+
+    def __init__(self, spreadsheet_id: str, folder_id: str):
+        self.spreadsheet_id = spreadsheet_id
+        self.folder_id = folder_id
+        self.data_version = get_data_version(spreadsheet_id)
+        self.created_at = time.monotonic()
+        self.managers = {}
+        self.estimated_bytes = 0
+
+    def get(self, name: str):
+        """Retorna o manager pedido, construindo-o na primeira vez."""
+        if name not in self.managers:
+            factory = UNIT_MANAGER_FACTORIES.get(name)
+            if factory is None:
+                raise KeyError(f"Manager desconhecido: '{name}'")
+            logger.info(f"Inicializando '{name}' para a unidade ...{self.spreadsheet_id[-6:]}.")
+            self.managers[name] = factory(self.spreadsheet_id, self.folder_id)
+        return self.managers[name]
+
+    def estimate_size(self) -> int:
+        return sum(_estimate_object_bytes(m) for m in self.managers.values())
+
+    def is_stale(self) -> bool:
+        """O conjunto está desatualizado se a planilha mudou ou se excedeu o TTL dos dados."""
+        if get_data_version(self.spreadsheet_id) != self.data_version:
+            return True
+        return (time.monotonic() - self.created_at) > MAX_SET_AGE_SECONDS
+
+
+class ManagerPool:
+    """
+    LRU limitado de conjuntos de managers por `spreadsheet_id`.
+    Permite voltar a uma unidade recente sem reconstruir os managers, respeitando
+    um limite de unidades, um orçamento de memória e as versões dos dados.
+    """
+
+    def __init__(self, max_units: int = MAX_POOLED_UNITS, max_bytes: int = MAX_POOL_BYTES):
+        self.max_units = max_units
+        self.max_bytes = max_bytes
+        self._sets: OrderedDict[str, UnitManagerSet] = OrderedDict()
+        self.active_id: str | None = None
+
+    def acquire(self, spreadsheet_id: str, folder_id: str) -> UnitManagerSet:
+        """Retorna o conjunto de managers da unidade, reaproveitando-o se ainda for válido."""
+        manager_set = self._sets.get(spreadsheet_id)
+        if manager_set is not None:
+            if manager_set.folder_id == folder_id and not manager_set.is_stale():
+                self._sets.move_to_end(spreadsheet_id)
+                self.active_id = spreadsheet_id
+                logger.info(f"POOL HIT: Reutilizando managers da unidade ...{spreadsheet_id[-6:]}.")
+                return manager_set
+            logger.info(f"Managers da unidade ...{spreadsheet_id[-6:]} desatualizados. Reconstruindo.")
+            del self._sets[spreadsheet_id]
+
+        logger.info(f"POOL MISS: Construindo managers da unidade ...{spreadsheet_id[-6:]}.")
+        manager_set = UnitManagerSet(spreadsheet_id, folder_id)
+        self._sets[spreadsheet_id] = manager_set
+        self.active_id = spreadsheet_id
+        self._evict(active_id=spreadsheet_id)
+        return manager_set
+
+    def park(self, spreadsheet_id: str | None):
+        """
+        Chamado quando o usuário sai de uma unidade. As escritas feitas pela própria sessão
+        já foram recarregadas pelos managers, então a versão é sincronizada neste momento;
+        alterações posteriores invalidam o conjunto.
+        """
+        if spreadsheet_id and spreadsheet_id == self.active_id:
+            self.active_id = None
+        manager_set = self._sets.get(spreadsheet_id) if spreadsheet_id else None
+        if manager_set is None:
+            return
+        manager_set.data_version = get_data_version(spreadsheet_id)
+        manager_set.estimated_bytes = manager_set.estimate_size()
+        self._evict()
+
+    @property
+    def active_set(self) -> UnitManagerSet | None:
+        return self._sets.get(self.active_id) if self.active_id else None
+
+    def invalidate(self, spreadsheet_id: str | None = None):
+        """Descarta o conjunto de uma unidade ou, sem argumento, todo o pool."""
+        if spreadsheet_id is None:
+            self._sets.clear()
+            self.active_id = None
+        else:
+            self._sets.pop(spreadsheet_id, None)
+            if spreadsheet_id == self.active_id:
+                self.active_id = None
+
+    def _evict(self, active_id: str | None = None):
+        """Remove os conjuntos menos usados até respeitar os limites de quantidade e memória."""
+        def evictable():
+            return [sid for sid in self._sets if sid != active_id]
+
+        while len(self._sets) > self.max_units and evictable():
+            self._drop(evictable()[0], "limite de unidades")
+
+        while sum(s.estimated_bytes for s in self._sets.values()) > self.max_bytes and evictable():
+            self._drop(evictable()[0], "orçamento de memória")
+
+        rss = _get_process_rss_bytes()
+        if rss is not None and rss > MAX_PROCESS_RSS_BYTES:
+            for sid in evictable():
+                self._drop(sid, f"pressão de memória (RSS {rss // (1024 * 1024)} MB)")
+
+    def _drop(self, spreadsheet_id: str, reason: str):
+        self._sets.pop(spreadsheet_id, None)
+        logger.info(f"Managers da unidade ...{spreadsheet_id[-6:]} removidos do pool: {reason}.")
+
+    def __contains__(self, spreadsheet_id: str) -> bool:
+        return spreadsheet_id in self._sets
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+
+def get_manager_pool() -> ManagerPool:
+    """Retorna o pool de managers da sessão atual, criando-o se necessário."""
+    if 'manager_pool' not in st.session_state:
+        st.session_state.manager_pool = ManagerPool()
+    return st.session_state.manager_pool
+
+
+def get_unit_manager(name: str):
+    """
+    Retorna um manager da unidade ativa (ex.: 'employee_manager'), criando-o sob demanda.
+    Retorna None se nenhuma unidade estiver selecionada na sessão.
+    """
+    pool = get_manager_pool()
+    manager_set = pool.active_set
+    if manager_set is None:
+        unit_id = st.session_state.get('spreadsheet_id')
+        if not unit_id:
+            return None
+        manager_set = pool.acquire(unit_id, st.session_state.get('folder_id'))
+    return manager_set.get(name)
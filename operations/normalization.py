@@ -0,0 +1,191 @@
+import re
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Valores de módulo que representam "não informado" após strip + title().
+_EMPTY_MODULES = ['N/A', 'Nan', '']
+
+_NR_NUMBER_RE = re.compile(r'NR\s?-?(\d+)')
+_PT_RE = re.compile(r'\bPT\b')
+_BRIGADA_TERMS = ("BRIGADA", "INCÊNDIO", "IT-17", "NR-23")
+
+# Datas aceitas: DD/MM/AAAA (ou AA, com '-' ou '.'), "DD de <mês> de AAAA" e AAAA-MM-DD.
+# Anos com 3 dígitos ('12/03/202') são rejeitados, como no parser original.
+_DATE_RE = re.compile(
+    r'(?P<d1>\d{1,2})[/\-.](?P<m1>\d{1,2})[/\-.](?P<y1>\d{4}|\d{2}(?!\d))'
+    r'|(?P<d2>\d{1,2}) de (?P<mn>\w+) de (?P<y2>\d{4})'
+    r'|(?P<y3>\d{4})[/\-.](?P<m3>\d{1,2})[/\-.](?P<d3>\d{1,2})',
+    re.IGNORECASE,
+)
+# Nomes dos meses explícitos: não dependem do locale do servidor (%B).
+_MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'março': 3, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+}
+
+
+def add_training_normalization_columns(trainings_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula, de forma vetorizada, as colunas `norma_normalizada` e `modulo_final`
+    usadas para identificar o treinamento vigente de cada (funcionário, norma, módulo).
+
+    Regras (a primeira que se aplica vence, na mesma ordem da lógica original):
+    - NR-10: 'SEP' na norma ou no módulo -> 'SEP'; módulo vazio -> 'Básico'.
+    - NR-33: 'SUPERVISOR' -> 'Supervisor'; 'TRABALHADOR'/'AUTORIZADO' -> 'Trabalhador Autorizado'.
+    - NR-20: níveis Básico, Intermediário, Avançado I e Avançado II.
+    - Permissão de Trabalho: 'EMITENTE' -> 'Emitente'; 'REQUISITANTE' -> 'Requisitante'.
+    Nos demais casos, o módulo normalizado (strip + title) é mantido.
+    """
+    if trainings_df.empty:
+        for col in ['norma_normalizada', 'modulo_final']:
+            if col not in trainings_df.columns:
+                trainings_df[col] = pd.Series(dtype='object')
+        return trainings_df
+
+    norma = trainings_df['norma'] if 'norma' in trainings_df.columns else pd.Series('N/A', index=trainings_df.index)
+    modulo = trainings_df['modulo'] if 'modulo' in trainings_df.columns else pd.Series('N/A', index=trainings_df.index)
+
+    norma_norm = norma.fillna('N/A').astype(str).str.strip().str.upper()
+    modulo_norm = modulo.fillna('N/A').astype(str).str.strip().str.title()
+    modulo_upper = modulo_norm.str.upper()
+
+    is_nr10 = norma_norm.str.contains('NR-10', regex=False)
+    is_nr33 = ~is_nr10 & norma_norm.str.contains('NR-33', regex=False)
+    is_nr20 = ~is_nr10 & ~is_nr33 & norma_norm.str.contains('NR-20', regex=False)
+    is_pt = ~is_nr10 & ~is_nr33 & ~is_nr20 & (
+        norma_norm.str.contains('PERMISSÃO', regex=False) | norma_norm.str.contains('PT', regex=False)
+    )
+
+    conditions = [
+        is_nr10 & (norma_norm.str.contains('SEP', regex=False) | modulo_upper.str.contains('SEP', regex=False)),
+        is_nr10 & modulo_norm.isin(_EMPTY_MODULES),
+        is_nr33 & modulo_upper.str.contains('SUPERVISOR', regex=False),
+        is_nr33 & (modulo_upper.str.contains('TRABALHADOR', regex=False) | modulo_upper.str.contains('AUTORIZADO', regex=False)),
+        # 'AVANÇADO II' precisa ser testado antes de 'AVANÇADO I', que é seu prefixo.
+        is_nr20 & modulo_upper.str.contains('BÁSICO', regex=False),
+        is_nr20 & modulo_upper.str.contains('INTERMEDIÁRIO', regex=False),
+        is_nr20 & modulo_upper.str.contains('AVANÇADO II', regex=False),
+        is_nr20 & modulo_upper.str.contains('AVANÇADO I', regex=False),
+        is_pt & modulo_upper.str.contains('EMITENTE', regex=False),
+        is_pt & modulo_upper.str.contains('REQUISITANTE', regex=False),
+    ]
+    choices = [
+        'SEP', 'Básico',
+        'Supervisor', 'Trabalhador Autorizado',
+        'Básico', 'Intermediário', 'Avançado II', 'Avançado I',
+        'Emitente', 'Requisitante',
+    ]
+
+    trainings_df['norma_normalizada'] = norma_norm
+    trainings_df['modulo_final'] = np.select(conditions, choices, default=modulo_norm.to_numpy(dtype=object))
+    return trainings_df
+
+
+# --- Normas ---
+
+@lru_cache(maxsize=2048)
+def _padronizar_norma_str(norma_upper: str) -> str:
+    if any(term in norma_upper for term in _BRIGADA_TERMS): return "BRIGADA DE INCÊNDIO"
+    if "16710" in norma_upper or "RESGATE TÉCNICO" in norma_upper: return "NBR-16710 RESGATE TÉCNICO"
+    if "PERMISSÃO" in norma_upper or _PT_RE.search(norma_upper): return "PERMISSÃO DE TRABALHO (PT)"
+    match = _NR_NUMBER_RE.search(norma_upper)
+    if match: return f"NR-{int(match.group(1)):02d}"
+    return norma_upper
+
+
+def padronizar_norma(norma) -> str:
+    """Nome canônico da norma ('nr 35' -> 'NR-35', 'Brigada' -> 'BRIGADA DE INCÊNDIO'). Memoizado."""
+    if not norma or (not isinstance(norma, str) and pd.isna(norma)): return "N/A"
+    return _padronizar_norma_str(str(norma).strip().upper())
+
+
+def padronizar_norma_series(normas: pd.Series) -> pd.Series:
+    """Versão vetorizada de `padronizar_norma` para uma coluna inteira (cada valor distinto é tratado uma vez)."""
+    codes, uniques = pd.factorize(normas.fillna('').astype(str).str.strip().str.upper())
+    upper = pd.Series(uniques, dtype=object)
+    nr_number = pd.to_numeric(upper.str.extract(_NR_NUMBER_RE, expand=False), errors='coerce')
+    nr_name = nr_number.map(lambda number: f"NR-{int(number):02d}", na_action='ignore')
+    conditions = [
+        upper == '',
+        upper.str.contains('|'.join(map(re.escape, _BRIGADA_TERMS)), regex=True),
+        upper.str.contains('16710', regex=False) | upper.str.contains('RESGATE TÉCNICO', regex=False),
+        upper.str.contains('PERMISSÃO', regex=False) | upper.str.contains(_PT_RE, regex=True),
+        nr_number.notna(),
+    ]
+    choices = ['N/A', 'BRIGADA DE INCÊNDIO', 'NBR-16710 RESGATE TÉCNICO', 'PERMISSÃO DE TRABALHO (PT)', nr_name.to_numpy(dtype=object)]
+    standardized = np.select(conditions, choices, default=upper.to_numpy(dtype=object))
+    return pd.Series(standardized[codes], index=normas.index, dtype=object)
+
+
+# --- Datas ---
+
+def _full_year(year: str) -> int:
+    # Mesma regra do %y do strptime: 00-68 -> 2000-2068, 69-99 -> 1969-1999.
+    if len(year) == 3:
+        raise ValueError(f"Ano com 3 dígitos: {year}")
+    value = int(year)
+    if len(year) == 2:
+        value += 2000 if value < 69 else 1900
+    return value
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_str(date_string: str) -> date | None:
+    match = _DATE_RE.search(date_string)
+    if not match: return None
+    parts = match.groupdict()
+    try:
+        if parts['d1']:
+            return date(_full_year(parts['y1']), int(parts['m1']), int(parts['d1']))
+        if parts['d2']:
+            month = _MONTHS.get(parts['mn'].lower())
+            return date(int(parts['y2']), month, int(parts['d2'])) if month else None
+        return date(int(parts['y3']), int(parts['m3']), int(parts['d3']))
+    except ValueError:
+        return None
+
+
+def parse_flexible_date(date_string) -> date | None:
+    """
+    Extrai a primeira data de um texto livre (respostas da IA, planilhas importadas).
+    Aceita DD/MM/AAAA, DD-MM-AA, DD.MM.AAAA, "12 de março de 2024" e AAAA-MM-DD. Memoizado.
+    """
+    if not date_string or not isinstance(date_string, str) or date_string.lower() == 'n/a': return None
+    return _parse_date_str(date_string)
+
+
+def find_dates(text: str) -> list[tuple[int, date]]:
+    """Todas as datas válidas de um texto, como (posição, data), na ordem em que aparecem."""
+    if not text: return []
+    found = []
+    for match in _DATE_RE.finditer(text):
+        parsed = _parse_date_str(match.group(0))
+        if parsed:
+            found.append((match.start(), parsed))
+    return found
+
+
+def parse_flexible_date_series(date_strings: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de `parse_flexible_date`; retorna datetime64 com NaT onde não há data válida.
+    Colunas reais repetem muito as mesmas datas: cada valor distinto é analisado uma única vez.
+    """
+    codes, uniques = pd.factorize(date_strings.where(date_strings.map(type) == str), use_na_sentinel=True)
+    parts = pd.Series(uniques, dtype=object).str.extract(_DATE_RE)
+    two_digit = parts['y1'].str.len() == 2
+    y1 = pd.to_numeric(parts['y1'], errors='coerce').where(parts['y1'].str.len() != 3)
+    y1 = y1.where(~two_digit, y1 + np.where(y1 < 69, 2000, 1900))
+    months = parts['mn'].str.lower().map(_MONTHS)
+
+    year = y1.fillna(pd.to_numeric(parts['y2'], errors='coerce')).fillna(pd.to_numeric(parts['y3'], errors='coerce'))
+    month = pd.to_numeric(parts['m1'], errors='coerce').fillna(months).fillna(pd.to_numeric(parts['m3'], errors='coerce'))
+    day = pd.to_numeric(parts['d1'], errors='coerce').fillna(pd.to_numeric(parts['d2'], errors='coerce')).fillna(pd.to_numeric(parts['d3'], errors='coerce'))
+    parsed = pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': day}), errors='coerce').to_numpy()
+
+    result = np.full(len(codes), np.datetime64('NaT'), dtype=parsed.dtype if len(parsed) else 'datetime64[ns]')
+    valid = codes >= 0
+    result[valid] = parsed[codes[valid]]
+    return pd.Series(result, index=date_strings.index)
@@ -0,0 +1,203 @@
+import os
+import logging
+from datetime import date, datetime, timedelta
+
+import yaml
+import numpy as np
+import pandas as pd
+import streamlit as st
+from dateutil.relativedelta import relativedelta
+
+from operations.normalization import padronizar_norma, padronizar_norma_series
+
+logger = logging.getLogger('segsisone_app.nr_rules')
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nr_rules.yaml")
+
+# Módulo "genérico" de uma norma: vale quando nenhum módulo específico casa.
+GENERIC_MODULE = '*'
+TRAINING_TYPES = ('formação', 'reciclagem')
+RULE_COLUMNS = ['norma', 'modulo', 'tipo_treinamento', 'horas_minimas', 'validade_anos']
+
+
+class NRRules:
+    """
+    Tabela de regras compilada a partir do nr_rules.yaml.
+    `table` tem uma linha por (norma, módulo, tipo) com carga horária mínima e validade;
+    as consultas escalares usam um dicionário com a mesma chave e as versões em lote
+    (`annotate_trainings`, `expiry_dates`) fazem junções com a tabela.
+    """
+
+    def __init__(self, config: dict):
+        self.version = config.get('versao')
+        self._module_terms = {}
+        rows = []
+        for norma, spec in (config.get('treinamentos') or {}).items():
+            spec = spec or {}
+            base_hours = spec.get('horas') or {}
+            base_years = spec.get('validade_anos')
+            modules = [(GENERIC_MODULE, base_hours, base_years)]
+            self._module_terms[norma] = []
+            for module_spec in spec.get('modulos') or []:
+                module = module_spec['modulo']
+                terms = tuple(t.lower() for t in module_spec.get('termos') or [module])
+                self._module_terms[norma].append((module, terms))
+                modules.append((module, {**base_hours, **(module_spec.get('horas') or {})}, module_spec.get('validade_anos', base_years)))
+            for module, hours, years in modules:
+                for training_type in TRAINING_TYPES:
+                    rows.append((norma, module, training_type, hours.get(training_type), years))
+
+        self.table = pd.DataFrame(rows, columns=RULE_COLUMNS)
+        self._index = {
+            (norma, module, training_type): (hours, years)
+            for norma, module, training_type, hours, years in rows
+        }
+        self._module_cache = {}
+        self.aso_validity_months = dict(config.get('asos_validade_meses') or {})
+        doc_days = dict(config.get('documentos_empresa_validade_dias') or {})
+        self.default_doc_days = doc_days.pop('padrao', None)
+        self.company_doc_validity_days = doc_days
+
+    @property
+    def normas(self) -> list:
+        return sorted(self._module_terms)
+
+    def modules_for(self, norma: str) -> list:
+        return [module for module, _ in self._module_terms.get(padronizar_norma(norma), [])]
+
+    def module_terms(self, norma: str) -> list:
+        """[(módulo, termos de busca)] da norma, na ordem de prioridade do YAML."""
+        return list(self._module_terms.get(padronizar_norma(norma), []))
+
+    def summary_table(self) -> pd.DataFrame:
+        """Uma linha por (norma, módulo) com as cargas horárias mínimas e a periodicidade."""
+        hours = self.table.pivot(index=['norma', 'modulo'], columns='tipo_treinamento', values='horas_minimas')
+        years = self.table.drop_duplicates(subset=['norma', 'modulo']).set_index(['norma', 'modulo'])['validade_anos']
+        summary = hours.join(years).reset_index()
+        summary.columns.name = None
+        # Linhas genéricas sem nenhuma regra (normas só com regras por módulo) não informam nada.
+        return summary.dropna(subset=list(TRAINING_TYPES) + ['validade_anos'], how='all').reset_index(drop=True)
+
+    # --- Consultas escalares ---
+
+    def canonical_module(self, norma_padronizada: str, modulo) -> str:
+        """Módulo da tabela que corresponde ao módulo informado (ou o genérico '*')."""
+        key = (norma_padronizada, str(modulo or '').strip().lower())
+        if key not in self._module_cache:
+            module = GENERIC_MODULE
+            for candidate, terms in self._module_terms.get(norma_padronizada, []):
+                if any(term in key[1] for term in terms):
+                    module = candidate
+                    break
+            self._module_cache[key] = module
+        return self._module_cache[key]
+
+    def rule_for(self, norma, modulo=None, tipo_treinamento='formação') -> tuple:
+        """(horas mínimas, validade em anos) da combinação; None onde a regra não existe."""
+        norma_padronizada = padronizar_norma(norma)
+        module = self.canonical_module(norma_padronizada, modulo)
+        tipo = str(tipo_treinamento or '').lower()
+        hours, years = self._index.get((norma_padronizada, module, tipo), (None, None))
+        if years is None:
+            # A validade não depende do tipo do treinamento.
+            _, years = self._index.get((norma_padronizada, module, TRAINING_TYPES[0]), (None, None))
+        return hours, years
+
+    def training_expiry(self, data, norma, modulo=None) -> date | None:
+        if not isinstance(data, (date, datetime)): return None
+        _, years = self.rule_for(norma, modulo)
+        return data + relativedelta(years=int(years)) if years is not None else None
+
+    def check_hours(self, norma, modulo, tipo_treinamento, carga_horaria) -> tuple[bool, str]:
+        norma_padronizada = padronizar_norma(norma)
+        tipo = str(tipo_treinamento or '').lower()
+        hours, _ = self.rule_for(norma_padronizada, modulo, tipo)
+        if hours is None:
+            return True, "Carga horária conforme."
+        try:
+            carga = float(carga_horaria or 0)
+        except (TypeError, ValueError):
+            carga = 0
+        if carga < hours:
+            module = self.canonical_module(norma_padronizada, modulo)
+            label = norma_padronizada if module == GENERIC_MODULE else f"{module} ({norma_padronizada})"
+            return False, f"Carga horária para {tipo} de {label} deve ser de no mínimo {int(hours)}h, mas foi de {carga_horaria}h."
+        return True, "Carga horária conforme."
+
+    def infer_module_by_hours(self, norma, tipo_treinamento, carga_horaria) -> str | None:
+        """Módulo cuja carga horária do tipo é exatamente a informada (ex.: NR-20 sem módulo legível)."""
+        norma_padronizada = padronizar_norma(norma)
+        tipo = str(tipo_treinamento or '').lower()
+        for module, _ in self._module_terms.get(norma_padronizada, []):
+            hours, _ = self._index.get((norma_padronizada, module, tipo), (None, None))
+            if hours is not None and hours == carga_horaria:
+                return module
+        return None
+
+    def aso_expiry(self, data_aso, tipo_aso) -> date | None:
+        months = self.aso_validity_months.get(str(tipo_aso))
+        return data_aso + relativedelta(months=int(months)) if months and data_aso else None
+
+    def company_doc_expiry(self, data_emissao, tipo_documento) -> date | None:
+        days = self.company_doc_validity_days.get(str(tipo_documento), self.default_doc_days)
+        return data_emissao + timedelta(days=int(days)) if days and data_emissao else None
+
+    # --- Versões em lote ---
+
+    def annotate_trainings(self, df: pd.DataFrame, norma_col: str = 'norma', modulo_col: str = 'modulo',
+                           tipo_col: str = 'tipo_treinamento') -> pd.DataFrame:
+        """
+        Junta a cada treinamento a regra aplicável: colunas `norma_padronizada`, `modulo_regra`,
+        `horas_minimas` e `validade_anos`. O módulo canônico é resolvido uma vez por par distinto.
+        """
+        result = df.copy()
+        normas = padronizar_norma_series(result[norma_col]) if norma_col in result.columns else pd.Series('N/A', index=result.index)
+        modulos = result[modulo_col] if modulo_col in result.columns else pd.Series('', index=result.index)
+        tipos = result[tipo_col].fillna('').astype(str).str.lower() if tipo_col in result.columns else pd.Series('', index=result.index)
+
+        pairs = pd.DataFrame({'norma': normas, 'modulo_informado': modulos.fillna('').astype(str)})
+        unique_pairs = pairs.drop_duplicates()
+        unique_pairs['modulo'] = [self.canonical_module(n, m) for n, m in zip(unique_pairs['norma'], unique_pairs['modulo_informado'])]
+        keys = pairs.merge(unique_pairs, on=['norma', 'modulo_informado'], how='left')
+
+        hours = keys.assign(tipo_treinamento=tipos.to_numpy()).merge(
+            self.table[['norma', 'modulo', 'tipo_treinamento', 'horas_minimas']],
+            on=['norma', 'modulo', 'tipo_treinamento'], how='left'
+        )
+        validity = self.table.drop_duplicates(subset=['norma', 'modulo'])[['norma', 'modulo', 'validade_anos']]
+        years = keys.merge(validity, on=['norma', 'modulo'], how='left')
+
+        result['norma_padronizada'] = normas.to_numpy()
+        result['modulo_regra'] = keys['modulo'].to_numpy()
+        result['horas_minimas'] = pd.to_numeric(hours['horas_minimas'], errors='coerce').to_numpy()
+        result['validade_anos'] = pd.to_numeric(years['validade_anos'], errors='coerce').to_numpy()
+        return result
+
+    @staticmethod
+    def expiry_dates(dates: pd.Series, validity_years: pd.Series) -> pd.Series:
+        """Data + validade (anos) para colunas inteiras; um deslocamento por valor distinto de validade."""
+        dates = pd.to_datetime(dates, errors='coerce')
+        expiry = pd.Series(pd.NaT, index=dates.index, dtype=dates.dtype)
+        for years in validity_years.dropna().unique():
+            mask = validity_years == years
+            expiry[mask] = dates[mask] + pd.DateOffset(years=int(years))
+        return expiry
+
+    def hours_below_minimum(self, annotated: pd.DataFrame, carga_col: str = 'carga_horaria') -> pd.Series:
+        """True onde a carga horária é menor que o mínimo da regra (após `annotate_trainings`)."""
+        carga = pd.to_numeric(annotated[carga_col], errors='coerce').fillna(0) if carga_col in annotated.columns \
+            else pd.Series(0, index=annotated.index)
+        return pd.Series(np.where(annotated['horas_minimas'].notna(), carga < annotated['horas_minimas'], False), index=annotated.index)
+
+
+@st.cache_resource
+def _load_nr_rules(path: str, mtime: float) -> NRRules:
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = NRRules(yaml.safe_load(f) or {})
+    logger.info(f"Regras de NR carregadas (versão {rules.version}): {len(rules.table)} combinações.")
+    return rules
+
+
+def get_nr_rules(path: str = RULES_PATH) -> NRRules:
+    """Regras compiladas; o arquivo é recarregado automaticamente quando é alterado."""
+    return _load_nr_rules(path, os.path.getmtime(path))
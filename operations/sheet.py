@@ -5,6 +5,7 @@ import random
 from gdrive.google_api_manager import GoogleApiManager
 from gspread.exceptions import WorksheetNotFound
 import gspread
+from operations.data_versions import bump_data_version
 
 # Configuração do logger para este módulo
 logger = logging.getLogger('segsisone_app.sheet_operations')
@@ -16,6 +17,7 @@ class SheetOperations:
         Args:
             spreadsheet_id (str): O ID da planilha do tenant.
         """
+        self.spreadsheet_id = spreadsheet_id
         if not spreadsheet_id:
             st.error("ID da Planilha não fornecido. A aplicação não pode funcionar.")
             logger.error("SheetOperations foi inicializado sem um spreadsheet_id.")
@@ -29,6 +31,11 @@ class SheetOperations:
             st.error(f"Erro: Não foi possível abrir ou encontrar a planilha. Verifique o ID na Planilha Matriz e as permissões.")
             logger.error(f"Falha ao abrir a planilha com ID: {spreadsheet_id}")
 
+    def _mark_data_changed(self):
+        """Limpa o cache de dados e sinaliza aos objetos em memória que a planilha mudou."""
+        st.cache_data.clear()
+        bump_data_version(self.spreadsheet_id)
+
     def _get_worksheet(self, aba_name: str) -> gspread.Worksheet | None:
         """Helper interno para obter um objeto de worksheet de forma segura."""
         if not self.spreadsheet:
@@ -91,7 +98,7 @@ class SheetOperations:
             full_row_to_add = [new_id] + new_data
             worksheet.append_row(full_row_to_add, value_input_option='USER_ENTERED')
             
-            st.cache_data.clear()
+            self._mark_data_changed()
             
             logger.info(f"Dados adicionados com sucesso na aba '{aba_name}'. ID gerado: {new_id}")
             return new_id
@@ -119,13 +126,48 @@ class SheetOperations:
                     cell_updates.append(gspread.Cell(row_number_to_update, col_index, str(new_value)))
             if cell_updates:
                 worksheet.update_cells(cell_updates, value_input_option='USER_ENTERED')
-                st.cache_data.clear()
+                self._mark_data_changed()
             logger.info(f"Linha com ID {row_id} na aba '{aba_name}' atualizada com sucesso.")
             return True
         except Exception as e:
             logger.error(f"Erro ao atualizar linha na aba '{aba_name}': {e}", exc_info=True)
             return False
 
+    def update_rows_by_id(self, aba_name: str, updates: dict) -> int:
+        """
+        Atualiza várias linhas de uma vez: `updates` mapeia ID -> {coluna: novo valor}.
+        Lê o cabeçalho e a coluna de IDs uma única vez e envia todas as células em uma
+        só chamada `update_cells`. Retorna a quantidade de linhas atualizadas.
+        """
+        worksheet = self._get_worksheet(aba_name)
+        if not worksheet or not updates: return 0
+        try:
+            header = worksheet.row_values(1)
+            col_indices = {col_name: i + 1 for i, col_name in enumerate(header)}
+            row_numbers = {row_id: i + 1 for i, row_id in enumerate(worksheet.col_values(1))}
+            cell_updates = []
+            updated_rows = 0
+            for row_id, new_values_dict in updates.items():
+                row_number = row_numbers.get(str(row_id))
+                if row_number is None or row_number == 1:
+                    logger.warning(f"ID {row_id} não encontrado na aba '{aba_name}'. Linha ignorada.")
+                    continue
+                cells = [
+                    gspread.Cell(row_number, col_indices[col_name], str(new_value))
+                    for col_name, new_value in new_values_dict.items() if col_name in col_indices
+                ]
+                if cells:
+                    cell_updates.extend(cells)
+                    updated_rows += 1
+            if cell_updates:
+                worksheet.update_cells(cell_updates, value_input_option='USER_ENTERED')
+                self._mark_data_changed()
+            logger.info(f"{updated_rows} linhas da aba '{aba_name}' atualizadas em lote ({len(cell_updates)} células).")
+            return updated_rows
+        except Exception as e:
+            logger.error(f"Erro ao atualizar linhas em lote na aba '{aba_name}': {e}", exc_info=True)
+            return 0
+
     def excluir_dados_aba(self, aba_name: str, row_id: str) -> bool:
         worksheet = self._get_worksheet(aba_name)
         if not worksheet: return False
@@ -136,14 +178,18 @@ class SheetOperations:
                 return False
             row_number_to_delete = id_column_data.index(str(row_id)) + 1
             worksheet.delete_rows(row_number_to_delete)
-            st.cache_data.clear()
+            self._mark_data_changed()
             logger.info(f"Linha com ID {row_id} da aba '{aba_name}' excluída com sucesso.")
             return True
         except Exception as e:
             logger.error(f"Erro ao excluir dados da aba '{aba_name}': {e}", exc_info=True)
             return False
             
-    def adc_dados_aba_em_lote(self, aba_name: str, new_data_list: list):
+    def adc_dados_aba_em_lote(self, aba_name: str, new_data_list: list) -> list | None:
+        """
+        Adiciona várias linhas com uma única chamada `append_rows`.
+        Retorna a lista de IDs gerados, na mesma ordem de `new_data_list`.
+        """
         worksheet = self._get_worksheet(aba_name)
         if not worksheet: return None
         if not new_data_list: return []
@@ -151,25 +197,28 @@ class SheetOperations:
         try:
             logger.info(f"Tentando adicionar {len(new_data_list)} linhas em lote na aba '{aba_name}'...")
             rows_to_append = []
-            existing_ids = worksheet.col_values(1)[1:]
+            new_ids = []
+            existing_ids = set(worksheet.col_values(1)[1:])
             
             for row_data in new_data_list:
                 while True:
                     new_id = random.randint(10000, 99999)
                     if str(new_id) not in existing_ids:
-                        existing_ids.append(str(new_id))
+                        existing_ids.add(str(new_id))
                         break
                 rows_to_append.append([new_id] + row_data)
+                new_ids.append(new_id)
             
             worksheet.append_rows(rows_to_append, value_input_option='USER_ENTERED')
+            bump_data_version(self.spreadsheet_id)
             
             logger.info(f"{len(rows_to_append)} linhas adicionadas com sucesso.")
-            return True
+            return new_ids
     
         except Exception as e:
             logger.error(f"Erro ao adicionar dados em lote na aba '{aba_name}': {e}", exc_info=True)
             st.error(f"Erro ao adicionar dados em lote: {e}")
-            return False
+            return None
             
     def adc_dados_aba_sem_id(self, aba_name: str, new_data: list) -> bool:
         """
@@ -211,7 +260,7 @@ class SheetOperations:
         if not worksheet: return False
         try:
             worksheet.delete_rows(row_index)
-            st.cache_data.clear() # Limpa o cache de dados do Streamlit
+            self._mark_data_changed() # Limpa o cache de dados do Streamlit
             logger.info(f"Linha {row_index} da aba '{aba_name}' excluída com sucesso.")
             return True
         except Exception as e:
@@ -20,10 +20,16 @@ class MatrixManager:
         self.sheet_ops = SheetOperations(spreadsheet_id)
         self.columns_functions = ['id', 'nome_funcao', 'descricao']
         self.columns_matrix = ['id', 'id_funcao', 'norma_obrigatoria']
-        self._initialize_sheets()
         self._functions_df = None
         self._matrix_df = None
-        self.pdf_analyzer = PDFQA()
+        self._pdf_analyzer = None
+
+    @property
+    def pdf_analyzer(self):
+        """Cria o analisador de PDF apenas quando uma análise com IA é solicitada."""
+        if self._pdf_analyzer is None:
+            self._pdf_analyzer = PDFQA(unit_id=self.sheet_ops.spreadsheet_id)
+        return self._pdf_analyzer
 
     @property
     def functions_df(self):
@@ -39,39 +45,18 @@ class MatrixManager:
             self._load_matrix_data()
         return self._matrix_df
 
-    def _initialize_sheets(self):
-        """
-        Verifica se as abas 'funcoes' e 'matriz_treinamentos' existem na planilha da unidade.
-        Nota: A criação das abas deve ser feita durante o provisionamento da unidade.
-        """
-        funcoes_sheet_name = "funcoes"
-        matrix_sheet_name = "matriz_treinamentos"
-        
-        # Verifica se as abas existem carregando os dados
-        funcoes_data = self.sheet_ops.carregar_dados_aba(funcoes_sheet_name)
-        matrix_data = self.sheet_ops.carregar_dados_aba(matrix_sheet_name)
-        
-        # Loga avisos se as abas não forem encontradas
-        if not funcoes_data:
-            logger.warning(
-                f"Aba '{funcoes_sheet_name}' não foi encontrada ou está vazia. "
-                f"Certifique-se de que o template da unidade foi criado corretamente."
-            )
-        
-        if not matrix_data:
-            logger.warning(
-                f"Aba '{matrix_sheet_name}' não foi encontrada ou está vazia. "
-                f"Certifique-se de que o template da unidade foi criado corretamente."
-            )
-
     def _load_functions_data(self):
         """Carrega os dados da aba 'funcoes' da planilha da unidade."""
         functions_data = self.sheet_ops.carregar_dados_aba("funcoes")
+        if not functions_data:
+            logger.warning("Aba 'funcoes' não foi encontrada ou está vazia. Certifique-se de que o template da unidade foi criado corretamente.")
         self._functions_df = pd.DataFrame(functions_data[1:], columns=functions_data[0]) if functions_data and len(functions_data) > 1 else pd.DataFrame(columns=self.columns_functions)
         
     def _load_matrix_data(self):
         """Carrega os dados da aba 'matriz_treinamentos' da planilha da unidade."""
         matrix_data = self.sheet_ops.carregar_dados_aba("matriz_treinamentos")
+        if not matrix_data:
+            logger.warning("Aba 'matriz_treinamentos' não foi encontrada ou está vazia. Certifique-se de que o template da unidade foi criado corretamente.")
         self._matrix_df = pd.DataFrame(matrix_data[1:], columns=matrix_data[0]) if matrix_data and len(matrix_data) > 1 else pd.DataFrame(columns=self.columns_matrix)
 
     def add_function(self, name, description):
@@ -0,0 +1,135 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from operations.sheet import SheetOperations
+from operations.nr_rules import get_nr_rules
+
+logger = logging.getLogger('segsisone_app.training_revalidation')
+
+# Máximo de unidades revalidadas em paralelo (cada uma abre seu próprio cliente da API).
+MAX_WORKERS = 4
+
+# Tipos de problema: coluna booleana da tabela de achados -> descrição exibida.
+ISSUE_LABELS = {
+    'data_invalida': 'Data de realização ausente ou inválida',
+    'carga_insuficiente': 'Carga horária abaixo do mínimo',
+    'vencimento_divergente': 'Vencimento diferente do calculado pelas regras',
+    'sem_regra': 'Norma/módulo sem regra de validade',
+}
+
+FINDING_COLUMNS = [
+    'id', 'funcionario_id', 'norma', 'modulo', 'tipo_treinamento', 'carga_horaria', 'horas_minimas',
+    'data', 'vencimento', 'vencimento_regra', *ISSUE_LABELS, 'problemas', 'versao_regras',
+]
+
+
+def _parse_sheet_dates(values: pd.Series) -> pd.Series:
+    """DD/MM/AAAA -> datetime64, convertendo cada valor distinto uma única vez."""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format='%d/%m/%Y', errors='coerce')
+    return pd.Series(pd.DatetimeIndex(parsed).take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index)
+
+
+def revalidate_trainings(trainings_df: pd.DataFrame, rules=None) -> pd.DataFrame:
+    """
+    Avalia todos os treinamentos de uma vez contra as regras de NR vigentes.
+    Retorna apenas as linhas com algum problema, com uma coluna booleana por tipo de
+    problema, o vencimento esperado (`vencimento_regra`) e a versão das regras usada.
+    As colunas `data` e `vencimento` podem vir como texto (DD/MM/AAAA) ou datetime.
+    """
+    rules = rules or get_nr_rules()
+    if trainings_df.empty:
+        return pd.DataFrame(columns=FINDING_COLUMNS)
+
+    df = trainings_df.copy()
+    for col in ['data', 'vencimento']:
+        values = df[col] if col in df.columns else pd.Series(pd.NaT, index=df.index)
+        df[col] = values if pd.api.types.is_datetime64_any_dtype(values) else _parse_sheet_dates(values)
+
+    annotated = rules.annotate_trainings(df)
+    annotated['vencimento_regra'] = rules.expiry_dates(annotated['data'], annotated['validade_anos'])
+
+    has_date = annotated['data'].notna()
+    flags = pd.DataFrame({
+        'data_invalida': ~has_date,
+        'carga_insuficiente': rules.hours_below_minimum(annotated),
+        'vencimento_divergente': annotated['vencimento_regra'].notna() & (annotated['vencimento'] != annotated['vencimento_regra']),
+        'sem_regra': has_date & annotated['validade_anos'].isna(),
+    }, index=annotated.index)
+
+    flagged = flags.any(axis=1)
+    findings = annotated.loc[flagged].join(flags.loc[flagged])
+    findings['problemas'] = flags.loc[flagged].dot(pd.Index([f"{label}; " for label in ISSUE_LABELS.values()])).str.rstrip('; ')
+    findings['versao_regras'] = rules.version
+
+    for col in FINDING_COLUMNS:
+        if col not in findings.columns:
+            findings[col] = None
+    return findings[FINDING_COLUMNS].reset_index(drop=True)
+
+
+class TrainingRevalidator:
+    """Revalida os treinamentos gravados na planilha de uma unidade e corrige vencimentos em lote."""
+
+    def __init__(self, spreadsheet_id: str):
+        self.sheet_ops = SheetOperations(spreadsheet_id)
+        self.spreadsheet_id = spreadsheet_id
+
+    def find_issues(self, rules=None) -> pd.DataFrame:
+        return revalidate_trainings(self.sheet_ops.get_df_from_worksheet("treinamentos"), rules)
+
+    def apply_expiry_fixes(self, findings: pd.DataFrame) -> int:
+        """Grava `vencimento_regra` nas linhas com vencimento divergente, em uma única escrita."""
+        to_fix = findings[findings['vencimento_divergente'].astype(bool)]
+        updates = {
+            str(row_id): {'vencimento': expected.strftime('%d/%m/%Y')}
+            for row_id, expected in zip(to_fix['id'].tolist(), to_fix['vencimento_regra'].tolist())
+        }
+        return self.sheet_ops.update_rows_by_id("treinamentos", updates)
+
+
+def _revalidate_unit(unit: dict, rules, apply_fixes: bool) -> tuple[pd.DataFrame, dict]:
+    unit_name = unit.get('nome_unidade')
+    revalidator = TrainingRevalidator(unit['spreadsheet_id'])
+    findings = revalidator.find_issues(rules)
+    corrected = revalidator.apply_expiry_fixes(findings) if apply_fixes and not findings.empty else 0
+    findings.insert(0, 'unidade', unit_name)
+    summary = {
+        'unidade': unit_name,
+        'status': '✅ Concluído',
+        'achados': len(findings),
+        **{col: int(findings[col].astype(bool).sum()) for col in ISSUE_LABELS},
+        'vencimentos_corrigidos': corrected,
+    }
+    return findings, summary
+
+
+def run_revalidation(units: list, apply_fixes: bool = False, max_workers: int = MAX_WORKERS) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Revalida os treinamentos de uma ou várias unidades em paralelo, todas com a mesma
+    versão das regras. Retorna (achados de todas as unidades, resumo por unidade).
+    Uma falha em uma unidade é registrada no resumo e não interrompe as demais.
+    """
+    rules = get_nr_rules()
+    units = [u for u in units if u.get('spreadsheet_id')]
+    all_findings, summaries = [], []
+    if not units:
+        return pd.DataFrame(columns=['unidade'] + FINDING_COLUMNS), pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(units))) as executor:
+        futures = {executor.submit(_revalidate_unit, unit, rules, apply_fixes): unit.get('nome_unidade') for unit in units}
+        for future in as_completed(futures):
+            unit_name = futures[future]
+            try:
+                findings, summary = future.result()
+                all_findings.append(findings)
+                summaries.append(summary)
+            except Exception as e:
+                logger.error(f"Erro ao revalidar treinamentos da unidade '{unit_name}': {e}", exc_info=True)
+                summaries.append({'unidade': unit_name, 'status': f"❌ Erro: {e}"})
+
+    logger.info(f"Revalidação (regras v{rules.version}) concluída em {len(units)} unidades.")
+    findings_df = pd.concat(all_findings, ignore_index=True) if all_findings else pd.DataFrame(columns=['unidade'] + FINDING_COLUMNS)
+    return findings_df, pd.DataFrame(summaries).sort_values('unidade', ignore_index=True)
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from operations.normalization import add_training_normalization_columns
+
+# Chave que identifica um treinamento "vigente": o mais recente de cada combinação.
+CURRENT_TRAINING_KEY = ['funcionario_id', 'norma_normalizada', 'modulo_final']
+
+
+def build_current_trainings(trainings_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabela com o treinamento vigente por (funcionário, norma, módulo): o de data mais
+    recente. Uma reciclagem de 2024 oculta uma formação de 2020 da mesma norma/módulo.
+    Feita com uma única ordenação + drop_duplicates para a unidade inteira; é a fonte
+    comum do dashboard, das métricas e do notificador de vencimentos.
+    """
+    if trainings_df.empty or 'funcionario_id' not in trainings_df.columns:
+        return pd.DataFrame(columns=list(trainings_df.columns) + [c for c in CURRENT_TRAINING_KEY if c not in trainings_df.columns])
+
+    current = trainings_df
+    if 'modulo_final' not in current.columns:
+        current = add_training_normalization_columns(current.copy())
+
+    current = current.dropna(subset=['data'])
+    current = current.sort_values('data', ascending=False, kind='mergesort')
+    current = current.drop_duplicates(subset=CURRENT_TRAINING_KEY, keep='first')
+    return current.reset_index(drop=True)
+
+
+def build_latest_asos(asos_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tabela com o ASO mais recente por (funcionário, tipo_aso), mais a coluna
+    `is_current_aptitude`, que marca o ASO de aptidão vigente de cada funcionário
+    (o mais recente que não seja demissional).
+    """
+    columns = list(asos_df.columns) + ['is_current_aptitude']
+    if asos_df.empty or 'funcionario_id' not in asos_df.columns or 'data_aso' not in asos_df.columns:
+        return pd.DataFrame(columns=columns)
+
+    latest = asos_df.dropna(subset=['data_aso']).copy()
+    if 'tipo_aso' not in latest.columns:
+        latest['tipo_aso'] = 'N/A'
+    latest['tipo_aso'] = latest['tipo_aso'].fillna('N/A')
+    latest = latest.sort_values('data_aso', ascending=False, kind='mergesort')
+    latest = latest.drop_duplicates(subset=['funcionario_id', 'tipo_aso'], keep='first')
+
+    is_aptitude = latest['tipo_aso'].astype(str).str.lower() != 'demissional'
+    first_aptitude = ~latest.loc[is_aptitude, 'funcionario_id'].duplicated()
+    latest['is_current_aptitude'] = False
+    latest.loc[first_aptitude[first_aptitude].index, 'is_current_aptitude'] = True
+    return latest.reset_index(drop=True)
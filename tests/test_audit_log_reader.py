@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from operations.audit_log_reader import AuditLogReader, parse_log_timestamp
+
+
+def test_locale_formatted_timestamps_are_parsed():
+    assert parse_log_timestamp('2024-03-12 10:00:00') == datetime(2024, 3, 12, 10, 0)
+    assert parse_log_timestamp('12/03/2024 10:00:00') == datetime(2024, 3, 12, 10, 0)
+    assert parse_log_timestamp('') is None
+
+
+def test_to_dataframe_keeps_mixed_formats_sorted():
+    rows = [
+        ['12/03/2024 10:00:00', 'a@x', 'admin', 'old', '', ''],
+        ['2024-03-13 09:00:00', 'b@x', 'admin', 'new', '', ''],
+    ]
+    df = AuditLogReader(cache_dir='/nonexistent')._to_dataframe(rows)
+    assert df['timestamp'].notna().all()
+    assert list(df['action']) == ['new', 'old']
+    assert AuditLogReader._oldest_timestamp(type('Tab', (), {'rows': rows})()) == datetime(2024, 3, 12, 10, 0)
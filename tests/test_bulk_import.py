@@ -0,0 +1,42 @@
+import pandas as pd
+
+from operations.bulk_import import IMPORT_COLUMNS, BulkImporter, _format_cnpj
+
+
+def _cnpj_with_leading_zero() -> str:
+    numbers = [0, 1, 2, 3, 4, 5, 6, 7, 0, 0, 0, 1]
+    for size in (12, 13):
+        weights = list(range(size - 7, 1, -1)) + list(range(9, 1, -1))
+        remainder = sum(n * w for n, w in zip(numbers, weights)) % 11
+        numbers.append(0 if remainder < 2 else 11 - remainder)
+    return ''.join(map(str, numbers))
+
+
+class _Manager:
+    sheet_ops = None
+
+    def __init__(self, companies_df: pd.DataFrame):
+        self.companies_df = companies_df
+        self.employees_df = pd.DataFrame()
+
+
+def _plan(rows: list, companies_df: pd.DataFrame) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=IMPORT_COLUMNS)
+    df.index = pd.RangeIndex(2, len(df) + 2, name='linha')
+    return BulkImporter(_Manager(companies_df)).validate(df)
+
+
+def test_cnpj_without_leading_zero_matches_existing_company():
+    cnpj = _cnpj_with_leading_zero()
+    companies = pd.DataFrame({'id': ['10'], 'cnpj': [int(cnpj)], 'status': ['Ativo']})
+    plan = _plan([['', _format_cnpj(cnpj), 'Ana', 'Técnica', '01/02/2024']], companies)
+    assert plan.loc[2, 'empresa_id'] == '10'
+    assert plan.loc[2, 'erros'] == []
+    assert _format_cnpj(plan.loc[2, 'cnpj_digitos']).startswith('0')
+
+
+def test_admission_date_with_three_digit_year_is_rejected():
+    cnpj = _cnpj_with_leading_zero()
+    companies = pd.DataFrame({'id': ['10'], 'cnpj': [cnpj], 'status': ['Ativo']})
+    plan = _plan([['', cnpj[1:], 'Ana', 'Técnica', '01/02/202']], companies)
+    assert plan.loc[2, 'erros'] == ["Data de admissão ausente ou inválida"]
@@ -0,0 +1,17 @@
+from AI.extraction_cache import ExtractionCache
+
+
+def test_malformed_json_answer_is_not_cached(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / 'cache.sqlite3'))
+    cache.put('k1', 'model', 'resposta {sem json', require_json=True)
+    assert cache.get_entry('k1') is None
+
+    cache.put('k2', 'model', '```json\n{"a": 1}\n```', require_json=True)
+    assert cache.get_entry('k2', require_json=True) == ('```json\n{"a": 1}\n```', {'a': 1})
+
+
+def test_plain_text_answer_is_a_miss_when_json_is_required(tmp_path):
+    cache = ExtractionCache(path=str(tmp_path / 'cache.sqlite3'))
+    cache.put('k', 'model', 'linha 1\nlinha 2')
+    assert cache.get_entry('k') == ('linha 1\nlinha 2', None)
+    assert cache.get_entry('k', require_json=True) is None
@@ -0,0 +1,19 @@
+from datetime import date
+
+import pandas as pd
+
+from operations.normalization import parse_flexible_date, parse_flexible_date_series
+
+
+def test_three_digit_year_is_rejected():
+    assert parse_flexible_date('12/03/202') is None
+    assert parse_flexible_date_series(pd.Series(['12/03/202'])).isna().all()
+
+
+def test_scalar_and_series_parsers_agree():
+    values = ['12/03/2024', '12-03-24', '12 de março de 2024', '2024-03-12', '12/03/202', 'n/a']
+    series = parse_flexible_date_series(pd.Series(values))
+    for value, parsed in zip(values, series):
+        expected = parse_flexible_date(value)
+        assert (pd.isna(parsed) and expected is None) or parsed.date() == expected
+    assert parse_flexible_date('12/03/2024') == date(2024, 3, 12)
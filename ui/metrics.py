@@ -1,11 +1,9 @@
 import streamlit as st
-import pandas as pd
-from datetime import date
 from operations.employee import EmployeeManager
+from operations.compliance import get_unit_compliance
 
 
-def calculate_overall_metrics(employee_manager: EmployeeManager) -> dict:
-    today = date.today()
+def calculate_overall_metrics(employee_manager: EmployeeManager, docs_manager=None, matrix_manager=None) -> dict:
     metrics = {
         'total_companies': 0,
         'companies_with_pendencies': 0,
@@ -18,49 +16,12 @@ def calculate_overall_metrics(employee_manager: EmployeeManager) -> dict:
         return metrics
 
     metrics['total_companies'] = len(companies_df)
-    pendencies_by_company = {}
-    
-    # Garante que a variável sempre exista, mesmo que vazia.
-    if not employee_manager.employees_df.empty:
-        employee_to_company = employee_manager.employees_df.set_index('id')['empresa_id']
-    else:
-        employee_to_company = pd.Series(dtype=str) # Cria uma Series vazia, mas definida
-
-    # Processar ASOs Vencidos
-    if not employee_manager.aso_df.empty:
-        asos = employee_manager.aso_df.copy()
-        # Garante que a coluna de data exista antes de usar
-        if 'vencimento' in asos.columns:
-            asos['vencimento_dt'] = pd.to_datetime(asos['vencimento'], errors='coerce').dt.date
-            latest_asos = asos[~asos['tipo_aso'].str.lower().isin(['demissional'])].dropna(subset=['vencimento_dt'])
-            if not latest_asos.empty:
-                latest_asos = latest_asos.sort_values('data_aso', ascending=False).groupby('funcionario_id').head(1)
-                expired_asos = latest_asos[latest_asos['vencimento_dt'] < today].copy()
-                
-                # Adiciona a verificação de segurança
-                if not expired_asos.empty and not employee_to_company.empty:
-                    expired_asos['empresa_id'] = expired_asos['funcionario_id'].map(employee_to_company)
-                    aso_pendencies = expired_asos.groupby('empresa_id').size()
-                    for company_id, count in aso_pendencies.items():
-                        pendencies_by_company[company_id] = pendencies_by_company.get(company_id, 0) + count
 
-    # Processar Treinamentos Vencidos
-    if not employee_manager.training_df.empty:
-        trainings = employee_manager.training_df.copy()
-        # Garante que a coluna de data exista antes de usar
-        if 'vencimento' in trainings.columns:
-            trainings['vencimento_dt'] = pd.to_datetime(trainings['vencimento'], errors='coerce').dt.date
-            latest_trainings = trainings.dropna(subset=['vencimento_dt'])
-            if not latest_trainings.empty:
-                latest_trainings = latest_trainings.sort_values('data', ascending=False).groupby(['funcionario_id', 'norma']).head(1)
-                expired_trainings = latest_trainings[latest_trainings['vencimento_dt'] < today].copy()
-                
-                # Adiciona a verificação de segurança
-                if not expired_trainings.empty and not employee_to_company.empty:
-                    expired_trainings['empresa_id'] = expired_trainings['funcionario_id'].map(employee_to_company)
-                    training_pendencies = expired_trainings.groupby('empresa_id').size()
-                    for company_id, count in training_pendencies.items():
-                        pendencies_by_company[company_id] = pendencies_by_company.get(company_id, 0) + count
+    # ASOs e treinamentos vencidos por empresa, do motor de conformidade da unidade.
+    # Os mesmos managers do dashboard: o cache de conformidade (um resultado por unidade) é compartilhado.
+    companies_status = get_unit_compliance(employee_manager, docs_manager, matrix_manager)['companies']
+    pending = companies_status['asos_vencidos'] + companies_status['treinamentos_vencidos']
+    pendencies_by_company = pending[pending > 0].to_dict()
 
     if pendencies_by_company:
         metrics['companies_with_pendencies'] = len(pendencies_by_company)
@@ -71,12 +32,12 @@ def calculate_overall_metrics(employee_manager: EmployeeManager) -> dict:
 
     return metrics
 
-def display_minimalist_metrics(employee_manager: EmployeeManager):
+def display_minimalist_metrics(employee_manager: EmployeeManager, docs_manager=None, matrix_manager=None):
     """
     Calcula e exibe as métricas de pendências em um formato visualmente
     aprimorado, com ícones, cores e informações mais claras.
     """
-    metrics = calculate_overall_metrics(employee_manager)
+    metrics = calculate_overall_metrics(employee_manager, docs_manager, matrix_manager)
     
     st.markdown("---")
     
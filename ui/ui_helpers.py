@@ -1,36 +1,35 @@
+import os
+import threading
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor, wait
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from operations.file_hash import calcular_hash_arquivo
+from operations.manager_pool import get_unit_manager
+from operations.nr_rules import get_nr_rules
+from operations.normalization import padronizar_norma
+from analysis.nr_analyzer import use_combined_mode
 
 def mostrar_info_normas():
     with st.expander("Informações sobre Normas Regulamentadoras"):
-        st.markdown("""
-        ### Cargas Horárias e Periodicidade dos Treinamentos
-        
-        #### NR-20
-        | Módulo | Formação Inicial | Reciclagem (Periodicidade) | Reciclagem (C.H. Mínima) |
-        |--------|------------------|----------------------------|--------------------------|
-        | Básico | 8 horas          | 3 anos                     | 4 horas                  |
-        | Intermediário | 16 horas         | 2 anos                     | 4 horas                  |
-        | Avançado I | 20 horas         | 2 anos                     | 4 horas                  |
-        | Avançado II | 32 horas         | 1 ano                      | 4 horas                  |
-        
-        ---
-
-        #### Outras NRs Comuns
-        | Norma | Formação Inicial (C.H.) | Reciclagem (C.H.) | Periodicidade Reciclagem |
-        |-------|---------------------------|-----------------------|--------------------------|
-        | NR-35 | 8 horas                   | 8 horas               | 2 anos                   |
-        | NR-10 | 40 horas                  | 40 horas              | 2 anos                   |
-        | NR-18 | 8 horas                   | 8 horas               | 1 ano                    |
-        | NR-34 | 8 horas                   | 8 horas               | 1 ano                    |
-        | NR-12 | 8 horas                   | 8 horas               | 2 anos                   |
-        | NR-06 | 3 horas                   | 3 horas               | 10 anos                  |
-        | NR-11 | 16-32 horas               | 16 horas              | 3 anos                   |
-        | NR-33 | 16-40 horas               | 8 horas               | 1 ano                    |
-        | Brigada | 24 horas (Avançado)     | 16 horas (Avançado)   | 1 ano                    |
-        """)
+        st.markdown("### Cargas Horárias e Periodicidade dos Treinamentos")
+        # Gerada a partir de nr_rules.yaml: a mesma tabela usada na validação e no vencimento.
+        rules = get_nr_rules()
+        info = rules.summary_table()
+        info['modulo'] = info['modulo'].replace('*', '—')
+        st.dataframe(
+            info,
+            column_config={
+                "norma": "Norma", "modulo": "Módulo",
+                "validade_anos": st.column_config.NumberColumn("Periodicidade (anos)", format="%d"),
+                "formação": st.column_config.NumberColumn("Formação (C.H. mín.)", format="%d h"),
+                "reciclagem": st.column_config.NumberColumn("Reciclagem (C.H. mín.)", format="%d h"),
+            },
+            column_order=["norma", "modulo", "formação", "reciclagem", "validade_anos"],
+            hide_index=True, use_container_width=True
+        )
+        st.caption(f"Versão das regras: {rules.version}")
 
 def highlight_expired(row):
     """
@@ -58,18 +57,40 @@ def style_audit_table(row):
         return ['background-color: #FFCDD2'] * len(row)
     return [''] * len(row)
 
+def _guess_norma(doc_type_str: str, file_name: str) -> str:
+    """
+    Palpite barato da norma antes da extração (pelo nome do arquivo, ex.: 'NR-35 João.pdf').
+    A auditoria só usa a norma nos treinamentos; para os demais tipos ela é sempre vazia.
+    """
+    if doc_type_str != 'Treinamento':
+        return ''
+    guess = padronizar_norma(os.path.splitext(file_name or '')[0])
+    return guess if guess in get_nr_rules().normas else ''
+
+def _with_script_context(func, *args):
+    """Executa `func` em outra thread mantendo o contexto da sessão (mensagens st.* continuam visíveis)."""
+    ctx = get_script_run_ctx()
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+    return run
+
 def _run_analysis_and_audit(manager, analysis_method_name, uploader_key, doc_type_str, employee_id_key=None):
     """
     Função genérica que executa a análise de PDF e a auditoria com IA.
+    A auditoria (busca RAG + modelo de auditoria) depende da extração apenas pelo tipo e pela
+    norma do documento: ela começa junto com a extração usando a norma estimada e é
+    refeita se a norma extraída for diferente do palpite. Treinamentos sem palpite de norma
+    auditam só depois da extração (a auditoria antecipada seria sempre refeita).
     """
     if not st.session_state.get(uploader_key):
         return
 
-    if 'nr_analyzer' not in st.session_state:
+    nr_analyzer = get_unit_manager('nr_analyzer')
+    if nr_analyzer is None:
         st.error("O analisador de NR não foi inicializado. A análise não pode continuar.")
         return
 
-    nr_analyzer = st.session_state.nr_analyzer
     anexo = st.session_state[uploader_key]
     
     # Calcula o hash do arquivo
@@ -86,20 +107,65 @@ def _run_analysis_and_audit(manager, analysis_method_name, uploader_key, doc_typ
         st.session_state[f"{doc_type_str}_funcionario_para_salvar"] = employee_id
 
     analysis_func = getattr(manager, analysis_method_name)
-    
-    with st.spinner(f"Analisando conteúdo do PDF..."):
-        info = analysis_func(anexo)
-
-    if not info:
-        st.error("Não foi possível extrair informações básicas do documento.")
+    file_content = anexo.getvalue()
+    guessed_norma = _guess_norma(doc_type_str, anexo.name)
+    audit_hint = {'type': doc_type_str, 'norma': guessed_norma} if guessed_norma else {'type': doc_type_str}
+
+    # Carrega a base RAG antes de abrir as threads (usa spinner/toast na thread principal).
+    nr_analyzer.rag_df
+
+    if use_combined_mode(doc_type_str) and hasattr(manager, 'analyze_pdf_with_audit'):
+        with st.spinner("Analisando e auditando o PDF numa única chamada à IA..."):
+            info, audit_result = manager.analyze_pdf_with_audit(anexo, doc_type_str, nr_analyzer, guessed_norma)
+            # Partes ausentes ou malformadas da resposta combinada seguem pelas chamadas separadas.
+            if not info:
+                info = analysis_func(anexo)
+            if not info:
+                st.error("Não foi possível extrair informações básicas do documento.")
+                return
+            info['type'] = doc_type_str
+            info['arquivo_hash'] = arquivo_hash
+            if audit_result is None:
+                audit_result = nr_analyzer.perform_initial_audit(info, file_content)
+        info['audit_result'] = audit_result or {"summary": "Falha na Auditoria", "details": []}
+        st.session_state[f"{doc_type_str}_info_para_salvar"] = info
         return
 
-    info['type'] = doc_type_str
-    info['arquivo_hash'] = arquivo_hash
-    # Não adiciona employee_id ao info, pois já está armazenado separadamente
-
-    with st.spinner(f"Executando auditoria de conformidade..."):
-        audit_result = nr_analyzer.perform_initial_audit(info, anexo.getvalue())
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-ia")
+    try:
+        with st.spinner(f"Analisando conteúdo do PDF e executando auditoria de conformidade..."):
+            speculative_audit = doc_type_str != 'Treinamento' or bool(guessed_norma)
+            audit_future = (
+                executor.submit(_with_script_context(nr_analyzer.perform_initial_audit, audit_hint, file_content))
+                if speculative_audit else None
+            )
+            info = executor.submit(_with_script_context(analysis_func, anexo)).result()
+
+            if not info:
+                # A auditoria antecipada já iniciada é aguardada, como no descarte abaixo.
+                if audit_future is not None and not audit_future.cancel():
+                    wait([audit_future])
+                st.error("Não foi possível extrair informações básicas do documento.")
+                return
+
+            info['type'] = doc_type_str
+            info['arquivo_hash'] = arquivo_hash
+            # Não adiciona employee_id ao info, pois já está armazenado separadamente
+
+            extracted_norma = padronizar_norma(info['norma']) if info.get('norma') else ''
+            if doc_type_str == 'Treinamento' and extracted_norma != guessed_norma:
+                # Sem palpite ou palpite errado: audita com a norma extraída. Uma auditoria antecipada
+                # já iniciada não pode ser interrompida: o resultado dela é descartado, mas ela é
+                # aguardada (em geral já terminou) para que suas mensagens não cheguem após o rerun.
+                audit_result = nr_analyzer.perform_initial_audit(info, file_content)
+                if audit_future is not None:
+                    wait([audit_future])
+            elif audit_future is not None:
+                audit_result = audit_future.result()
+            else:
+                audit_result = nr_analyzer.perform_initial_audit(info, file_content)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
     info['audit_result'] = audit_result or {"summary": "Falha na Auditoria", "details": []}
     
@@ -107,9 +173,10 @@ def _run_analysis_and_audit(manager, analysis_method_name, uploader_key, doc_typ
 
 def process_aso_pdf():
     """Função de callback para o uploader de ASO."""
-    if 'employee_manager' in st.session_state:
+    manager = get_unit_manager('employee_manager')
+    if manager is not None:
         _run_analysis_and_audit(
-            manager=st.session_state.employee_manager,
+            manager=manager,
             analysis_method_name='analyze_aso_pdf',
             uploader_key='aso_uploader_tab',
             doc_type_str='ASO',
@@ -118,9 +185,10 @@ def process_aso_pdf():
 
 def process_training_pdf():
     """Função de callback para o uploader de Treinamento."""
-    if 'employee_manager' in st.session_state:
+    manager = get_unit_manager('employee_manager')
+    if manager is not None:
         _run_analysis_and_audit(
-            manager=st.session_state.employee_manager,
+            manager=manager,
             analysis_method_name='analyze_training_pdf',
             uploader_key='training_uploader_tab',
             doc_type_str='Treinamento',
@@ -129,9 +197,10 @@ def process_training_pdf():
 
 def process_company_doc_pdf():
     """Função de callback para o uploader de Documento da Empresa."""
-    if 'docs_manager' in st.session_state:
+    manager = get_unit_manager('docs_manager')
+    if manager is not None:
         _run_analysis_and_audit(
-            manager=st.session_state.docs_manager,
+            manager=manager,
             analysis_method_name='analyze_company_doc_pdf',
             uploader_key='doc_uploader_tab',
             doc_type_str='Doc. Empresa'
@@ -139,8 +208,8 @@ def process_company_doc_pdf():
 
 def process_epi_pdf():
     """Função de callback para o uploader de Ficha de EPI."""
-    if st.session_state.get('epi_uploader_tab') and 'epi_manager' in st.session_state:
-        epi_manager = st.session_state.epi_manager
+    epi_manager = get_unit_manager('epi_manager')
+    if st.session_state.get('epi_uploader_tab') and epi_manager is not None:
         anexo = st.session_state.epi_uploader_tab
         
         # Calcula o hash do arquivo